@@ -1,18 +1,35 @@
+import asyncio
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Mapping, Sequence, TypeVar
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from models.database import get_db
+from models.database import get_db, AsyncSessionLocal
 from models.models import Instance
 from models.schemas import (
-    ComparisonRequest, ComparisonResult, DataType,
-    DiffRequest, DiffResult
+    Instance as InstanceSchema, ComparisonRequest, ComparisonResult, ComparisonItem, ComparisonStatus, DataType,
+    DiffRequest, DiffResult, SnapshotFreshness, CombinedComparisonResult,
+    FleetRefreshRequest
 )
-from services.data_storage import DataStorageService
+from services.data_storage import DataStorageService, refresh_flights
 from services.comparison import ComparisonService
+from services.snapshot_cache import snapshot_cache
+from services.snapshot_refresher import snapshot_refresher
+from services.fleet_refresh import FleetRefreshService
+from integrations.store_view_registry import store_view_registry
 
 router = APIRouter()
 
+T = TypeVar("T")
+
+# Items compared (and at most sent) per chunk of a streamed comparison
+STREAM_BATCH_SIZE = 100
+
 
 async def get_instance_or_404(db: AsyncSession, instance_id: int) -> Instance:
     """Helper to get instance or raise 404"""
@@ -30,34 +47,104 @@ async def get_instance_or_404(db: AsyncSession, instance_id: int) -> Instance:
     return instance
 
 
+async def in_own_session(fn: Callable[..., Awaitable[T]], *args: Any) -> T:
+    """Call fn(session, *args) with a session of its own, so several calls can run concurrently"""
+    async with AsyncSessionLocal() as session:
+        return await fn(session, *args)
+
+
+async def compare_snapshots(
+    source_instance: Instance,
+    dest_instance: Instance,
+    data_type: DataType,
+    source_data: Sequence[Mapping[str, Any]],
+    dest_data: Sequence[Mapping[str, Any]],
+    request: ComparisonRequest
+) -> ComparisonResult:
+    """Compare two loaded snapshots, deciding identical items by their cached item hashes, then filter and page the items"""
+    source_fingerprints, dest_fingerprints = await asyncio.gather(
+        DataStorageService.load_fingerprints(source_instance.id, data_type, source_data),
+        DataStorageService.load_fingerprints(dest_instance.id, data_type, dest_data)
+    )
+    return ComparisonService.compare_data(
+        source_data=source_data,
+        dest_data=dest_data,
+        data_type=data_type,
+        source_instance=source_instance,
+        dest_instance=dest_instance,
+        source_fingerprints=source_fingerprints,
+        dest_fingerprints=dest_fingerprints,
+        status=request.status,
+        search=request.search,
+        skip=request.skip,
+        limit=request.limit
+    )
+
+
+async def compare_summaries(
+    source_instance: Instance,
+    dest_instance: Instance,
+    data_type: DataType,
+    request: ComparisonRequest
+) -> ComparisonResult:
+    """Compare two instances from their snapshot item indexes, without loading item bodies"""
+    source_index, dest_index = await asyncio.gather(
+        in_own_session(DataStorageService.get_or_refresh_item_index, source_instance, data_type, request.force_refresh),
+        in_own_session(DataStorageService.get_or_refresh_item_index, dest_instance, data_type, request.force_refresh)
+    )
+    return ComparisonService.compare_indexes(
+        source_entries=source_index,
+        dest_entries=dest_index,
+        data_type=data_type,
+        source_instance=source_instance,
+        dest_instance=dest_instance,
+        status=request.status,
+        search=request.search,
+        skip=request.skip,
+        limit=request.limit
+    )
+
+
+async def compare_instances(
+    source_instance: Instance,
+    dest_instance: Instance,
+    data_type: DataType,
+    request: ComparisonRequest
+) -> ComparisonResult:
+    """Compare a data type between two instances, with or without item bodies, then filter and page the items"""
+    if request.summary_only:
+        return await compare_summaries(source_instance, dest_instance, data_type, request)
+    
+    # Get data for both instances concurrently
+    source_data, dest_data = await asyncio.gather(
+        in_own_session(DataStorageService.get_or_refresh_data, source_instance, data_type, request.force_refresh),
+        in_own_session(DataStorageService.get_or_refresh_data, dest_instance, data_type, request.force_refresh)
+    )
+    return await compare_snapshots(source_instance, dest_instance, data_type, source_data, dest_data, request)
+
+
+async def with_snapshot_freshness(db: AsyncSession, result: ComparisonResult) -> ComparisonResult:
+    """Add the age of both compared snapshots to a comparison result"""
+    source = await DataStorageService.get_freshness(db, result.source_instance.id, result.data_type)
+    destination = await DataStorageService.get_freshness(db, result.destination_instance.id, result.data_type)
+    result.source_snapshot = SnapshotFreshness(**source) if source else None
+    result.destination_snapshot = SnapshotFreshness(**destination) if destination else None
+    return result
+
+
 @router.post("/blocks", response_model=ComparisonResult)
 async def compare_blocks(
     request: ComparisonRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """Compare CMS blocks between two instances"""
+    """Compare CMS blocks between two instances (summary_only leaves out item bodies)"""
     # Get instances
     source_instance = await get_instance_or_404(db, request.source_instance_id)
     dest_instance = await get_instance_or_404(db, request.destination_instance_id)
     
-    # Get data for both instances
-    source_data = await DataStorageService.get_or_refresh_data(
-        db, source_instance, DataType.BLOCKS, request.force_refresh
-    )
-    dest_data = await DataStorageService.get_or_refresh_data(
-        db, dest_instance, DataType.BLOCKS, request.force_refresh
-    )
-    
-    # Compare data
-    result = ComparisonService.compare_data(
-        source_data=source_data,
-        dest_data=dest_data,
-        data_type=DataType.BLOCKS,
-        source_instance=source_instance,
-        dest_instance=dest_instance
-    )
+    result = await compare_instances(source_instance, dest_instance, DataType.BLOCKS, request)
     
-    return result
+    return await with_snapshot_freshness(db, result)
 
 
 @router.post("/pages", response_model=ComparisonResult)
@@ -65,29 +152,170 @@ async def compare_pages(
     request: ComparisonRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """Compare CMS pages between two instances"""
+    """Compare CMS pages between two instances (summary_only leaves out item bodies)"""
     # Get instances
     source_instance = await get_instance_or_404(db, request.source_instance_id)
     dest_instance = await get_instance_or_404(db, request.destination_instance_id)
     
-    # Get data for both instances
-    source_data = await DataStorageService.get_or_refresh_data(
-        db, source_instance, DataType.PAGES, request.force_refresh
-    )
-    dest_data = await DataStorageService.get_or_refresh_data(
-        db, dest_instance, DataType.PAGES, request.force_refresh
+    result = await compare_instances(source_instance, dest_instance, DataType.PAGES, request)
+    
+    return await with_snapshot_freshness(db, result)
+
+
+@router.post("/all", response_model=CombinedComparisonResult)
+async def compare_all(
+    request: ComparisonRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Compare CMS blocks and pages between two instances, loading all four snapshots concurrently"""
+    # Get instances
+    source_instance = await get_instance_or_404(db, request.source_instance_id)
+    dest_instance = await get_instance_or_404(db, request.destination_instance_id)
+    
+    comparisons = [
+        compare_instances(source_instance, dest_instance, data_type, request)
+        for data_type in (DataType.BLOCKS, DataType.PAGES)
+    ]
+    if request.force_refresh:
+        # Fetch each instance's store views once, alongside the data; the
+        # refreshes of both data types then read them from the registry
+        comparisons.extend([
+            store_view_registry.get(source_instance, force=True),
+            store_view_registry.get(dest_instance, force=True)
+        ])
+    blocks, pages = (await asyncio.gather(*comparisons))[:2]
+    
+    return CombinedComparisonResult(
+        blocks=await with_snapshot_freshness(db, blocks),
+        pages=await with_snapshot_freshness(db, pages)
     )
+
+
+@router.post("/index/{data_type}", response_model=ComparisonResult)
+async def compare_item_indexes(
+    data_type: DataType,
+    request: ComparisonRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Compare two instances from their snapshot item indexes (statuses and differing fields, no item bodies)"""
+    # Get instances
+    source_instance = await get_instance_or_404(db, request.source_instance_id)
+    dest_instance = await get_instance_or_404(db, request.destination_instance_id)
     
-    # Compare data
-    result = ComparisonService.compare_data(
-        source_data=source_data,
-        dest_data=dest_data,
-        data_type=DataType.PAGES,
-        source_instance=source_instance,
-        dest_instance=dest_instance
+    result = await compare_summaries(source_instance, dest_instance, data_type, request)
+    
+    return await with_snapshot_freshness(db, result)
+
+
+@router.post("/stream/{data_type}")
+async def stream_comparison(
+    data_type: DataType,
+    request: ComparisonRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Compare two instances as NDJSON: a header line, one line per compared item, then a summary line.
+    
+    Items are compared from the snapshot item indexes (fingerprints) and
+    sent in batches as they are compared, so clients can render rows
+    before the comparison is complete. Unless summary_only is set, the
+    bodies of items that differ or exist on one side only are loaded per
+    batch and sent with them; identical items are sent without bodies.
+    status, search and skip/limit select the items sent, the summary
+    counts cover all items.
+    """
+    # Get instances
+    source_instance = await get_instance_or_404(db, request.source_instance_id)
+    dest_instance = await get_instance_or_404(db, request.destination_instance_id)
+    
+    source_index, dest_index = await asyncio.gather(
+        in_own_session(DataStorageService.get_or_refresh_item_index, source_instance, data_type, request.force_refresh),
+        in_own_session(DataStorageService.get_or_refresh_item_index, dest_instance, data_type, request.force_refresh)
     )
+    source_snapshot = await DataStorageService.get_freshness(db, source_instance.id, data_type)
+    dest_snapshot = await DataStorageService.get_freshness(db, dest_instance.id, data_type)
     
-    return result
+    header = {
+        "event": "header",
+        "source_instance": InstanceSchema.model_validate(source_instance).model_dump(mode="json"),
+        "destination_instance": InstanceSchema.model_validate(dest_instance).model_dump(mode="json"),
+        "data_type": data_type.value,
+        "total_source": len(source_index),
+        "total_destination": len(dest_index),
+        "source_snapshot": source_snapshot,
+        "destination_snapshot": dest_snapshot,
+        "compared_at": datetime.utcnow()
+    }
+    rows = ComparisonService.iter_index_rows(source_index, dest_index, data_type)
+    
+    async def item_lines(batch: list) -> str:
+        """NDJSON lines of a batch of rows, with the bodies of the rows that are not identical"""
+        source_bodies = dest_bodies = {}
+        if not request.summary_only:
+            changed = [row for row in batch if row[3] != ComparisonStatus.EXISTS or row[4] != ComparisonStatus.EXISTS]
+            source_entries = [row[1] for row in changed if row[1] is not None]
+            dest_entries = [row[2] for row in changed if row[2] is not None]
+            source_items, dest_items = await asyncio.gather(
+                DataStorageService.load_entry_items(source_instance.id, data_type, source_entries),
+                DataStorageService.load_entry_items(dest_instance.id, data_type, dest_entries)
+            )
+            source_bodies = {entry["identifier"]: item for entry, item in zip(source_entries, source_items)}
+            dest_bodies = {entry["identifier"]: item for entry, item in zip(dest_entries, dest_items)}
+        
+        def encode() -> str:
+            lines = []
+            for identifier, source_entry, dest_entry, source_status, destination_status, differences in batch:
+                item = ComparisonItem(
+                    identifier=identifier,
+                    title=(source_entry or dest_entry)["title"],
+                    source_status=source_status,
+                    destination_status=destination_status,
+                    source_data=source_bodies.get(identifier),
+                    destination_data=dest_bodies.get(identifier),
+                    differences=differences or None
+                )
+                lines.append(json.dumps({"event": "item", **item.model_dump(mode="json")}, default=str))
+            return "\n".join(lines) + "\n"
+        
+        # Serializing item bodies is CPU work, keep it off the event loop
+        return await run_in_threadpool(encode)
+    
+    async def ndjson() -> AsyncIterator[str]:
+        yield json.dumps(header, default=str) + "\n"
+        
+        counts = ComparisonService.new_counts()
+        matching = 0
+        while True:
+            # Comparing fingerprints runs in a worker thread, one batch at a time
+            compared = await run_in_threadpool(lambda: list(islice(rows, STREAM_BATCH_SIZE)))
+            if not compared:
+                break
+            
+            batch = []
+            for row in compared:
+                identifier, source_entry, dest_entry, source_status, destination_status, _ = row
+                ComparisonService.count_statuses(counts, source_status, destination_status)
+                if not ComparisonService.matches_filter(
+                    identifier, (source_entry or dest_entry)["title"], source_status, destination_status,
+                    request.status, request.search
+                ):
+                    continue
+                
+                matching += 1
+                if matching > request.skip and (request.limit is None or matching <= request.skip + request.limit):
+                    batch.append(row)
+            
+            if batch:
+                yield await item_lines(batch)
+        
+        yield json.dumps({
+            "event": "summary",
+            "total_source": len(source_index),
+            "total_destination": len(dest_index),
+            **counts,
+            "total_items": matching
+        }) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @router.post("/diff", response_model=DiffResult)
@@ -100,47 +328,21 @@ async def get_item_diff(
     source_instance = await get_instance_or_404(db, request.source_instance_id)
     dest_instance = await get_instance_or_404(db, request.destination_instance_id)
     
-    # Load data
-    source_data = DataStorageService.load_snapshot(source_instance.id, request.data_type)
-    dest_data = DataStorageService.load_snapshot(dest_instance.id, request.data_type)
-    
-    if source_data is None:
+    if not await DataStorageService.has_snapshot(source_instance.id, request.data_type):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No data snapshot found for source instance. Please run comparison first."
         )
     
-    if dest_data is None:
+    if not await DataStorageService.has_snapshot(dest_instance.id, request.data_type):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No data snapshot found for destination instance. Please run comparison first."
         )
     
-    # Find items
-    source_item = None
-    dest_item = None
-    
-    for item in source_data:
-        if request.data_type == DataType.BLOCKS:
-            if item.get("identifier") == request.identifier:
-                source_item = item
-                break
-        else:  # DataType.PAGES
-            # Try identifier first (newer Magento versions), then url_key (older versions)
-            if item.get("identifier") == request.identifier or item.get("url_key") == request.identifier:
-                source_item = item
-                break
-    
-    for item in dest_data:
-        if request.data_type == DataType.BLOCKS:
-            if item.get("identifier") == request.identifier:
-                dest_item = item
-                break
-        else:  # DataType.PAGES
-            # Try identifier first (newer Magento versions), then url_key (older versions)
-            if item.get("identifier") == request.identifier or item.get("url_key") == request.identifier:
-                dest_item = item
-                break
+    # Point lookups in the item store or the (cached) snapshot indexes
+    source_item = await DataStorageService.find_item(source_instance.id, request.data_type, request.identifier)
+    dest_item = await DataStorageService.find_item(dest_instance.id, request.data_type, request.identifier)
     
     if not source_item and not dest_item:
         raise HTTPException(
@@ -163,18 +365,80 @@ async def get_item_diff(
 async def refresh_instance_data(
     instance_id: int,
     data_type: DataType,
+    full: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """Manually refresh data for a specific instance"""
+    """Manually refresh data for a specific instance (full=true skips the incremental mode)"""
     instance = await get_instance_or_404(db, instance_id)
     
     snapshot = await DataStorageService.refresh_instance_data(
-        db, instance, data_type
+        instance, data_type, incremental=False if full else None
     )
     
     return {
         "message": "Data refreshed successfully",
         "snapshot_id": snapshot.id,
         "item_count": snapshot.item_count,
+        "refresh_mode": snapshot.snapshot_metadata.get("refresh_mode"),
         "created_at": snapshot.created_at
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/refresh-all")
+async def refresh_fleet(
+    request: FleetRefreshRequest,
+    stream: bool = True,
+    db: AsyncSession = Depends(get_db)
+):
+    """Refresh all active instances (or the given ones) in parallel.
+    
+    Streams one JSON line per finished snapshot and a final summary line
+    (stream=false returns only the summary).
+    """
+    if request.instance_ids is None:
+        result = await db.execute(select(Instance).where(Instance.is_active.is_(True)))
+        instances = list(result.scalars().all())
+    else:
+        instances = [
+            await get_instance_or_404(db, instance_id)
+            for instance_id in dict.fromkeys(request.instance_ids)
+        ]
+    
+    events = FleetRefreshService.refresh(
+        [(instance, data_type) for instance in instances for data_type in dict.fromkeys(request.data_types)],
+        incremental=False if request.full else None,
+        concurrency=request.concurrency,
+        per_instance=request.per_instance
+    )
+    
+    if not stream:
+        async for event in events:
+            pass
+        return event
+    
+    async def ndjson() -> AsyncIterator[str]:
+        async for event in events:
+            yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.get("/snapshot-cache/stats")
+async def get_snapshot_cache_stats():
+    """Hit/miss counters and memory use of the in-process snapshot cache"""
+    return snapshot_cache.stats()
+
+
+@router.get("/refresh-stats")
+async def get_refresh_stats():
+    """Counts and wait times of snapshot refreshes, including coalesced callers"""
+    return [
+        {"instance_id": instance_id, "data_type": data_type, "mode": mode, **stats}
+        for (instance_id, data_type, mode), stats in refresh_flights.stats().items()
+    ]
+
+
+@router.get("/refresher/stats")
+async def get_refresher_stats():
+    """Passes, refreshes and failures of the background snapshot refresher"""
+    return snapshot_refresher.stats()
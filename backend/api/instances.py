@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
-from typing import List
+from typing import List, Optional
 import httpx
 from pathlib import Path
 import shutil
 
 from models.database import get_db
-from models.models import Instance as InstanceModel, DataSnapshot
-from models.schemas import Instance, InstanceCreate, InstanceUpdate, InstanceTestResult
-from integrations.magento_client import MagentoClient
+from models.models import Instance as InstanceModel, DataSnapshot, SnapshotPolicy
+from models.schemas import (
+    Instance, InstanceCreate, InstanceUpdate, InstanceTestResult, DataType, SnapshotPolicyUpdate
+)
+from services.data_storage import DataStorageService
+from services.snapshot_history import SnapshotHistoryService
+from services.change_feed import ChangeFeedService
+from utils.snapshot_io import snapshot_io
+from integrations.connection_pool import connection_pool
+from integrations.http_cache import response_cache
+from integrations.store_view_registry import store_view_registry
 from config import settings
 
 router = APIRouter()
@@ -28,6 +36,12 @@ async def list_instances(
     return instances
 
 
+@router.get("/http-cache/stats")
+async def get_http_cache_stats():
+    """Get hit/miss counters and size of the Magento conditional GET cache"""
+    return await response_cache.stats()
+
+
 @router.get("/{instance_id}", response_model=Instance)
 async def get_instance(
     instance_id: int,
@@ -117,6 +131,11 @@ async def update_instance(
     await db.commit()
     await db.refresh(instance)
     
+    # Drop pooled connections so the next request uses the new URL/token
+    if 'url' in update_data or 'api_token' in update_data:
+        await connection_pool.invalidate(instance_id)
+        store_view_registry.invalidate(instance_id)
+    
     return instance
 
 
@@ -139,12 +158,15 @@ async def delete_instance(
     # Delete data directory for this instance
     instance_dir = settings.instances_data_dir / str(instance_id)
     if instance_dir.exists():
-        shutil.rmtree(instance_dir)
+        await snapshot_io.run(shutil.rmtree, instance_dir)
     
     # Delete instance
     await db.delete(instance)
     await db.commit()
     
+    await connection_pool.invalidate(instance_id)
+    store_view_registry.invalidate(instance_id)
+    
     return {"message": "Instance deleted successfully"}
 
 
@@ -165,13 +187,8 @@ async def test_instance_connection(
         )
     
     try:
-        client = MagentoClient(
-            base_url=str(instance.url),
-            token=instance.api_token
-        )
-        
-        # Test connection by fetching store views
-        store_views = await client.get_store_views()
+        # Test connection by fetching store views (bypassing the cache, which it refreshes)
+        store_views = await store_view_registry.get(instance, force=True)
         
         return InstanceTestResult(
             success=True,
@@ -197,6 +214,29 @@ async def test_instance_connection(
         )
 
 
+@router.get("/{instance_id}/circuit")
+async def get_instance_circuit(
+    instance_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the circuit breaker state of an instance"""
+    result = await db.execute(
+        select(InstanceModel).where(InstanceModel.id == instance_id)
+    )
+    instance = result.scalar_one_or_none()
+    
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Instance not found"
+        )
+    
+    return {
+        "instance_id": instance_id,
+        **connection_pool.get_circuit_breaker(instance).status()
+    }
+
+
 @router.get("/{instance_id}/data-snapshots")
 async def get_instance_data_snapshots(
     instance_id: int,
@@ -251,6 +291,201 @@ async def get_instance_data_snapshots(
     }
 
 
+@router.get("/{instance_id}/freshness")
+async def get_snapshot_freshness(
+    instance_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Snapshot age, max age and staleness per data type"""
+    instance = await db.get(InstanceModel, instance_id)
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Instance not found"
+        )
+    
+    result = await db.execute(
+        select(SnapshotPolicy).where(SnapshotPolicy.instance_id == instance_id)
+    )
+    policies = {policy.data_type: policy.max_age for policy in result.scalars().all()}
+    
+    return {
+        "instance_id": instance_id,
+        **{
+            data_type.value: {
+                "max_age": policies.get(data_type.value, settings.snapshot_max_age),
+                "max_age_overridden": data_type.value in policies,
+                "snapshot": await DataStorageService.get_freshness(db, instance_id, data_type)
+            }
+            for data_type in DataType
+        }
+    }
+
+
+@router.put("/{instance_id}/freshness/{data_type}")
+async def update_snapshot_policy(
+    instance_id: int,
+    data_type: DataType,
+    policy_update: SnapshotPolicyUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Set the snapshot max age of an instance and data type (null restores the default)"""
+    instance = await db.get(InstanceModel, instance_id)
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Instance not found"
+        )
+    
+    result = await db.execute(
+        select(SnapshotPolicy).where(
+            SnapshotPolicy.instance_id == instance_id,
+            SnapshotPolicy.data_type == data_type.value
+        )
+    )
+    policy = result.scalar_one_or_none()
+    
+    if policy_update.max_age is None:
+        if policy:
+            await db.delete(policy)
+    elif policy:
+        policy.max_age = policy_update.max_age
+    else:
+        db.add(SnapshotPolicy(instance_id=instance_id, data_type=data_type.value, max_age=policy_update.max_age))
+    await db.commit()
+    
+    return {
+        "instance_id": instance_id,
+        "data_type": data_type.value,
+        "max_age": policy_update.max_age if policy_update.max_age is not None else settings.snapshot_max_age,
+        "max_age_overridden": policy_update.max_age is not None
+    }
+
+
+async def get_snapshot_version_or_404(
+    db: AsyncSession,
+    instance_id: int,
+    data_type: DataType,
+    version: int
+):
+    """Helper to get a retained snapshot version or raise 404"""
+    snapshot_version = await SnapshotHistoryService.get_version(db, instance_id, data_type, version)
+    
+    if not snapshot_version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Version {version} of {data_type.value} not found (it may have expired)"
+        )
+    
+    return snapshot_version
+
+
+@router.get("/{instance_id}/history/{data_type}")
+async def get_snapshot_history(
+    instance_id: int,
+    data_type: DataType,
+    db: AsyncSession = Depends(get_db)
+):
+    """List the retained snapshot versions of an instance, newest first"""
+    versions = await SnapshotHistoryService.list_versions(db, instance_id, data_type)
+    
+    return [
+        {
+            "version": snapshot_version.version,
+            "item_count": snapshot_version.item_count,
+            "new_objects": snapshot_version.new_objects,
+            "changes": snapshot_version.changes,
+            "refresh_mode": (snapshot_version.snapshot_metadata or {}).get("refresh_mode"),
+            "created_at": snapshot_version.created_at.isoformat()
+        }
+        for snapshot_version in versions
+    ]
+
+
+@router.get("/{instance_id}/history/{data_type}/changes")
+async def get_snapshot_history_changes(
+    instance_id: int,
+    data_type: DataType,
+    from_version: int,
+    to_version: int,
+    fields: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Items added, removed and modified between two versions (fields=true also lists changed fields)"""
+    old = await get_snapshot_version_or_404(db, instance_id, data_type, from_version)
+    new = await get_snapshot_version_or_404(db, instance_id, data_type, to_version)
+    
+    return await snapshot_io.run(
+        SnapshotHistoryService.changes_between, instance_id, data_type, old, new, include_fields=fields
+    )
+
+
+@router.get("/{instance_id}/changes")
+async def get_instance_changes(
+    instance_id: int,
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    data_type: Optional[DataType] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Changes found by snapshot refreshes after the change id `since`, oldest first.
+    
+    Poll with since set to the returned next_since to get only new changes.
+    """
+    instance = await db.get(InstanceModel, instance_id)
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Instance not found"
+        )
+    
+    changes, has_more = await ChangeFeedService.list_changes(db, instance_id, since, limit, data_type)
+    
+    return {
+        "instance_id": instance_id,
+        "changes": [
+            {
+                "id": change.id,
+                "data_type": change.data_type,
+                "version": change.version,
+                "change": change.change_type,
+                "key": change.key,
+                "identifier": change.identifier,
+                "fields": change.fields or [],
+                "old_hash": change.old_hash,
+                "new_hash": change.new_hash,
+                "created_at": change.created_at
+            }
+            for change in changes
+        ],
+        "next_since": changes[-1].id if changes else since,
+        "has_more": has_more
+    }
+
+
+@router.get("/{instance_id}/history/{data_type}/{version}/items/{identifier}")
+async def get_snapshot_history_item(
+    instance_id: int,
+    data_type: DataType,
+    version: int,
+    identifier: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get an item as it was in a snapshot version (one body per store scope)"""
+    snapshot_version = await get_snapshot_version_or_404(db, instance_id, data_type, version)
+    
+    items = await snapshot_io.run(
+        SnapshotHistoryService.items_at, instance_id, data_type, snapshot_version, identifier
+    )
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Item with identifier '{identifier}' not found in version {version}"
+        )
+    
+    return items
+
+
 @router.get("/data-snapshots/all")
 async def get_all_data_snapshots(
     db: AsyncSession = Depends(get_db)
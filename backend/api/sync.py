@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+import httpx
 
 from models.database import get_db, AsyncSessionLocal
 from models.models import Instance, SyncHistory
@@ -12,7 +13,8 @@ from models.schemas import (
 )
 from services.data_storage import DataStorageService
 from services.sync import SyncService
-from integrations.magento_client import MagentoClient
+from integrations.connection_pool import connection_pool
+from integrations.store_view_registry import store_view_registry
 
 router = APIRouter()
 
@@ -33,6 +35,40 @@ async def get_instance_or_404(db: AsyncSession, instance_id: int) -> Instance:
     return instance
 
 
+async def validate_store_view_mapping(
+    source_instance: Instance,
+    dest_instance: Instance,
+    store_view_mapping: Optional[Dict[str, str]]
+) -> None:
+    """Check a store view mapping only references existing store views (via the registry)"""
+    if not store_view_mapping:
+        return
+    
+    unknown = []
+    try:
+        for source_id, dest_id in store_view_mapping.items():
+            if await store_view_registry.get_by_id(source_instance, int(source_id)) is None:
+                unknown.append(f"source store {source_id}")
+            if await store_view_registry.get_by_id(dest_instance, int(dest_id)) is None:
+                unknown.append(f"destination store {dest_id}")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Store view mapping must map numeric store ids"
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Could not load store views to validate the mapping: {str(e)}"
+        )
+    
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Store view mapping references unknown store views: {', '.join(unknown)}"
+        )
+
+
 @router.post("/preview", response_model=SyncPreview)
 async def preview_sync(
     request: SyncRequest,
@@ -43,9 +79,12 @@ async def preview_sync(
     source_instance = await get_instance_or_404(db, request.source_instance_id)
     dest_instance = await get_instance_or_404(db, request.destination_instance_id)
     
-    # Load data
-    source_data = DataStorageService.load_snapshot(source_instance.id, request.data_type)
-    dest_data = DataStorageService.load_snapshot(dest_instance.id, request.data_type)
+    await validate_store_view_mapping(source_instance, dest_instance, request.store_view_mapping)
+    
+    # Load only the selected items, located through the snapshot item indexes
+    identifiers = [item.identifier for item in request.items]
+    source_data = await DataStorageService.load_items(source_instance.id, request.data_type, identifiers)
+    dest_data = await DataStorageService.load_items(dest_instance.id, request.data_type, identifiers)
     
     if source_data is None:
         raise HTTPException(
@@ -104,6 +143,7 @@ async def _perform_sync(
     source_instance = await get_instance_or_404(db, request.source_instance_id)
     dest_instance = await get_instance_or_404(db, request.destination_instance_id)
     
+    await validate_store_view_mapping(source_instance, dest_instance, request.store_view_mapping)
     
     # Create sync history record
     sync_history = SyncHistory(
@@ -158,19 +198,17 @@ async def _execute_sync(
             sync_history.sync_status = SyncStatus.IN_PROGRESS.value
             await db.commit()
             
-            # Load source data
-            source_data = DataStorageService.load_snapshot(
-                source_instance.id, request.data_type
+            # Load the selected source items
+            source_data = await DataStorageService.load_items(
+                source_instance.id, request.data_type,
+                [item.identifier for item in request.items]
             )
             
-            if not source_data:
+            if source_data is None:
                 raise Exception("No source data found")
             
             # Create Magento client for destination
-            dest_client = MagentoClient(
-                base_url=str(dest_instance.url),
-                token=dest_instance.api_token
-            )
+            dest_client = connection_pool.client_for(dest_instance)
             
             # Perform sync
             sync_service = SyncService()
@@ -180,7 +218,8 @@ async def _execute_sync(
                 dest_client=dest_client,
                 data_type=request.data_type,
                 sync_items=request.items,
-                store_view_mapping=request.store_view_mapping
+                store_view_mapping=request.store_view_mapping,
+                use_bulk=request.use_bulk
             )
             
             # Update sync history
@@ -192,7 +231,7 @@ async def _execute_sync(
             
             # Refresh destination data
             await DataStorageService.refresh_instance_data(
-                db, dest_instance, request.data_type
+                dest_instance, request.data_type
             )
             
         except Exception as e:
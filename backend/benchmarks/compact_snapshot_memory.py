@@ -0,0 +1,159 @@
+"""Compare the memory held by loaded snapshots as item dicts and as CompactSnapshots.
+
+Run from the backend directory:
+
+    python -m benchmarks.compact_snapshot_memory --pages 100000
+
+A multi-store page catalog is written as a source and a destination
+snapshot. Each representation is then measured in its own process:
+both snapshots are loaded and indexed by identifier and store scope,
+and the resident set size is read before and after.
+"""
+import argparse
+import gc
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+from benchmarks.snapshot_codecs import make_catalog
+from models.schemas import DataType
+from services.comparison import ComparisonService
+from services.compact_snapshot import CompactSnapshot
+from services.snapshot_codec import SnapshotCodec
+
+MODES = ("dicts", "compact")
+
+
+def make_store_content(rng: random.Random, words: List[str], content_size: int) -> str:
+    """Page Builder style markup: rows of columns with text and widgets"""
+    rows = []
+    size = 0
+    while size < content_size:
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(12, 40))).capitalize()
+        row = (
+            '<div data-content-type="row" data-appearance="contained" data-element="main">'
+            '<div class="pagebuilder-column-group"><div class="pagebuilder-column" data-content-type="column">'
+            f'<div data-content-type="text" data-element="main"><p>{text}.</p></div>'
+            f'{{{{widget type="Magento\\Cms\\Block\\Widget\\Block" block_id="{rng.randint(1, 50)}"}}}}'
+            '</div></div></div>'
+        )
+        rows.append(row)
+        size += len(row)
+    return "".join(rows)
+
+
+def make_store_catalog(pages: int, stores: int, content_size: int, shared: float) -> List[Dict[str, Any]]:
+    """Pages spread over store views: every identifier has one store-scoped item per store.
+
+    A `shared` share of the store view copies keep the content of the
+    first store view (same language), the others have their own.
+    """
+    rng = random.Random(42)
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(3000)
+    ]
+    items = make_catalog(pages, 0)
+    content = ""
+    for i, item in enumerate(items):
+        store_id = i % stores + 1
+        if store_id == 1 or rng.random() >= shared:
+            content = make_store_content(rng, words, content_size)
+        item["identifier"] = f"page-{i // stores + 1}"
+        item["content"] = content
+        item["store_id"] = [store_id]
+    return items
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * 4096
+
+
+def measure(mode: str, paths: List[Path]) -> None:
+    """Child process: load and index the snapshots in one representation, print RSS and timings"""
+    codec = SnapshotCodec.from_path(paths[0])
+    gc.collect()
+    baseline = rss_bytes()
+
+    started = time.perf_counter()
+    snapshots = []
+    for path in paths:
+        if mode == "compact":
+            snapshots.append(CompactSnapshot(codec.iter_read(path)))
+        else:
+            snapshots.append(codec.read(path))
+    lookups = [
+        {
+            (ComparisonService._get_identifier(item, DataType.PAGES), tuple(ComparisonService.store_scope(item))): item
+            for item in data
+        }
+        for data in snapshots
+    ]
+    load_time = time.perf_counter() - started
+    gc.collect()
+    held = rss_bytes() - baseline
+
+    source, destination = lookups
+    started = time.perf_counter()
+    different = sum(
+        ComparisonService._compare_items(item, destination[key], DataType.PAGES)[0]
+        for key, item in source.items()
+        if key in destination
+    )
+    compare_time = time.perf_counter() - started
+    print(f"{held} {load_time} {compare_time} {different}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100000, help="items per snapshot")
+    parser.add_argument("--stores", type=int, default=4)
+    parser.add_argument("--content-size", type=int, default=2000, help="approximate content bytes per item")
+    parser.add_argument("--shared", type=float, default=0.5, help="share of store view copies with the first store's content")
+    parser.add_argument("--changed", type=float, default=0.05, help="share of destination items that differ")
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.paths)
+        return
+
+    source = make_store_catalog(args.pages, args.stores, args.content_size, args.shared)
+    destination = [dict(item) for item in source]
+    for item in destination[::max(int(1 / args.changed), 1)] if args.changed > 0 else []:
+        item["content"] = item["content"].replace("<p>", "<p>Changed ", 1)
+
+    print(
+        f"{args.pages} items per snapshot over {args.stores} stores, ~{args.content_size} content bytes each, "
+        f"{args.shared:.0%} of store view copies sharing content\n"
+    )
+    print(f"{'items as':<12}{'RSS (MB)':>12}{'load (s)':>12}{'compare (s)':>14}{'different':>12}")
+
+    codec = SnapshotCodec.configured()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [Path(tmp) / f"{name}{codec.suffix}" for name in ("source", "destination")]
+        codec.write(paths[0], source)
+        codec.write(paths[1], destination)
+        del source, destination
+
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.compact_snapshot_memory", "--measure", mode, *map(str, paths)],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            held, load_time, compare_time, different = int(output[0]), float(output[1]), float(output[2]), int(output[3])
+            results[mode] = held
+            print(f"{mode:<12}{held / 2**20:>12.0f}{load_time:>12.2f}{compare_time:>14.2f}{different:>12}")
+
+    print(f"\ncompact items hold {results['dicts'] / max(results['compact'], 1):.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measure how long snapshot writes and loads block the event loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.event_loop_blocking --items 20000
+
+A heartbeat task wakes every millisecond while a snapshot is written and
+loaded, either inline on the event loop (as before the snapshot I/O pool)
+or through the pool. The longest and total heartbeat lag is how long
+other requests would have been stalled.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Tuple
+
+from benchmarks.snapshot_codecs import make_catalog
+from config import settings
+from models.schemas import DataType
+from services.data_storage import DataStorageService
+from services.snapshot_cache import snapshot_cache
+from utils.snapshot_io import snapshot_io
+
+HEARTBEAT_INTERVAL = 0.001
+
+
+async def heartbeat(stop: asyncio.Event, lags: list) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(max(loop.time() - started - HEARTBEAT_INTERVAL, 0.0))
+
+
+async def measure(work: Callable[[], Awaitable[None]]) -> Tuple[float, float, float]:
+    """Run work next to a heartbeat, returns (elapsed, max lag, total lag) in seconds"""
+    stop = asyncio.Event()
+    lags: list = []
+    task = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+    return elapsed, max(lags, default=0.0), sum(lags)
+
+
+async def run(args: argparse.Namespace) -> None:
+    data = make_catalog(args.items, args.content_size)
+    key = (1, DataType.PAGES.value)
+
+    async def write_inline() -> None:
+        DataStorageService._write_snapshot(1, DataType.PAGES, data, None)
+
+    async def load_inline() -> None:
+        snapshot_cache.invalidate(key)
+        DataStorageService._load_snapshot(1, DataType.PAGES)
+
+    async def write_pooled() -> None:
+        await snapshot_io.run(DataStorageService._write_snapshot, 1, DataType.PAGES, data, None)
+
+    async def load_pooled() -> None:
+        snapshot_cache.invalidate(key)
+        await DataStorageService.load_snapshot(1, DataType.PAGES)
+
+    print(f"{args.items} items, ~{args.content_size} content bytes each, "
+          f"{settings.snapshot_format}+{settings.snapshot_compression} ({settings.snapshot_backend})\n")
+    print(f"{'operation':<20}{'elapsed (s)':>14}{'max lag (ms)':>14}{'total lag (ms)':>16}")
+
+    cases = [
+        ("write, inline", write_inline),
+        ("write, pooled", write_pooled),
+        ("load, inline", load_inline),
+        ("load, pooled", load_pooled),
+    ]
+    for name, work in cases:
+        elapsed, max_lag, total_lag = await measure(work)
+        print(f"{name:<20}{elapsed:>14.3f}{max_lag * 1000:>14.1f}{total_lag * 1000:>16.1f}")
+
+    snapshot_io.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--content-size", type=int, default=2000, help="approximate content bytes per item")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.instances_data_dir = Path(tmp)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
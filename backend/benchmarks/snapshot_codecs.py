@@ -0,0 +1,81 @@
+"""Compare snapshot codecs by file size and load time.
+
+Run from the backend directory:
+
+    python -m benchmarks.snapshot_codecs --items 20000
+"""
+import argparse
+import random
+import string
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+from services.snapshot_codec import SnapshotCodec, FORMAT_SUFFIXES, COMPRESSION_SUFFIXES
+
+
+def make_catalog(count: int, content_size: int) -> List[Dict[str, Any]]:
+    """Synthetic CMS pages with HTML-ish content"""
+    rng = random.Random(42)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(500)]
+    items = []
+    for i in range(1, count + 1):
+        body = " ".join(rng.choice(words) for _ in range(content_size // 7))
+        items.append({
+            "id": i,
+            "identifier": f"page-{i}",
+            "title": f"Page {i}",
+            "page_layout": "1column",
+            "meta_title": f"Page {i} meta",
+            "meta_keywords": "",
+            "meta_description": "",
+            "content_heading": "",
+            "content": f"<div class=\"cms\"><p>{body}</p></div>",
+            "creation_time": "2024-01-01 00:00:00",
+            "update_time": f"2024-01-{i % 28 + 1:02d} 00:00:00",
+            "sort_order": "0",
+            "is_active": True,
+            "store_id": [0, 1]
+        })
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--content-size", type=int, default=2000, help="approximate content bytes per item")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_catalog(args.items, args.content_size)
+    print(f"{args.items} items, ~{args.content_size} content bytes each\n")
+    print(f"{'codec':<20}{'size (KB)':>12}{'write (s)':>12}{'load (s)':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for format in FORMAT_SUFFIXES:
+            for compression in COMPRESSION_SUFFIXES:
+                codec = SnapshotCodec(format, compression)
+                name = f"{format}+{compression}"
+                if not codec.available:
+                    print(f"{name:<20}{'(not installed)':>36}")
+                    continue
+
+                path = Path(tmp) / f"pages{codec.suffix}"
+                started = time.perf_counter()
+                codec.write(path, data)
+                write_time = time.perf_counter() - started
+
+                load_times = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    loaded = codec.read(path)
+                    load_times.append(time.perf_counter() - started)
+                assert len(loaded) == len(data)
+
+                size_kb = path.stat().st_size / 1024
+                print(f"{name:<20}{size_kb:>12.0f}{write_time:>12.3f}{min(load_times):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,12 +19,67 @@ class Settings(BaseSettings):
     # Magento API Settings
     magento_timeout: int = 30
     magento_retry_attempts: int = 3
-    magento_retry_delay: int = 1
+    magento_retry_delay: int = 1  # base delay of the exponential backoff
+    magento_retry_max_delay: float = 30.0
+    magento_rate_limit: float = 0.0  # requests per second per instance, 0 disables
+    magento_rate_burst: int = 20
+    magento_circuit_failure_threshold: int = 5  # consecutive failures before failing fast
+    magento_circuit_recovery_timeout: float = 30.0  # seconds before a trial request
+    
+    # Magento Asynchronous Bulk API
+    magento_bulk_chunk_size: int = 100  # operations per bulk request
+    magento_bulk_poll_interval: float = 2.0  # seconds between status polls
+    magento_bulk_timeout: float = 600.0  # seconds to wait for a bulk to finish
+    
+    # Magento Conditional GET Cache
+    magento_http_cache_enabled: bool = True
+    magento_http_cache_max_bytes: int = 256 * 1024 * 1024
+    
+    # Magento HTTP Connection Pool
+    magento_max_connections: int = 20
+    magento_max_keepalive_connections: int = 10
+    magento_keepalive_expiry: float = 30.0
+    magento_http2: bool = False
+    
+    # Store View Registry
+    store_view_ttl: int = 300  # seconds store views are cached per instance
+    
+    # Magento Listing Pagination
+    magento_page_size: int = 100
+    magento_page_concurrency: int = 4
+    magento_body_batch_size: int = 50  # ids per request when fetching full items
     
     # JSON Storage Settings
     json_indent: int = 2
     json_ensure_ascii: bool = False
     
+    # Snapshot Storage
+    snapshot_backend: str = "file"  # 'file' (one snapshot file per data type) or 'sqlite' (item store per instance and data type)
+    snapshot_io_workers: int = 4  # threads for snapshot reads/writes, off the event loop
+    
+    # Snapshot Storage Codec
+    snapshot_format: str = "msgpack"  # 'json' or 'msgpack' (falls back to json without msgpack)
+    snapshot_compression: str = "zstd"  # 'none', 'gzip' or 'zstd' (falls back to gzip without zstandard)
+    snapshot_compression_level: int = 3
+    snapshot_cache_max_bytes: int = 512 * 1024 * 1024  # memory budget of loaded snapshots
+    snapshot_compact_items: bool = True  # keep loaded snapshots as compact rows with compressed content
+    
+    # Snapshot History (content-addressed item bodies plus one manifest per version)
+    snapshot_history_enabled: bool = True
+    snapshot_history_retention: int = 30  # versions kept per instance and data type
+    snapshot_change_retention_days: int = 30  # days entries of the change feed are kept
+    
+    # Snapshot Refresh
+    snapshot_incremental_refresh: bool = True
+    snapshot_streaming: bool = False  # stream full downloads to disk (flat memory, sequential pages)
+    snapshot_reconcile_interval: int = 3600  # seconds between two-phase (metadata listing) refreshes
+    snapshot_max_age: int = 900  # seconds before a snapshot is stale and revalidated in the background, 0 = never
+    snapshot_warm_interval: int = 0  # seconds between background passes keeping active instances fresh (e.g. 300), 0 disables
+    
+    # Fleet Refresh (many instances at once)
+    fleet_refresh_concurrency: int = 6  # snapshot refreshes running at once
+    fleet_refresh_per_instance: int = 2  # of which against the same instance
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,96 @@
+import time
+from typing import Dict, Any, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a Magento instance whose circuit is open"""
+
+    def __init__(self, base_url: str, retry_in: float):
+        self.base_url = base_url
+        self.retry_in = retry_in
+        super().__init__(
+            f"Magento instance {base_url} is unavailable (circuit open after repeated failures), "
+            f"retrying in {retry_in:.0f}s"
+        )
+
+
+class CircuitBreaker:
+    """Per-instance circuit breaker.
+
+    closed: requests flow, consecutive failures are counted.
+    open: after `failure_threshold` consecutive failures every request
+        fails fast with CircuitOpenError for `recovery_timeout` seconds.
+    half_open: after the timeout a single trial request is let through;
+        success closes the circuit, failure opens it again. A trial that
+        ends with neither (cancelled, unexpected error) must hand its slot
+        back with release_trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, base_url: str, failure_threshold: int, recovery_timeout: float):
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        # Number of trials started; identifies the trial in flight
+        self._trials = 0
+
+    def _retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def before_request(self) -> Optional[int]:
+        """Raise CircuitOpenError if the instance should not be called right now.
+
+        Returns a trial token when the request is the half-open trial, None
+        otherwise; pass it to release_trial once the attempt is over.
+        """
+        if self.state == self.OPEN:
+            if self._retry_in() > 0:
+                raise CircuitOpenError(self.base_url, self._retry_in())
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.base_url, self.recovery_timeout)
+            self._trial_in_flight = True
+            self._trials += 1
+            return self._trials
+
+        return None
+
+    def release_trial(self, trial: Optional[int]) -> None:
+        """Free the half-open trial slot if that trial recorded no outcome"""
+        if trial is not None and trial == self._trials:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failure_count += 1
+        self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        """Current state, for the instances API"""
+        return {
+            "state": self.state,
+            "failure_count": self.failure_count,
+            "failure_threshold": self.failure_threshold,
+            "retry_in": round(self._retry_in(), 1) if self.state == self.OPEN else None
+        }
@@ -0,0 +1,188 @@
+import httpx
+from typing import Dict, Any, AsyncIterator, Optional
+import asyncio
+from contextlib import asynccontextmanager
+
+from config import settings
+from integrations.magento_client import MagentoClient
+from integrations.rate_limiter import RateLimiter
+from integrations.circuit_breaker import CircuitBreaker
+from integrations.http_cache import response_cache
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support needs the optional h2 package"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PooledClient:
+    """An instance's httpx client and the number of requests currently using it"""
+
+    def __init__(self, client: httpx.AsyncClient, base_url: str):
+        self.client = client
+        self.base_url = base_url
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class ConnectionPool:
+    """Long-lived httpx clients, one connection pool per Magento instance.
+
+    Requests borrow the current client of their instance through lease().
+    A client replaced after a URL change, or dropped by invalidate(), is
+    only closed once the requests still using it are done.
+    """
+
+    def __init__(self):
+        self._clients: Dict[int, PooledClient] = {}
+        self._page_semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._rate_limiters: Dict[int, RateLimiter] = {}
+        self._circuit_breakers: Dict[int, CircuitBreaker] = {}
+        # Clients being closed once idle, kept until close() awaits them
+        self._closing: Dict[asyncio.Task, PooledClient] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _create_http_client() -> httpx.AsyncClient:
+        """Create a pooled client using the configured limits"""
+        limits = httpx.Limits(
+            max_connections=settings.magento_max_connections,
+            max_keepalive_connections=settings.magento_max_keepalive_connections,
+            keepalive_expiry=settings.magento_keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            timeout=settings.magento_timeout,
+            limits=limits,
+            http2=settings.magento_http2 and _http2_available()
+        )
+
+    @staticmethod
+    async def _close_when_idle(pooled: PooledClient) -> None:
+        await pooled.idle.wait()
+        await pooled.client.aclose()
+
+    def _retire(self, pooled: PooledClient) -> None:
+        """Close a client that is no longer handed out once its requests are done"""
+        # Forget earlier closes that went through; failed ones stay for close() to report
+        for task in [task for task in self._closing if task.done() and not task.cancelled() and task.exception() is None]:
+            del self._closing[task]
+        task = asyncio.ensure_future(self._close_when_idle(pooled))
+        self._closing[task] = pooled
+
+    def _current(self, instance_id: int, base_url: str) -> Optional[PooledClient]:
+        pooled = self._clients.get(instance_id)
+        if pooled is not None and not pooled.client.is_closed and pooled.base_url == base_url:
+            return pooled
+        return None
+
+    async def get_http_client(self, instance_id: int, base_url: str) -> PooledClient:
+        """Get the pooled client for an instance, creating it on first use or after a URL change"""
+        base_url = base_url.rstrip('/')
+        pooled = self._current(instance_id, base_url)
+        if pooled is not None:
+            return pooled
+
+        async with self._lock:
+            # Another request may have replaced it while we waited
+            pooled = self._current(instance_id, base_url)
+            if pooled is not None:
+                return pooled
+
+            previous = self._clients.get(instance_id)
+            if previous is not None:
+                # Instance URL changed, drop the connections to the old host
+                self._retire(previous)
+            pooled = PooledClient(self._create_http_client(), base_url)
+            self._clients[instance_id] = pooled
+            return pooled
+
+    @asynccontextmanager
+    async def lease(self, instance_id: int, base_url: str) -> AsyncIterator[httpx.AsyncClient]:
+        """Borrow the pooled client of an instance for one request"""
+        pooled = await self.get_http_client(instance_id, base_url)
+        pooled.in_flight += 1
+        pooled.idle.clear()
+        try:
+            yield pooled.client
+        finally:
+            pooled.in_flight -= 1
+            if pooled.in_flight == 0:
+                pooled.idle.set()
+
+    def client_for(self, instance: Any) -> MagentoClient:
+        """Build a MagentoClient for an instance backed by its shared pool"""
+        instance_id, base_url = instance.id, str(instance.url)
+        page_semaphore = self._page_semaphores.setdefault(
+            instance.id, asyncio.Semaphore(settings.magento_page_concurrency)
+        )
+        rate_limiter = self._rate_limiters.get(instance.id)
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(settings.magento_rate_limit, settings.magento_rate_burst)
+            self._rate_limiters[instance.id] = rate_limiter
+        return MagentoClient(
+            base_url=str(instance.url),
+            token=instance.api_token,
+            http_lease=lambda: self.lease(instance_id, base_url),
+            page_semaphore=page_semaphore,
+            rate_limiter=rate_limiter,
+            circuit_breaker=self.get_circuit_breaker(instance),
+            response_cache=response_cache if settings.magento_http_cache_enabled else None
+        )
+    
+    def get_circuit_breaker(self, instance: Any) -> CircuitBreaker:
+        """Get the circuit breaker of an instance, creating it on first use"""
+        breaker = self._circuit_breakers.get(instance.id)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                str(instance.url).rstrip('/'),
+                settings.magento_circuit_failure_threshold,
+                settings.magento_circuit_recovery_timeout
+            )
+            self._circuit_breakers[instance.id] = breaker
+        return breaker
+
+    async def invalidate(self, instance_id: int) -> None:
+        """Forget the pool of an instance (e.g. after URL change or delete); its client closes once idle"""
+        async with self._lock:
+            pooled = self._clients.pop(instance_id, None)
+            self._page_semaphores.pop(instance_id, None)
+            self._rate_limiters.pop(instance_id, None)
+            self._circuit_breakers.pop(instance_id, None)
+            if pooled is not None:
+                self._retire(pooled)
+
+    async def close(self) -> None:
+        """Close every pooled client, called on application shutdown.
+
+        Requests still running get up to magento_timeout to finish before
+        their clients are closed under them.
+        """
+        async with self._lock:
+            for pooled in self._clients.values():
+                self._retire(pooled)
+            self._clients.clear()
+            self._page_semaphores.clear()
+            self._rate_limiters.clear()
+            self._circuit_breakers.clear()
+
+        closing = dict(self._closing)
+        self._closing.clear()
+        if not closing:
+            return
+
+        _, pending = await asyncio.wait(closing, timeout=settings.magento_timeout)
+        for task in pending:
+            task.cancel()
+            await closing[task].client.aclose()
+        results = await asyncio.gather(*closing, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+
+connection_pool = ConnectionPool()
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import settings
+from utils.snapshot_io import snapshot_io, atomic_open
+
+
+class ResponseCache:
+    """On-disk cache of Magento GET responses keyed by URL + params.
+
+    Responses carrying an ETag or Last-Modified validator are stored so
+    later reads can be sent as conditional requests; a 304 reuses the
+    cached body. Total size is bounded by `max_bytes` with LRU eviction.
+
+    Each entry is one file: a JSON header line with the validators, then
+    the body. Validators are kept in memory, bodies are only read back on
+    a 304; all file work runs in the snapshot I/O pool.
+    """
+
+    SUFFIX = ".entry"
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> {size, etag, last_modified}, oldest access first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]], token: str) -> str:
+        """Cache key of a request; the token is part of it so instances never share entries"""
+        raw = json.dumps(
+            [url, sorted((str(k), str(v)) for k, v in (params or {}).items()), token]
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.SUFFIX}"
+
+    def _scan(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Read the header line of every entry on disk (oldest access first)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        files = sorted(self.cache_dir.glob(f"*{self.SUFFIX}"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            try:
+                with open(path, 'rb') as f:
+                    header = json.loads(f.readline())
+                size = path.stat().st_size
+            except (OSError, ValueError):
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((
+                path.name[:-len(self.SUFFIX)],
+                {"size": size, "etag": header.get("etag"), "last_modified": header.get("last_modified")}
+            ))
+        return entries
+
+    async def _load_index(self) -> None:
+        """Rebuild the in-memory index from the files on disk, once"""
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for key, entry in await snapshot_io.run(self._scan):
+                self._entries[key] = entry
+                self._size += entry["size"]
+            self._loaded = True
+
+    async def validators(self, key: str) -> Dict[str, str]:
+        """Conditional request headers for a cached response, empty if there is none"""
+        await self._load_index()
+        entry = self._entries.get(key)
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _read_body(self, key: str) -> str:
+        with open(self._path(key), 'rb') as f:
+            f.readline()
+            return f.read().decode("utf-8")
+
+    async def get_body(self, key: str) -> Optional[str]:
+        """Cached body of a response the server answered 304 for, None if it is gone"""
+        if key not in self._entries:
+            return None
+        try:
+            body = await snapshot_io.run(self._read_body, key)
+        except (OSError, ValueError):
+            await self._remove(key)
+            return None
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return body
+
+    def _write(self, key: str, header: bytes, body: bytes) -> None:
+        with atomic_open(self._path(key)) as f:
+            f.write(header)
+            f.write(body)
+
+    async def put(self, key: str, etag: Optional[str], last_modified: Optional[str], body: str) -> None:
+        """Store a response that carries at least one validator"""
+        if not etag and not last_modified:
+            return
+        await self._load_index()
+
+        header = json.dumps({"etag": etag, "last_modified": last_modified}).encode("utf-8") + b"\n"
+        data = body.encode("utf-8")
+        size = len(header) + len(data)
+        if size > self.max_bytes:
+            return
+
+        await snapshot_io.run(self._write, key, header, data)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous["size"]
+        self._entries[key] = {"size": size, "etag": etag, "last_modified": last_modified}
+        self._size += size
+
+        evicted = []
+        while self._size > self.max_bytes and self._entries:
+            oldest, entry = self._entries.popitem(last=False)
+            self._size -= entry["size"]
+            evicted.append(oldest)
+            self.evictions += 1
+        if evicted:
+            await snapshot_io.run(self._unlink, evicted)
+
+    def _unlink(self, keys: List[str]) -> None:
+        for key in keys:
+            self._path(key).unlink(missing_ok=True)
+
+    async def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry["size"]
+        await snapshot_io.run(self._unlink, [key])
+
+    async def stats(self) -> Dict[str, Any]:
+        await self._load_index()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes
+        }
+
+
+response_cache = ResponseCache(
+    settings.data_dir / "http_cache",
+    settings.magento_http_cache_max_bytes
+)
@@ -0,0 +1,228 @@
+import json
+import re
+from typing import List, Dict, Any, Optional
+
+
+# Rest of a JSON string after its opening quote, up to the closing quote
+# or a backslash cut off at the end of the chunk
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+# Next character that changes nesting or enters a string
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+# A number, true, false or null
+_SCALAR = re.compile(r'[^\s,\]}]*')
+_OPENERS = {"]": "[", "}": "{"}
+# Returned by _read_value while a value continues in the next chunk
+_INCOMPLETE = object()
+
+
+class SearchResponseParser:
+    """Incremental parser for Magento search responses.
+
+    Text chunks are fed as they arrive; elements of the top-level "items"
+    array are returned as soon as they are complete, so the full response
+    never has to be held in memory. Other top-level values (total_count,
+    search_criteria) are collected in `fields`.
+
+    The end of each value is found by tracking nesting and string state
+    across chunks, so a value is scanned and decoded exactly once however
+    many chunks it spans, and malformed JSON fails as soon as it is seen.
+    """
+
+    _WHITESPACE = " \t\n\r"
+
+    def __init__(self, array_key: str = "items"):
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self._buffer = ""
+        self._pos = 0
+        # start -> key -> colon -> value -> (comma -> key | end);
+        # while inside the items array: array_item <-> array_sep
+        self._state = "start"
+        self._key = None
+        # Value being scanned: earlier chunks of it, where it starts in the
+        # current chunk, where scanning resumes and the nesting/string state
+        self._scanning = False
+        self._parts: List[str] = []
+        self._value_start = 0
+        self._scan_pos = 0
+        self._scalar = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def _skip_whitespace(self) -> bool:
+        """Advance past whitespace, returns False if the buffer is exhausted"""
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in self._WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buffer)
+
+    def _scan(self) -> Optional[int]:
+        """End offset of the value being scanned, None if it continues in the next chunk"""
+        buffer = self._buffer
+        i = self._scan_pos
+
+        if self._scalar:
+            i = _SCALAR.match(buffer, i).end()
+            # A number at the very end of the buffer may still be growing
+            if i == len(buffer):
+                self._scan_pos = i
+                return None
+            return i
+
+        while True:
+            if self._in_string:
+                if self._escape:
+                    if i == len(buffer):
+                        break
+                    i += 1
+                    self._escape = False
+                i = _STRING_BODY.match(buffer, i).end()
+                if i == len(buffer):
+                    break
+                if buffer[i] == "\\":
+                    # Escape sequence cut off at the end of the chunk
+                    self._escape = True
+                    i += 1
+                    break
+                self._in_string = False
+                i += 1
+                if not self._stack:
+                    return i
+                continue
+
+            match = _STRUCTURE.search(buffer, i)
+            if match is None:
+                i = len(buffer)
+                break
+            char = match.group()
+            i = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._stack.append(char)
+            elif not self._stack or self._stack.pop() != _OPENERS[char]:
+                raise ValueError(f"Unexpected {char!r} at offset {i - 1}")
+            elif not self._stack:
+                return i
+
+        self._scan_pos = i
+        return None
+
+    def _read_value(self) -> Any:
+        """Decode the JSON value at the current position, or _INCOMPLETE if it continues in the next chunk"""
+        if not self._scanning:
+            self._scanning = True
+            self._value_start = self._scan_pos = self._pos
+            self._scalar = self._buffer[self._pos] not in '{["'
+
+        end = self._scan()
+        if end is None:
+            self._pos = len(self._buffer)
+            return _INCOMPLETE
+
+        text = self._buffer[self._value_start:end]
+        if self._parts:
+            text = "".join(self._parts) + text
+            self._parts = []
+        self._scanning = False
+        self._pos = end
+        return json.loads(text)
+
+    def _expect(self, char: str) -> None:
+        if self._buffer[self._pos] != char:
+            raise ValueError(
+                f"Unexpected {self._buffer[self._pos]!r} at offset {self._pos}, expected {char!r}"
+            )
+        self._pos += 1
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of response text and return newly completed items"""
+        self._buffer = chunk
+        self._pos = 0
+        self._value_start = self._scan_pos = 0
+        items = []
+
+        # A value started in an earlier chunk continues at offset 0, whitespace included
+        while self._scanning or self._skip_whitespace():
+            state = self._state
+
+            if state == "start":
+                self._expect("{")
+                self._state = "key"
+
+            elif state == "key":
+                if not self._scanning:
+                    char = self._buffer[self._pos]
+                    if char == "}":
+                        self._pos += 1
+                        self._state = "end"
+                        continue
+                    if char != '"':
+                        raise ValueError(f"Unexpected {char!r} at offset {self._pos}, expected a key")
+                key = self._read_value()
+                if key is _INCOMPLETE:
+                    break
+                self._key = key
+                self._state = "colon"
+
+            elif state == "colon":
+                self._expect(":")
+                if self._key == self.array_key:
+                    self._state = "array_start"
+                else:
+                    self._state = "value"
+
+            elif state == "value":
+                value = self._read_value()
+                if value is _INCOMPLETE:
+                    break
+                self.fields[self._key] = value
+                self._state = "comma"
+
+            elif state == "comma":
+                if self._buffer[self._pos] == "}":
+                    self._pos += 1
+                    self._state = "end"
+                    continue
+                self._expect(",")
+                self._state = "key"
+
+            elif state == "array_start":
+                if self._buffer[self._pos] == "n":
+                    # "items": null
+                    self._state = "value"
+                    continue
+                self._expect("[")
+                self._state = "array_item"
+
+            elif state == "array_item":
+                if not self._scanning and self._buffer[self._pos] == "]":
+                    self._pos += 1
+                    self._state = "comma"
+                    continue
+                item = self._read_value()
+                if item is _INCOMPLETE:
+                    break
+                items.append(item)
+                self._state = "array_sep"
+
+            elif state == "array_sep":
+                if self._buffer[self._pos] == "]":
+                    self._pos += 1
+                    self._state = "comma"
+                    continue
+                self._expect(",")
+                self._state = "array_item"
+
+            else:  # end
+                raise ValueError(f"Unexpected data after end of response at offset {self._pos}")
+
+        if self._scanning:
+            # Keep the scanned part of the value; the rest of the chunk was consumed
+            self._parts.append(self._buffer[self._value_start:])
+        return items
+
+    def close(self) -> None:
+        """Check the response was complete"""
+        if self._state != "end":
+            raise ValueError("Incomplete search response")
@@ -1,115 +1,463 @@
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncGenerator, AsyncContextManager, Callable
 import asyncio
+import math
+import random
+from contextlib import aclosing, asynccontextmanager, nullcontext
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from urllib.parse import urljoin
 import json
 
 from config import settings
+from integrations.json_stream import SearchResponseParser
+from integrations.rate_limiter import RateLimiter
+from integrations.circuit_breaker import CircuitBreaker
+from integrations.http_cache import ResponseCache
+
+
+# Fields fetched by the metadata listing pass; enough to tell whether an
+# item is new or changed without downloading its content
+LISTING_FIELDS = ["id", "identifier", "update_time", "is_active", "store_id"]
+
+# Magento_AsynchronousOperations operation statuses
+BULK_STATUS_COMPLETE = 1
+BULK_STATUS_FAILED_RETRIABLY = 2
+BULK_STATUS_FAILED_NOT_RETRIABLY = 3
+BULK_STATUS_OPEN = 4
+BULK_STATUS_REJECTED = 5
 
 
 class MagentoClient:
-    def __init__(self, base_url: str, token: str):
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        http_lease: Optional[Callable[[], AsyncContextManager[httpx.AsyncClient]]] = None,
+        page_semaphore: Optional[asyncio.Semaphore] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
         self.base_url = base_url.rstrip('/')
         self.token = token
+        # Borrows the shared pooled client for each request (see
+        # integrations.connection_pool), or always uses http_client; when
+        # neither is provided a short-lived client is opened per request
+        if http_lease is None and http_client is not None:
+            http_lease = lambda: nullcontext(http_client)
+        self.http_lease = http_lease
+        # Caps concurrent listing page requests, shared per instance by the pool
+        self.page_semaphore = page_semaphore or asyncio.Semaphore(settings.magento_page_concurrency)
+        # Requests/sec budget for the instance, shared per instance by the pool
+        self.rate_limiter = rate_limiter or RateLimiter(settings.magento_rate_limit, settings.magento_rate_burst)
+        # Fails fast while the instance is known to be down, shared per instance by the pool
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            self.base_url,
+            settings.magento_circuit_failure_threshold,
+            settings.magento_circuit_recovery_timeout
+        )
+        # Conditional GET cache (ETag / Last-Modified); None disables caching
+        self.response_cache = response_cache
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
         
+    @staticmethod
+    def _is_retryable(error: httpx.HTTPError) -> bool:
+        """Connection errors, 429 and 5xx responses are worth retrying"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status_code = error.response.status_code
+            return status_code == 429 or status_code >= 500
+        return isinstance(error, httpx.RequestError)
+    
+    @staticmethod
+    def _is_instance_failure(error: httpx.HTTPError) -> bool:
+        """Connection errors and 5xx responses count against the circuit breaker"""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.RequestError)
+    
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        """Seconds to wait according to a Retry-After header, if any"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    
+    @staticmethod
+    def _backoff_delay(retry_count: int, error: httpx.HTTPError) -> float:
+        """Delay before the next attempt.
+        
+        Honors Retry-After when the server sent one, otherwise full-jitter
+        exponential backoff: uniform(0, min(max_delay, base * 2^attempt)).
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = MagentoClient._retry_after(error.response)
+            if retry_after is not None:
+                return min(retry_after, settings.magento_retry_max_delay)
+        
+        ceiling = min(settings.magento_retry_max_delay, settings.magento_retry_delay * (2 ** retry_count))
+        return random.uniform(0, ceiling)
+    
+    async def _handle_retry(self, error: httpx.HTTPError, retry_count: int) -> None:
+        """Re-raise the error if it should not be retried, otherwise wait before retrying"""
+        if self._is_instance_failure(error):
+            self.circuit_breaker.record_failure()
+        else:
+            # The instance answered, it is up
+            self.circuit_breaker.record_success()
+        
+        if not self._is_retryable(error) or retry_count >= settings.magento_retry_attempts:
+            raise error
+        
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+            self.rate_limiter.penalize()
+        
+        await asyncio.sleep(self._backoff_delay(retry_count, error))
+    
     async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
-        json_data: Optional[Dict] = None,
+        json_data: Optional[Any] = None,
         params: Optional[Dict] = None,
-        retry_count: int = 0
+        api_path: str = "rest/V1"
     ) -> Any:
-        url = urljoin(f"{self.base_url}/rest/V1/", endpoint.lstrip('/'))
+        url = urljoin(f"{self.base_url}/{api_path}/", endpoint.lstrip('/'))
+        retry_count = 0
         
-        async with httpx.AsyncClient(timeout=settings.magento_timeout) as client:
+        cache_key = None
+        headers = self.headers
+        if method == "GET" and self.response_cache is not None:
+            cache_key = ResponseCache.make_key(url, params, self.token)
+            headers = {**self.headers, **await self.response_cache.validators(cache_key)}
+        
+        while True:
+            trial = self.circuit_breaker.before_request()
             try:
-                response = await client.request(
+                await self.rate_limiter.acquire()
+                response = await self._send(
                     method=method,
                     url=url,
-                    headers=self.headers,
+                    headers=headers,
                     json=json_data,
                     params=params
                 )
+                if response.status_code == 304 and cache_key is not None:
+                    # Not modified, reuse the cached body
+                    self.circuit_breaker.record_success()
+                    self.rate_limiter.reward()
+                    body = await self.response_cache.get_body(cache_key)
+                    if body is not None:
+                        self.response_cache.hits += 1
+                        return json.loads(body) if body else None
+                    # The cached body is gone, ask again unconditionally
+                    headers = self.headers
+                    continue
+                
                 response.raise_for_status()
+                self.circuit_breaker.record_success()
+                self.rate_limiter.reward()
+                
+                if cache_key is not None:
+                    self.response_cache.misses += 1
+                    await self.response_cache.put(
+                        cache_key,
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                        response.text
+                    )
                 
                 if response.content:
                     return response.json()
                 return None
                 
-            except httpx.HTTPStatusError as e:
-                if retry_count < settings.magento_retry_attempts and e.response.status_code >= 500:
-                    await asyncio.sleep(settings.magento_retry_delay * (retry_count + 1))
-                    return await self._make_request(method, endpoint, json_data, params, retry_count + 1)
-                raise
-            except httpx.RequestError as e:
-                if retry_count < settings.magento_retry_attempts:
-                    await asyncio.sleep(settings.magento_retry_delay * (retry_count + 1))
-                    return await self._make_request(method, endpoint, json_data, params, retry_count + 1)
-                raise
+            except httpx.HTTPError as e:
+                error = e
+            finally:
+                # Cancelled or failed otherwise: don't leave the half-open trial taken
+                self.circuit_breaker.release_trial(trial)
+            
+            await self._handle_retry(error, retry_count)
+            retry_count += 1
     
-    async def get_store_views(self) -> List[Dict[str, Any]]:
-        """Get all store views"""
-        return await self._make_request("GET", "store/storeViews")
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the shared pool, or a one-off client if none is set"""
+        if self.http_lease is not None:
+            async with self.http_lease() as client:
+                return await client.request(method=method, url=url, **kwargs)
+        
+        async with httpx.AsyncClient(timeout=settings.magento_timeout) as client:
+            return await client.request(method=method, url=url, **kwargs)
     
-    async def get_cms_blocks(self, page_size: int = 100) -> List[Dict[str, Any]]:
-        """Get all CMS blocks"""
-        all_blocks = []
-        current_page = 1
+    @asynccontextmanager
+    async def _stream(self, method: str, url: str, **kwargs):
+        """Open a streamed response through the shared pool, or a one-off client"""
+        if self.http_lease is not None:
+            async with self.http_lease() as client:
+                async with client.stream(method, url, **kwargs) as response:
+                    yield response
+            return
+        
+        async with httpx.AsyncClient(timeout=settings.magento_timeout) as client:
+            async with client.stream(method, url, **kwargs) as response:
+                yield response
+    
+    async def _stream_search_page(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        page_info: Dict[str, Any]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream the items of one search page as they are parsed off the wire.
+        
+        Top-level fields other than items (e.g. total_count) are stored in
+        page_info once the page is complete. Failures are only retried if
+        no item has been yielded yet.
+        """
+        url = urljoin(f"{self.base_url}/rest/V1/", endpoint.lstrip('/'))
+        retry_count = 0
         
         while True:
-            params = {
-                "searchCriteria[pageSize]": page_size,
-                "searchCriteria[currentPage]": current_page
-            }
-            
-            result = await self._make_request("GET", "cmsBlock/search", params=params)
-            
-            if not result or "items" not in result:
-                break
-                
-            all_blocks.extend(result["items"])
-            
-            # Check if there are more pages
-            total_count = result.get("total_count", 0)
-            if len(all_blocks) >= total_count:
-                break
+            parser = SearchResponseParser()
+            yielded = False
+            trial = self.circuit_breaker.before_request()
+            try:
+                await self.rate_limiter.acquire()
+                async with self._stream("GET", url, headers=self.headers, params=params) as response:
+                    response.raise_for_status()
+                    self.circuit_breaker.record_success()
+                    self.rate_limiter.reward()
+                    async for chunk in response.aiter_text():
+                        for item in parser.feed(chunk):
+                            yielded = True
+                            yield item
+                parser.close()
+                page_info.update(parser.fields)
+                return
                 
-            current_page += 1
+            except httpx.HTTPError as e:
+                if yielded:
+                    raise
+                error = e
+            finally:
+                self.circuit_breaker.release_trial(trial)
             
-        return all_blocks
+            await self._handle_retry(error, retry_count)
+            retry_count += 1
     
-    async def get_cms_pages(self, page_size: int = 100) -> List[Dict[str, Any]]:
-        """Get all CMS pages"""
-        all_pages = []
+    async def _stream_search(
+        self,
+        endpoint: str,
+        page_size: Optional[int] = None,
+        params: Optional[Dict] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream every item of a searchCriteria listing, one page at a time.
+        
+        Unlike _search_all nothing is accumulated: memory stays flat
+        regardless of catalog size, at the cost of fetching pages
+        sequentially.
+        """
+        page_size = page_size or settings.magento_page_size
         current_page = 1
+        fetched = 0
         
         while True:
-            params = {
-                "searchCriteria[pageSize]": page_size,
-                "searchCriteria[currentPage]": current_page
-            }
+            page_params = dict(params or {})
+            page_params["searchCriteria[pageSize]"] = page_size
+            page_params["searchCriteria[currentPage]"] = current_page
             
-            result = await self._make_request("GET", "cmsPage/search", params=params)
+            page_info = {}
+            page_count = 0
+            # Closed right away if the consumer stops early, so the response
+            # and its pooled connection are released
+            async with aclosing(self._stream_search_page(endpoint, page_params, page_info)) as page_items:
+                async for item in page_items:
+                    page_count += 1
+                    yield item
             
-            if not result or "items" not in result:
+            fetched += page_count
+            if page_count == 0 or fetched >= page_info.get("total_count", 0):
                 break
-                
-            all_pages.extend(result["items"])
             
-            # Check if there are more pages
-            total_count = result.get("total_count", 0)
-            if len(all_pages) >= total_count:
-                break
-                
             current_page += 1
-            
-        return all_pages
+    
+    async def get_store_views(self) -> List[Dict[str, Any]]:
+        """Get all store views"""
+        return await self._make_request("GET", "store/storeViews")
+    
+    @staticmethod
+    def _filter_params(filters: List[Tuple[str, Any, str]]) -> Dict[str, Any]:
+        """Build searchCriteria filter groups from (field, value, condition_type).
+        
+        Each filter gets its own group, so the filters are ANDed together.
+        """
+        params = {}
+        for group, (field, value, condition_type) in enumerate(filters):
+            prefix = f"searchCriteria[filterGroups][{group}][filters][0]"
+            params[f"{prefix}[field]"] = field
+            params[f"{prefix}[value]"] = value
+            params[f"{prefix}[conditionType]"] = condition_type
+        return params
+    
+    @staticmethod
+    def _listing_params(updated_since: Optional[str] = None) -> Dict[str, Any]:
+        """Search params restricting a listing to items updated at/after a timestamp"""
+        if not updated_since:
+            return {}
+        # gteq rather than gt: items saved in the same second as the last
+        # snapshot's newest item must not be missed
+        return MagentoClient._filter_params([("update_time", updated_since, "gteq")])
+    
+    async def _search_page(
+        self,
+        endpoint: str,
+        current_page: int,
+        page_size: int,
+        params: Optional[Dict] = None,
+        fields: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Fetch a single page of a searchCriteria listing"""
+        page_params = dict(params or {})
+        page_params["searchCriteria[pageSize]"] = page_size
+        page_params["searchCriteria[currentPage]"] = current_page
+        if fields:
+            page_params["fields"] = fields
+        
+        async with self.page_semaphore:
+            return await self._make_request("GET", endpoint, params=page_params)
+    
+    async def _search_all(
+        self,
+        endpoint: str,
+        page_size: Optional[int] = None,
+        params: Optional[Dict] = None,
+        item_fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch every page of a searchCriteria listing.
+        
+        The first page tells us total_count, the remaining pages are then
+        requested concurrently (bounded by page_semaphore) and reassembled
+        in page order. item_fields projects each item down to the given
+        fields using Magento's fields= parameter.
+        """
+        page_size = page_size or settings.magento_page_size
+        fields = f"items[{','.join(item_fields)}],total_count" if item_fields else None
+        
+        first = await self._search_page(endpoint, 1, page_size, params, fields)
+        if not first or "items" not in first:
+            return []
+        
+        items = list(first["items"])
+        total_count = first.get("total_count", 0)
+        total_pages = math.ceil(total_count / page_size) if page_size else 1
+        
+        if total_pages <= 1:
+            return items
+        
+        results = await asyncio.gather(*[
+            self._search_page(endpoint, current_page, page_size, params, fields)
+            for current_page in range(2, total_pages + 1)
+        ])
+        
+        for result in results:
+            if result and "items" in result:
+                items.extend(result["items"])
+        
+        return items
+    
+    async def get_cms_blocks(
+        self,
+        page_size: Optional[int] = None,
+        updated_since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get all CMS blocks, optionally only those updated since a timestamp"""
+        return await self._search_all(
+            "cmsBlock/search",
+            page_size=page_size,
+            params=self._listing_params(updated_since)
+        )
+    
+    async def get_cms_pages(
+        self,
+        page_size: Optional[int] = None,
+        updated_since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get all CMS pages, optionally only those updated since a timestamp"""
+        return await self._search_all(
+            "cmsPage/search",
+            page_size=page_size,
+            params=self._listing_params(updated_since)
+        )
+    
+    def stream_cms_blocks(self, page_size: Optional[int] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream all CMS blocks without holding the catalog in memory"""
+        return self._stream_search("cmsBlock/search", page_size=page_size)
+    
+    def stream_cms_pages(self, page_size: Optional[int] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream all CMS pages without holding the catalog in memory"""
+        return self._stream_search("cmsPage/search", page_size=page_size)
+    
+    async def get_cms_block_listing(self) -> List[Dict[str, Any]]:
+        """List lightweight metadata (no content) of every CMS block"""
+        return await self._search_all("cmsBlock/search", item_fields=LISTING_FIELDS)
+    
+    async def get_cms_page_listing(self) -> List[Dict[str, Any]]:
+        """List lightweight metadata (no content) of every CMS page"""
+        return await self._search_all("cmsPage/search", item_fields=LISTING_FIELDS)
+    
+    async def _search_by_ids(
+        self,
+        endpoint: str,
+        id_field: str,
+        ids: List[int],
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch full items by id, in concurrent batches of batch_size ids"""
+        batch_size = batch_size or settings.magento_body_batch_size
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+        
+        results = await asyncio.gather(*[
+            self._search_all(
+                endpoint,
+                page_size=len(batch),
+                params=self._filter_params([(id_field, ",".join(str(i) for i in batch), "in")])
+            )
+            for batch in batches
+        ])
+        
+        return [item for items in results for item in items]
+    
+    async def get_cms_blocks_by_ids(
+        self,
+        block_ids: List[int],
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Get full CMS blocks for the given ids"""
+        return await self._search_by_ids("cmsBlock/search", "block_id", block_ids, batch_size)
+    
+    async def get_cms_pages_by_ids(
+        self,
+        page_ids: List[int],
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Get full CMS pages for the given ids"""
+        return await self._search_by_ids("cmsPage/search", "page_id", page_ids, batch_size)
     
     async def get_cms_block(self, block_id: int) -> Dict[str, Any]:
         """Get a single CMS block by ID"""
@@ -133,4 +481,58 @@ class MagentoClient:
     
     async def update_cms_page(self, page_id: int, page_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update an existing CMS page"""
-        return await self._make_request("PUT", f"cmsPage/{page_id}", {"page": page_data})
\ No newline at end of file
+        return await self._make_request("PUT", f"cmsPage/{page_id}", {"page": page_data})
+    
+    async def _bulk_request(
+        self,
+        method: str,
+        endpoint: str,
+        payloads: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Submit operations through Magento's asynchronous bulk API"""
+        return await self._make_request(method, endpoint, payloads, api_path="rest/async/bulk/V1")
+    
+    async def bulk_create_cms_blocks(self, blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Queue creation of several CMS blocks, returns bulk_uuid and request_items"""
+        return await self._bulk_request("POST", "cmsBlock", [{"block": block} for block in blocks])
+    
+    async def bulk_create_cms_pages(self, pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Queue creation of several CMS pages, returns bulk_uuid and request_items"""
+        return await self._bulk_request("POST", "cmsPage", [{"page": page} for page in pages])
+    
+    async def bulk_update_cms_blocks(self, blocks: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Queue updates of several CMS blocks given as (block_id, block_data)"""
+        return await self._bulk_request(
+            "PUT", "cmsBlock/byId",
+            [{"id": block_id, "block": block} for block_id, block in blocks]
+        )
+    
+    async def bulk_update_cms_pages(self, pages: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Queue updates of several CMS pages given as (page_id, page_data)"""
+        return await self._bulk_request(
+            "PUT", "cmsPage/byId",
+            [{"id": page_id, "page": page} for page_id, page in pages]
+        )
+    
+    async def get_bulk_status(self, bulk_uuid: str) -> Dict[str, Any]:
+        """Get the detailed status of a bulk, including operations_list"""
+        return await self._make_request("GET", f"bulk/{bulk_uuid}/status")
+    
+    async def wait_for_bulk(self, bulk_uuid: str) -> List[Dict[str, Any]]:
+        """Poll a bulk until no operation is open anymore (or the timeout is hit).
+        
+        Returns the operations_list of the last status response.
+        """
+        deadline = asyncio.get_running_loop().time() + settings.magento_bulk_timeout
+        
+        while True:
+            status = await self.get_bulk_status(bulk_uuid)
+            operations = (status or {}).get("operations_list") or []
+            
+            pending = any(op.get("status") == BULK_STATUS_OPEN for op in operations)
+            if operations and not pending:
+                return operations
+            if asyncio.get_running_loop().time() >= deadline:
+                return operations
+            
+            await asyncio.sleep(settings.magento_bulk_poll_interval)
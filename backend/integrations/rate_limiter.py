@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Adaptive token bucket limiting requests per second to one Magento instance.
+
+    Tokens refill at `rate` per second up to `burst`. When Magento answers
+    429 the rate is halved (down to `min_rate`); every successful request
+    then nudges it back up towards the configured rate.
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.min_rate = min(min_rate, rate)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent"""
+        if not self.enabled:
+            return
+
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def penalize(self) -> None:
+        """Back off after a 429: halve the rate and drop any saved-up burst"""
+        if not self.enabled:
+            return
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+
+    def reward(self) -> None:
+        """Recover the rate slowly after successful requests"""
+        if not self.enabled or self.rate >= self.max_rate:
+            return
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
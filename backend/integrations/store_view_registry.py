@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import List, Dict, Any, Optional
+
+from config import settings
+from integrations.connection_pool import connection_pool
+
+
+class StoreViewRegistry:
+    """Per-instance cache of Magento store views with a TTL.
+
+    Populated lazily on first use and kept for store_view_ttl seconds;
+    invalidated when an instance's URL or token changes.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # Bumped by invalidate(), so loads started before it are not cached
+        self._generations: Dict[int, int] = {}
+
+    def _fresh_entry(self, instance_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(instance_id)
+        if entry and time.monotonic() - entry["loaded_at"] < settings.store_view_ttl:
+            return entry
+        return None
+
+    async def _load(self, instance: Any, force: bool = False) -> Dict[str, Any]:
+        """Get the registry entry of an instance, fetching store views if missing or expired"""
+        if not force:
+            entry = self._fresh_entry(instance.id)
+            if entry:
+                return entry
+
+        lock = self._locks.setdefault(instance.id, asyncio.Lock())
+        async with lock:
+            # Another caller may have loaded it while we waited
+            entry = None if force else self._fresh_entry(instance.id)
+            if entry:
+                return entry
+
+            generation = self._generations.get(instance.id, 0)
+            store_views = await connection_pool.client_for(instance).get_store_views() or []
+            entry = {
+                "loaded_at": time.monotonic(),
+                "store_views": store_views,
+                "by_id": {view.get("id"): view for view in store_views},
+                "by_code": {view.get("code"): view for view in store_views}
+            }
+            # Invalidated while loading: the views may come from the old URL or token
+            if self._generations.get(instance.id, 0) == generation:
+                self._entries[instance.id] = entry
+            return entry
+
+    async def get(self, instance: Any, force: bool = False) -> List[Dict[str, Any]]:
+        """All store views of an instance (force=True bypasses the TTL)"""
+        return (await self._load(instance, force))["store_views"]
+
+    async def get_by_id(self, instance: Any, store_id: int) -> Optional[Dict[str, Any]]:
+        """Store view of an instance by id"""
+        return (await self._load(instance))["by_id"].get(store_id)
+
+    async def get_by_code(self, instance: Any, code: str) -> Optional[Dict[str, Any]]:
+        """Store view of an instance by code"""
+        return (await self._load(instance))["by_code"].get(code)
+
+    def invalidate(self, instance_id: int) -> None:
+        """Forget the cached store views of an instance, including any being loaded"""
+        self._entries.pop(instance_id, None)
+        self._generations[instance_id] = self._generations.get(instance_id, 0) + 1
+
+
+store_view_registry = StoreViewRegistry()
@@ -1,5 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import os
 from pathlib import Path
@@ -7,6 +8,10 @@ from pathlib import Path
 from api import instances, compare, sync, history, test
 from models.database import init_db
 from config import settings
+from integrations.connection_pool import connection_pool
+from integrations.circuit_breaker import CircuitOpenError
+from utils.snapshot_io import snapshot_io
+from services.snapshot_refresher import snapshot_refresher
 
 
 @asynccontextmanager
@@ -19,9 +24,14 @@ async def lifespan(app: FastAPI):
     data_dir.mkdir(exist_ok=True)
     (data_dir / "instances").mkdir(exist_ok=True)
     
+    # Keep snapshots of active instances fresh in the background
+    snapshot_refresher.start()
+    
     yield
     # Shutdown
-    
+    await snapshot_refresher.stop()
+    await connection_pool.close()
+    snapshot_io.shutdown()
 
 app = FastAPI(
     title="Magento CMS Sync API",
@@ -39,6 +49,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Fail fast with 503 while a Magento instance is known to be down"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_in) + 1)}
+    )
+
+
 # Include routers
 app.include_router(instances.router, prefix="/api/instances", tags=["instances"])
 app.include_router(compare.router, prefix="/api/compare", tags=["compare"])
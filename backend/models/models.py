@@ -17,6 +17,9 @@ class Instance(Base):
     
     # Relationships
     data_snapshots = relationship("DataSnapshot", back_populates="instance", cascade="all, delete-orphan")
+    snapshot_versions = relationship("SnapshotVersion", back_populates="instance", cascade="all, delete-orphan")
+    snapshot_policies = relationship("SnapshotPolicy", back_populates="instance", cascade="all, delete-orphan")
+    snapshot_changes = relationship("SnapshotChange", back_populates="instance", cascade="all, delete-orphan")
     sync_history = relationship("SyncHistory", foreign_keys="SyncHistory.source_instance_id", cascade="all, delete-orphan")
 
 
@@ -35,6 +38,58 @@ class DataSnapshot(Base):
     instance = relationship("Instance", back_populates="data_snapshots")
 
 
+class SnapshotVersion(Base):
+    __tablename__ = "snapshot_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    instance_id = Column(Integer, ForeignKey("instances.id"), nullable=False, index=True)
+    data_type = Column(String(50), nullable=False)  # 'blocks' or 'pages'
+    version = Column(Integer, nullable=False)  # Increments per instance and data type
+    manifest_path = Column(String(500), nullable=False)  # Path to the identifier -> content hash manifest
+    item_count = Column(Integer, default=0)
+    new_objects = Column(Integer, default=0)  # Item bodies not stored by an earlier version
+    changes = Column(JSON, default=dict)  # Added/removed/modified counts against the previous version
+    created_at = Column(DateTime, default=datetime.utcnow)
+    snapshot_metadata = Column(JSON, default=dict)
+    
+    # Relationships
+    instance = relationship("Instance", back_populates="snapshot_versions")
+
+
+class SnapshotChange(Base):
+    __tablename__ = "snapshot_changes"
+    # Ids are the feed cursor: never reuse the ids of pruned rows
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True, index=True)  # Also the cursor of the change feed
+    instance_id = Column(Integer, ForeignKey("instances.id"), nullable=False, index=True)
+    data_type = Column(String(50), nullable=False)  # 'blocks' or 'pages'
+    version = Column(Integer, nullable=True)  # History version the refresh created, if history is enabled
+    change_type = Column(String(20), nullable=False)  # 'added', 'removed' or 'modified'
+    key = Column(String(500), nullable=False)  # identifier@stores
+    identifier = Column(String(255), nullable=False)
+    fields = Column(JSON, default=list)  # Compared fields that changed (modified only)
+    old_hash = Column(String(32), nullable=True)
+    new_hash = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    # Relationships
+    instance = relationship("Instance", back_populates="snapshot_changes")
+
+
+class SnapshotPolicy(Base):
+    __tablename__ = "snapshot_policies"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    instance_id = Column(Integer, ForeignKey("instances.id"), nullable=False, index=True)
+    data_type = Column(String(50), nullable=False)  # 'blocks' or 'pages'
+    max_age = Column(Integer, nullable=False)  # Seconds before the snapshot is stale, 0 = never
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    instance = relationship("Instance", back_populates="snapshot_policies")
+
+
 class SyncHistory(Base):
     __tablename__ = "sync_history"
     
@@ -22,6 +22,14 @@ class ComparisonStatus(str, Enum):
     DIFFERENT = "different"
 
 
+class ComparisonFilter(str, Enum):
+    ALL = "all"
+    MISSING = "missing"  # missing in destination
+    ONLY_IN_DESTINATION = "only_in_destination"
+    DIFFERENT = "different"
+    SAME = "same"
+
+
 # Instance Schemas
 class InstanceBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
@@ -74,11 +82,28 @@ class DataSnapshot(DataSnapshotBase):
         from_attributes = True
 
 
+class SnapshotFreshness(BaseModel):
+    created_at: datetime
+    age_seconds: float
+    max_age: int  # 0 = never stale
+    is_stale: bool
+    refreshing: bool  # a refresh is running in the background
+
+
+class SnapshotPolicyUpdate(BaseModel):
+    max_age: Optional[int] = Field(None, ge=0)  # None restores the configured default
+
+
 # Comparison Schemas
 class ComparisonRequest(BaseModel):
     source_instance_id: int
     destination_instance_id: int
     force_refresh: bool = False
+    summary_only: bool = False  # items without bodies, compared from the snapshot item indexes
+    status: ComparisonFilter = ComparisonFilter.ALL
+    search: Optional[str] = None  # substring of the identifier or title
+    skip: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1)  # None returns all matching items
 
 
 class ComparisonItem(BaseModel):
@@ -102,7 +127,23 @@ class ComparisonResult(BaseModel):
     missing_in_source: int
     different: int
     items: List[ComparisonItem]
+    total_items: Optional[int] = None  # items matching status and search, before skip/limit
     compared_at: datetime
+    source_snapshot: Optional[SnapshotFreshness] = None
+    destination_snapshot: Optional[SnapshotFreshness] = None
+
+
+class FleetRefreshRequest(BaseModel):
+    instance_ids: Optional[List[int]] = None  # None refreshes all active instances
+    data_types: List[DataType] = [DataType.BLOCKS, DataType.PAGES]
+    full: bool = False  # skip the incremental mode
+    concurrency: Optional[int] = Field(None, ge=1)  # defaults to fleet_refresh_concurrency
+    per_instance: Optional[int] = Field(None, ge=1)  # defaults to fleet_refresh_per_instance
+
+
+class CombinedComparisonResult(BaseModel):
+    blocks: ComparisonResult
+    pages: ComparisonResult
 
 
 # Diff Schemas
@@ -141,6 +182,7 @@ class SyncRequest(BaseModel):
     data_type: DataType
     items: List[SyncItem]
     store_view_mapping: Optional[Dict[str, str]] = None
+    use_bulk: bool = False  # Submit through Magento's asynchronous bulk API
 
 
 class SyncPreview(BaseModel):
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert
+
+from models.models import SnapshotChange
+from models.schemas import DataType
+from services.comparison import ComparisonService
+from config import settings
+
+
+class ChangeFeedService:
+    @staticmethod
+    def build_entries(
+        previous_index: List[Dict[str, Any]],
+        item_index: List[Dict[str, Any]],
+        changes: Dict[str, List[str]],
+        data_type: DataType
+    ) -> List[Dict[str, Any]]:
+        """Changelog entries for the keys detect_changes reported, with changed fields and hashes.
+
+        Changed fields come from the per-field hashes of the item index
+        entries, so no item bodies are needed.
+        """
+        previous = {entry["key"]: entry for entry in previous_index}
+        current = {entry["key"]: entry for entry in item_index}
+
+        entries = []
+        for change_type in ("added", "removed", "modified"):
+            for key in changes[change_type]:
+                old_entry = previous.get(key)
+                new_entry = current.get(key)
+                entries.append({
+                    "change_type": change_type,
+                    "key": key,
+                    "identifier": (new_entry or old_entry)["identifier"],
+                    "fields": ComparisonService._compare_fingerprints(
+                        old_entry, new_entry, data_type
+                    ) if change_type == "modified" else [],
+                    "old_hash": old_entry["hash"] if old_entry else None,
+                    "new_hash": new_entry["hash"] if new_entry else None
+                })
+        return entries
+
+    @staticmethod
+    async def record(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType,
+        entries: List[Dict[str, Any]],
+        version: Optional[int] = None
+    ) -> None:
+        """Append a refresh's changelog entries and drop entries past the retention (committed by the caller)"""
+        created_at = datetime.utcnow()
+        if entries:
+            await db.execute(insert(SnapshotChange), [
+                {
+                    **entry,
+                    "instance_id": instance_id,
+                    "data_type": data_type.value,
+                    "version": version,
+                    "created_at": created_at
+                }
+                for entry in entries
+            ])
+
+        cutoff = created_at - timedelta(days=max(settings.snapshot_change_retention_days, 1))
+        await db.execute(
+            delete(SnapshotChange).where(
+                SnapshotChange.instance_id == instance_id,
+                SnapshotChange.created_at < cutoff
+            )
+        )
+
+    @staticmethod
+    async def list_changes(
+        db: AsyncSession,
+        instance_id: int,
+        since: int = 0,
+        limit: int = 100,
+        data_type: Optional[DataType] = None
+    ) -> Tuple[List[SnapshotChange], bool]:
+        """Changes of an instance after the change id `since`, oldest first, plus whether more follow"""
+        query = select(SnapshotChange).where(
+            SnapshotChange.instance_id == instance_id,
+            SnapshotChange.id > since
+        )
+        if data_type is not None:
+            query = query.where(SnapshotChange.data_type == data_type.value)
+
+        result = await db.execute(query.order_by(SnapshotChange.id).limit(limit + 1))
+        changes = list(result.scalars().all())
+        return changes[:limit], len(changes) > limit
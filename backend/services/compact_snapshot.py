@@ -0,0 +1,197 @@
+import sys
+import threading
+import zlib
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+try:
+    import zstandard
+except ImportError:  # optional, falls back to zlib
+    zstandard = None
+
+# Fields stored compressed and only decoded when read
+LAZY_FIELDS = frozenset({"content", "layout_update_xml", "custom_layout_update_xml"})
+# Shorter values of lazy fields are kept as they are
+LAZY_MIN_LENGTH = 256
+# Strings up to this length are interned, so repeated values are stored once
+INTERN_MAX_LENGTH = 64
+
+COMPRESSION_LEVEL = 1
+
+_MISSING = object()
+
+# zstandard (de)compressors are not thread-safe, one per snapshot I/O thread
+_local = threading.local()
+
+
+class _Compressed(bytes):
+    """Compressed UTF-8 of a lazy field value (zstd, or zlib without zstandard)"""
+    __slots__ = ()
+
+
+def _compress(value: str) -> _Compressed:
+    data = value.encode("utf-8")
+    if zstandard is None:
+        return _Compressed(zlib.compress(data, COMPRESSION_LEVEL))
+    compressor = getattr(_local, "compressor", None)
+    if compressor is None:
+        compressor = _local.compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+    return _Compressed(compressor.compress(data))
+
+
+def _decompress(value: _Compressed) -> str:
+    if zstandard is None:
+        return zlib.decompress(value).decode("utf-8")
+    decompressor = getattr(_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor.decompress(value).decode("utf-8")
+
+
+def _pack(key: str, value: Any, pool: Dict[Any, Any]) -> Any:
+    if isinstance(value, str):
+        if key in LAZY_FIELDS and len(value) >= LAZY_MIN_LENGTH:
+            # Store view copies of an item often share their content, which is then stored once
+            packed = _compress(value)
+            return pool.setdefault(packed, packed)
+        if len(value) <= INTERN_MAX_LENGTH:
+            return sys.intern(value)
+        return value
+    if isinstance(value, list):
+        try:
+            packed = tuple(value)
+            return pool.setdefault(packed, packed)
+        except TypeError:  # unhashable elements, kept as they are
+            return value
+    return value
+
+
+def _unpack(value: Any) -> Any:
+    if type(value) is _Compressed:
+        return _decompress(value)
+    if type(value) is tuple:
+        return list(value)
+    return value
+
+
+class CompactItem(Mapping):
+    """Read-only dict-like view of one item of a CompactSnapshot.
+
+    Lazy fields are decompressed on every access; use raw() to compare
+    values without decoding them and copy() to get a plain dict.
+    """
+
+    __slots__ = ("_snapshot", "_row")
+
+    def __init__(self, snapshot: "CompactSnapshot", row: tuple):
+        self._snapshot = snapshot
+        self._row = row
+
+    def raw(self, key: str, default: Any = None) -> Any:
+        """Stored form of a value: equal for two items exactly when the decoded values are equal"""
+        position = self._snapshot._positions.get(key)
+        if position is None or position >= len(self._row):
+            return default
+        value = self._row[position]
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.raw(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return _unpack(value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.raw(key, _MISSING)
+        return default if value is _MISSING else _unpack(value)
+
+    def __iter__(self) -> Iterator[str]:
+        for field, value in zip(self._snapshot.fields, self._row):
+            if value is not _MISSING:
+                yield field
+
+    def __len__(self) -> int:
+        return sum(1 for value in self._row if value is not _MISSING)
+
+    def items(self):
+        return self.copy().items()
+
+    def values(self):
+        return self.copy().values()
+
+    def copy(self) -> Dict[str, Any]:
+        return {
+            field: _unpack(value)
+            for field, value in zip(self._snapshot.fields, self._row)
+            if value is not _MISSING
+        }
+
+    def __repr__(self) -> str:
+        return f"CompactItem({self.copy()!r})"
+
+
+class CompactSnapshot(Sequence):
+    """Snapshot items held as one tuple of values per item instead of one dict.
+
+    Field names are stored once per snapshot, short strings, store id
+    lists and repeated content are shared, and long content fields are
+    kept compressed until read. Items are handed out as CompactItem views, so the
+    snapshot can be used wherever a list of item dicts is only read.
+    """
+
+    __slots__ = ("fields", "_positions", "_rows")
+
+    def __init__(self, items: Iterable[Mapping]):
+        positions: Dict[str, int] = {}
+        pool: Dict[Any, Any] = {}
+        rows = []
+        for item in items:
+            row = [_MISSING] * len(positions)
+            for key, value in item.items():
+                position = positions.get(key)
+                if position is None:
+                    position = positions[sys.intern(key)] = len(positions)
+                    row.append(_MISSING)
+                row[position] = _pack(key, value, pool)
+            rows.append(tuple(row))
+
+        self.fields = tuple(positions)
+        self._positions = positions
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[CompactItem, List[CompactItem]]:
+        if isinstance(index, slice):
+            return [CompactItem(self, row) for row in self._rows[index]]
+        return CompactItem(self, self._rows[index])
+
+    def __iter__(self) -> Iterator[CompactItem]:
+        for row in self._rows:
+            yield CompactItem(self, row)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (CompactSnapshot, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def memory_size(self) -> int:
+        """Rough memory footprint: row tuples plus long values, shared ones counted once"""
+        size = 56 + 8 * len(self._rows)
+        counted = set()
+        for row in self._rows:
+            size += 40 + 8 * len(row)
+            for value in row:
+                if isinstance(value, (str, bytes)) and len(value) > INTERN_MAX_LENGTH and id(value) not in counted:
+                    counted.add(id(value))
+                    size += 33 + len(value)
+        return size
+
+
+def to_dict(item: Mapping) -> Dict[str, Any]:
+    """Plain (mutable, serializable) dict of an item, which may be a CompactItem view"""
+    return item.copy() if isinstance(item, CompactItem) else dict(item)
+
@@ -1,12 +1,33 @@
-from typing import List, Dict, Any, Set, Tuple
+import hashlib
+import json
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
 from datetime import datetime
 
+from services.compact_snapshot import CompactItem
 from models.schemas import (
-    ComparisonItem, ComparisonResult, ComparisonStatus,
+    ComparisonItem, ComparisonResult, ComparisonStatus, ComparisonFilter,
     DataType, DiffField, DiffResult
 )
 
 
+# Fields compared between instances, per data type
+COMPARE_FIELDS = {
+    DataType.BLOCKS: [
+        "title", "content", "is_active", "creation_time",
+        "update_time", "sort_order"
+    ],
+    DataType.PAGES: [
+        "title", "content", "content_heading", "page_layout",
+        "meta_title", "meta_keywords", "meta_description",
+        "is_active", "sort_order", "layout_update_xml",
+        "custom_theme", "custom_root_template", "custom_layout_update_xml"
+    ]
+}
+
+# Hex digits per field in an item's field fingerprint (see ComparisonService.fingerprint)
+FIELD_HASH_LENGTH = 8
+
+
 class ComparisonService:
     
     @staticmethod
@@ -32,23 +53,17 @@ class ComparisonService:
         """Compare two items and return if they're different and which fields"""
         differences = []
         
-        # Fields to compare based on data type
-        if data_type == DataType.BLOCKS:
-            compare_fields = [
-                "title", "content", "is_active", "creation_time",
-                "update_time", "sort_order"
-            ]
-        else:  # DataType.PAGES
-            compare_fields = [
-                "title", "content", "content_heading", "page_layout",
-                "meta_title", "meta_keywords", "meta_description",
-                "is_active", "sort_order", "layout_update_xml",
-                "custom_theme", "custom_root_template", "custom_layout_update_xml"
-            ]
+        compare_fields = COMPARE_FIELDS[data_type]
+        
+        if isinstance(source_item, CompactItem) and isinstance(dest_item, CompactItem):
+            # Stored values compare like the decoded ones, without decompressing content
+            source_get, dest_get = source_item.raw, dest_item.raw
+        else:
+            source_get, dest_get = source_item.get, dest_item.get
         
         for field in compare_fields:
-            source_val = source_item.get(field)
-            dest_val = dest_item.get(field)
+            source_val = source_get(field)
+            dest_val = dest_get(field)
             
             if source_val != dest_val:
                 differences.append(field)
@@ -63,89 +78,271 @@ class ComparisonService:
         return len(differences) > 0, differences
     
     @staticmethod
-    def compare_data(
-        source_data: List[Dict[str, Any]],
-        dest_data: List[Dict[str, Any]],
+    def _canonical(value: Any) -> bytes:
+        """Stable encoding of a field value for hashing"""
+        if isinstance(value, bool):
+            value = int(value)  # True == 1 when comparing, so hash them alike
+        return json.dumps(
+            value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+        ).encode("utf-8")
+    
+    @staticmethod
+    def store_scope(item: Dict[str, Any]) -> List[Any]:
+        """Sorted, de-duplicated store ids of an item"""
+        return sorted(set(item.get("store_id", [])), key=str)
+    
+    @staticmethod
+    def fingerprint(item: Dict[str, Any], data_type: DataType) -> Tuple[str, str]:
+        """Hash of an item over the compared fields and store scope, plus per-field hashes.
+        
+        Items with equal hashes compare as identical; the per-field hashes
+        (FIELD_HASH_LENGTH hex digits per field, in COMPARE_FIELDS order)
+        tell which fields differ without having the item bodies at hand.
+        """
+        item_hash = hashlib.blake2b(digest_size=16)
+        field_hashes = []
+        for field in COMPARE_FIELDS[data_type]:
+            encoded = ComparisonService._canonical(item.get(field))
+            item_hash.update(encoded + b"\x00")
+            field_hashes.append(
+                hashlib.blake2b(encoded, digest_size=FIELD_HASH_LENGTH // 2).hexdigest()
+            )
+        item_hash.update(ComparisonService._canonical(ComparisonService.store_scope(item)))
+        return item_hash.hexdigest(), "".join(field_hashes)
+    
+    @staticmethod
+    def _compare_fingerprints(
+        source_entry: Dict[str, Any],
+        dest_entry: Dict[str, Any],
+        data_type: DataType
+    ) -> List[str]:
+        """Fields that differ between two item index entries"""
+        if source_entry["hash"] == dest_entry["hash"]:
+            return []
+        
+        differences = []
+        for position, field in enumerate(COMPARE_FIELDS[data_type]):
+            start = position * FIELD_HASH_LENGTH
+            end = start + FIELD_HASH_LENGTH
+            if source_entry["fields"][start:end] != dest_entry["fields"][start:end]:
+                differences.append(field)
+        
+        if source_entry["store_id"] != dest_entry["store_id"]:
+            differences.append("store_id")
+        
+        return differences
+    
+    @staticmethod
+    def iter_index_rows(
+        source_entries: List[Dict[str, Any]],
+        dest_entries: List[Dict[str, Any]],
+        data_type: DataType
+    ) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], ComparisonStatus, ComparisonStatus, List[str]]]:
+        """Compare two item indexes by fingerprint, one row per identifier in identifier order.
+        
+        Rows are (identifier, source entry, destination entry, source
+        status, destination status, differing fields); an entry is None
+        on the side the item is missing from.
+        """
+        source_lookup = {entry["identifier"]: entry for entry in source_entries}
+        dest_lookup = {entry["identifier"]: entry for entry in dest_entries}
+        
+        for identifier in sorted(set(source_lookup) | set(dest_lookup)):
+            source_entry = source_lookup.get(identifier)
+            dest_entry = dest_lookup.get(identifier)
+            
+            if source_entry and dest_entry:
+                differences = ComparisonService._compare_fingerprints(
+                    source_entry, dest_entry, data_type
+                )
+                item_status = ComparisonStatus.DIFFERENT if differences else ComparisonStatus.EXISTS
+                yield identifier, source_entry, dest_entry, item_status, item_status, differences
+                
+            elif source_entry:
+                yield identifier, source_entry, None, ComparisonStatus.EXISTS, ComparisonStatus.MISSING, []
+                
+            else:
+                yield identifier, None, dest_entry, ComparisonStatus.MISSING, ComparisonStatus.EXISTS, []
+    
+    @staticmethod
+    def compare_indexes(
+        source_entries: List[Dict[str, Any]],
+        dest_entries: List[Dict[str, Any]],
         data_type: DataType,
         source_instance: Any,
-        dest_instance: Any
+        dest_instance: Any,
+        status: ComparisonFilter = ComparisonFilter.ALL,
+        search: Optional[str] = None,
+        skip: int = 0,
+        limit: Optional[int] = None
     ) -> ComparisonResult:
-        """Compare source and destination data"""
+        """Compare source and destination from their item indexes, without item bodies.
+        
+        Only items matching status and search are returned, one page
+        (skip/limit) of them; the counts still cover all items.
+        """
+        counts = ComparisonService.new_counts()
+        rows = []
+        
+        for identifier, source_entry, dest_entry, source_status, destination_status, differences in (
+            ComparisonService.iter_index_rows(source_entries, dest_entries, data_type)
+        ):
+            ComparisonService.count_statuses(counts, source_status, destination_status)
+            title = (source_entry or dest_entry)["title"]
+            if ComparisonService.matches_filter(identifier, title, source_status, destination_status, status, search):
+                rows.append((identifier, title, source_status, destination_status, differences))
+        
+        # Items are only built for the returned page
+        page = rows[skip:skip + limit] if limit is not None else rows[skip:]
+        comparison_items = [
+            ComparisonItem(
+                identifier=identifier,
+                title=title,
+                source_status=source_status,
+                destination_status=destination_status,
+                differences=differences or None
+            )
+            for identifier, title, source_status, destination_status, differences in page
+        ]
+        
+        return ComparisonResult(
+            source_instance=source_instance,
+            destination_instance=dest_instance,
+            data_type=data_type,
+            total_source=len(source_entries),
+            total_destination=len(dest_entries),
+            **counts,
+            items=comparison_items,
+            total_items=len(rows),
+            compared_at=datetime.utcnow()
+        )
+    
+    @staticmethod
+    def iter_compare_data(
+        source_data: List[Dict[str, Any]],
+        dest_data: List[Dict[str, Any]],
+        data_type: DataType,
+        source_fingerprints: Optional[List[str]] = None,
+        dest_fingerprints: Optional[List[str]] = None
+    ) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], ComparisonStatus, ComparisonStatus, List[str]]]:
+        """Compare source and destination data, one row per identifier in identifier order.
+        
+        Rows are shaped like those of iter_index_rows, with the items in
+        place of the index entries. With the item hashes of both sides
+        (see fingerprint, one per item in data order), items with equal
+        hashes are identical without comparing their fields; fields are
+        only compared when hashes differ.
+        """
         # Create lookup dictionaries
-        source_lookup = {
-            ComparisonService._get_identifier(item, data_type): item
-            for item in source_data
-        }
-        dest_lookup = {
-            ComparisonService._get_identifier(item, data_type): item
-            for item in dest_data
-        }
+        source_identifiers = [ComparisonService._get_identifier(item, data_type) for item in source_data]
+        dest_identifiers = [ComparisonService._get_identifier(item, data_type) for item in dest_data]
+        source_lookup = dict(zip(source_identifiers, source_data))
+        dest_lookup = dict(zip(dest_identifiers, dest_data))
+        
+        if source_fingerprints is not None and dest_fingerprints is not None:
+            # Built like the lookups, so duplicate identifiers keep the hash of the same item
+            source_hashes = dict(zip(source_identifiers, source_fingerprints))
+            dest_hashes = dict(zip(dest_identifiers, dest_fingerprints))
+        else:
+            source_hashes = dest_hashes = {}
         
         # Get all unique identifiers
         all_identifiers = set(source_lookup.keys()) | set(dest_lookup.keys())
         
         # Compare items
-        comparison_items = []
-        exists_in_both = 0
-        missing_in_dest = 0
-        missing_in_source = 0
-        different = 0
-        
         for identifier in sorted(all_identifiers):
             source_item = source_lookup.get(identifier)
             dest_item = dest_lookup.get(identifier)
             
             if source_item and dest_item:
                 # Item exists in both
-                is_different, differences = ComparisonService._compare_items(
-                    source_item, dest_item, data_type
-                )
-                
-                if is_different:
-                    status = ComparisonStatus.DIFFERENT
-                    different += 1
+                source_hash = source_hashes.get(identifier)
+                if source_hash is not None and source_hash == dest_hashes.get(identifier):
+                    differences = []
                 else:
-                    status = ComparisonStatus.EXISTS
-                    
-                exists_in_both += 1
+                    _, differences = ComparisonService._compare_items(
+                        source_item, dest_item, data_type
+                    )
                 
-                comparison_item = ComparisonItem(
-                    identifier=identifier,
-                    title=ComparisonService._get_title(source_item),
-                    source_status=status,
-                    destination_status=status,
-                    source_data=source_item,
-                    destination_data=dest_item,
-                    differences=differences if is_different else None
-                )
+                item_status = ComparisonStatus.DIFFERENT if differences else ComparisonStatus.EXISTS
+                yield identifier, source_item, dest_item, item_status, item_status, differences
                 
             elif source_item and not dest_item:
                 # Missing in destination
-                missing_in_dest += 1
-                comparison_item = ComparisonItem(
-                    identifier=identifier,
-                    title=ComparisonService._get_title(source_item),
-                    source_status=ComparisonStatus.EXISTS,
-                    destination_status=ComparisonStatus.MISSING,
-                    source_data=source_item,
-                    destination_data=None,
-                    differences=None
-                )
+                yield identifier, source_item, None, ComparisonStatus.EXISTS, ComparisonStatus.MISSING, []
                 
             else:  # not source_item and dest_item
                 # Missing in source (exists only in destination)
-                missing_in_source += 1
-                comparison_item = ComparisonItem(
-                    identifier=identifier,
-                    title=ComparisonService._get_title(dest_item),
-                    source_status=ComparisonStatus.MISSING,
-                    destination_status=ComparisonStatus.EXISTS,
-                    source_data=None,
-                    destination_data=dest_item,
-                    differences=None
-                )
-            
-            comparison_items.append(comparison_item)
+                yield identifier, None, dest_item, ComparisonStatus.MISSING, ComparisonStatus.EXISTS, []
+    
+    @staticmethod
+    def new_counts() -> Dict[str, int]:
+        """Zeroed status counts of a comparison (see count_statuses)"""
+        return {"exists_in_both": 0, "missing_in_destination": 0, "missing_in_source": 0, "different": 0}
+    
+    @staticmethod
+    def count_statuses(
+        counts: Dict[str, int],
+        source_status: ComparisonStatus,
+        destination_status: ComparisonStatus
+    ) -> None:
+        """Add a compared item, given by its statuses, to the status counts of a comparison"""
+        if source_status == ComparisonStatus.MISSING:
+            counts["missing_in_source"] += 1
+        elif destination_status == ComparisonStatus.MISSING:
+            counts["missing_in_destination"] += 1
+        else:
+            counts["exists_in_both"] += 1
+            if source_status == ComparisonStatus.DIFFERENT:
+                counts["different"] += 1
+    
+    @staticmethod
+    def compare_data(
+        source_data: List[Dict[str, Any]],
+        dest_data: List[Dict[str, Any]],
+        data_type: DataType,
+        source_instance: Any,
+        dest_instance: Any,
+        source_fingerprints: Optional[List[str]] = None,
+        dest_fingerprints: Optional[List[str]] = None,
+        status: ComparisonFilter = ComparisonFilter.ALL,
+        search: Optional[str] = None,
+        skip: int = 0,
+        limit: Optional[int] = None
+    ) -> ComparisonResult:
+        """Compare source and destination data (see iter_compare_data).
+        
+        Only items matching status and search are returned, one page
+        (skip/limit) of them with their bodies; the counts still cover
+        all items.
+        """
+        counts = ComparisonService.new_counts()
+        rows = []
+        
+        for identifier, source_item, dest_item, source_status, destination_status, differences in (
+            ComparisonService.iter_compare_data(
+                source_data, dest_data, data_type, source_fingerprints, dest_fingerprints
+            )
+        ):
+            ComparisonService.count_statuses(counts, source_status, destination_status)
+            title = ComparisonService._get_title(source_item or dest_item)
+            if ComparisonService.matches_filter(identifier, title, source_status, destination_status, status, search):
+                rows.append((identifier, title, source_item, dest_item, source_status, destination_status, differences))
+        
+        # Items are only built for the returned page
+        page = rows[skip:skip + limit] if limit is not None else rows[skip:]
+        comparison_items = [
+            ComparisonItem(
+                identifier=identifier,
+                title=title,
+                source_status=source_status,
+                destination_status=destination_status,
+                source_data=source_item,
+                destination_data=dest_item,
+                differences=differences or None
+            )
+            for identifier, title, source_item, dest_item, source_status, destination_status, differences in page
+        ]
         
         return ComparisonResult(
             source_instance=source_instance,
@@ -153,14 +350,38 @@ class ComparisonService:
             data_type=data_type,
             total_source=len(source_data),
             total_destination=len(dest_data),
-            exists_in_both=exists_in_both,
-            missing_in_destination=missing_in_dest,
-            missing_in_source=missing_in_source,
-            different=different,
+            **counts,
             items=comparison_items,
+            total_items=len(rows),
             compared_at=datetime.utcnow()
         )
     
+    @staticmethod
+    def matches_filter(
+        identifier: str,
+        title: Optional[str],
+        source_status: ComparisonStatus,
+        destination_status: ComparisonStatus,
+        status: ComparisonFilter,
+        search: Optional[str]
+    ) -> bool:
+        """Whether a compared item has the status of the filter and contains the search text"""
+        if status == ComparisonFilter.MISSING and destination_status != ComparisonStatus.MISSING:
+            return False
+        if status == ComparisonFilter.ONLY_IN_DESTINATION and source_status != ComparisonStatus.MISSING:
+            return False
+        if status == ComparisonFilter.DIFFERENT and source_status != ComparisonStatus.DIFFERENT:
+            return False
+        if status == ComparisonFilter.SAME and not (
+            source_status == ComparisonStatus.EXISTS and destination_status == ComparisonStatus.EXISTS
+        ):
+            return False
+        
+        if search:
+            query = search.lower()
+            return query in identifier.lower() or query in (title or "").lower()
+        return True
+    
     @staticmethod
     def get_item_diff(
         source_item: Dict[str, Any],
@@ -171,19 +392,7 @@ class ComparisonService:
         """Get detailed field-by-field diff for an item"""
         diff_fields = []
         
-        # Get fields to compare
-        if data_type == DataType.BLOCKS:
-            compare_fields = [
-                "title", "content", "is_active", "creation_time",
-                "update_time", "sort_order"
-            ]
-        else:  # DataType.PAGES
-            compare_fields = [
-                "title", "content", "content_heading", "page_layout",
-                "meta_title", "meta_keywords", "meta_description",
-                "is_active", "sort_order", "layout_update_xml",
-                "custom_theme", "custom_root_template", "custom_layout_update_xml"
-            ]
+        compare_fields = COMPARE_FIELDS[data_type]
         
         # Compare each field
         for field in compare_fields:
@@ -199,8 +408,8 @@ class ComparisonService:
             diff_fields.append(diff_field)
         
         # Get store assignments
-        source_stores = source_item.get("store_id", []) if source_item else []
-        dest_stores = dest_item.get("store_id", []) if dest_item else []
+        source_stores = [str(store) for store in source_item.get("store_id", [])] if source_item else []
+        dest_stores = [str(store) for store in dest_item.get("store_id", [])] if dest_item else []
         
         return DiffResult(
             identifier=identifier,
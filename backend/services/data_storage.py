@@ -1,16 +1,49 @@
-import json
+import asyncio
+import os
+from contextlib import aclosing
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterable, AsyncGenerator, Union, Set, Sequence, Mapping, Callable, TypeVar
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from models.models import DataSnapshot, Instance
+from models.database import AsyncSessionLocal
+from models.models import DataSnapshot, Instance, SnapshotPolicy
 from models.schemas import DataType
-from integrations.magento_client import MagentoClient
+from integrations.magento_client import MagentoClient, LISTING_FIELDS
+from integrations.connection_pool import connection_pool
+from integrations.store_view_registry import store_view_registry
+from services.comparison import ComparisonService, COMPARE_FIELDS
+from services.single_flight import SingleFlight
+from services.snapshot_codec import SnapshotCodec, SnapshotWriter
+from services.snapshot_cache import snapshot_cache
+from services.compact_snapshot import CompactSnapshot, to_dict
+from services.item_store import ItemStore, ItemStoreWriter
+from services.snapshot_history import SnapshotHistoryService, HistoryWriter
+from services.change_feed import ChangeFeedService
+from utils.snapshot_io import snapshot_io
 from config import settings
 
 
+T = TypeVar("T")
+
+# In-flight snapshot refreshes keyed by (instance_id, data_type)
+refresh_flights = SingleFlight()
+
+# Background revalidations of stale snapshots (referenced until done)
+revalidations: Set[asyncio.Task] = set()
+
+# Held while a snapshot is written, migrated or re-indexed, keyed by (instance_id, data_type)
+snapshot_write_locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+
+# Streamed items handed to the snapshot I/O pool per write
+STREAM_WRITE_BATCH_SIZE = 200
+
+
+class SnapshotMigrationRequired(Exception):
+    """The stored snapshot has to be migrated or re-indexed before it can be read"""
+
+
 class DataStorageService:
     @staticmethod
     def _get_instance_dir(instance_id: int) -> Path:
@@ -19,9 +52,91 @@ class DataStorageService:
     
     @staticmethod
     def _get_snapshot_path(instance_id: int, data_type: DataType) -> Path:
-        """Get the file path for a data snapshot"""
+        """Get the file path for a data snapshot in the configured codec"""
+        instance_dir = DataStorageService._get_instance_dir(instance_id)
+        return instance_dir / f"{data_type.value}{SnapshotCodec.configured().suffix}"
+    
+    @staticmethod
+    def _get_item_index_path(instance_id: int, data_type: DataType) -> Path:
+        """Get the file path of the item index kept next to a snapshot (e.g. blocks-index.msgpack.zst)"""
+        instance_dir = DataStorageService._get_instance_dir(instance_id)
+        return instance_dir / f"{data_type.value}-index{SnapshotCodec.configured().suffix}"
+    
+    @staticmethod
+    def _use_item_store() -> bool:
+        """Whether snapshots are kept in the per-instance SQLite item store instead of files"""
+        return settings.snapshot_backend == "sqlite"
+    
+    @staticmethod
+    def _get_item_store(instance_id: int, data_type: DataType) -> ItemStore:
+        """Get the SQLite item store of an instance's data type (e.g. items-blocks.sqlite).
+        
+        Each data type has its own file, so a streamed refresh of blocks
+        holding its write transaction never locks out one of pages.
+        """
+        instance_dir = DataStorageService._get_instance_dir(instance_id)
+        return ItemStore(instance_dir / f"items-{data_type.value}.sqlite")
+    
+    @staticmethod
+    def _write_lock(instance_id: int, data_type: DataType) -> asyncio.Lock:
+        """Lock held by whoever writes, migrates or re-indexes a snapshot"""
+        return snapshot_write_locks.setdefault((instance_id, data_type.value), asyncio.Lock())
+    
+    @staticmethod
+    async def _read(fn: Callable[..., T], instance_id: int, data_type: DataType, *args: Any) -> T:
+        """Run a snapshot read in the snapshot I/O pool.
+        
+        Reads never write; if the snapshot has to be migrated or re-indexed
+        first (SnapshotMigrationRequired), that is done under the write
+        lock and the read is retried.
+        """
+        try:
+            return await snapshot_io.run(fn, instance_id, data_type, *args)
+        except SnapshotMigrationRequired:
+            async with DataStorageService._write_lock(instance_id, data_type):
+                await snapshot_io.run(DataStorageService._migrate_snapshot, instance_id, data_type)
+            return await snapshot_io.run(fn, instance_id, data_type, *args)
+    
+    @staticmethod
+    def _file_version(path: Path) -> Tuple[int, int]:
+        return snapshot_cache.file_version(path.stat())
+    
+    @staticmethod
+    def _snapshot_version(instance_id: int, data_type: DataType) -> Optional[Tuple]:
+        """Version of the stored snapshot as used in the snapshot cache, None if there is none"""
+        if DataStorageService._use_item_store():
+            version = DataStorageService._get_item_store(instance_id, data_type).version(data_type.value)
+            return ("sqlite", version) if version is not None else None
+        try:
+            return DataStorageService._file_version(DataStorageService._get_snapshot_path(instance_id, data_type))
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    def _find_snapshot_files(instance_id: int, data_type: DataType) -> List[Path]:
+        """Snapshot files of a data type in any codec (e.g. blocks.json, blocks.msgpack.zst)"""
         instance_dir = DataStorageService._get_instance_dir(instance_id)
-        return instance_dir / f"{data_type.value}.json"
+        if not instance_dir.exists():
+            return []
+        return [
+            path for path in instance_dir.glob(f"{data_type.value}.*")
+            if SnapshotCodec.from_path(path) is not None
+        ]
+    
+    @staticmethod
+    def _remove_other_snapshot_files(instance_id: int, data_type: DataType, keep: Optional[Path]) -> None:
+        """Delete snapshot files of a data type left over from another codec (or backend, with keep=None)"""
+        for path in DataStorageService._find_snapshot_files(instance_id, data_type):
+            if path != keep:
+                path.unlink(missing_ok=True)
+    
+    @staticmethod
+    def _remove_other_item_index_files(instance_id: int, data_type: DataType, keep: Optional[Path]) -> None:
+        """Delete item index files of a data type left over from another codec (or backend, with keep=None)"""
+        instance_dir = DataStorageService._get_instance_dir(instance_id)
+        for path in instance_dir.glob(f"{data_type.value}-index.*"):
+            if path != keep:
+                path.unlink(missing_ok=True)
     
     @staticmethod
     async def save_snapshot(
@@ -31,34 +146,83 @@ class DataStorageService:
         data: List[Dict[str, Any]],
         metadata: Optional[Dict[str, Any]] = None
     ) -> DataSnapshot:
-        """Save data snapshot to JSON file and create database record"""
+        """Save data snapshot (to a file in the configured codec, or the item store) and create database record"""
+        history = await SnapshotHistoryService.writer(db, instance_id, data_type)
+        
+        # Encoding and writing run in the snapshot I/O pool, off the event loop
+        async with DataStorageService._write_lock(instance_id, data_type):
+            previous_index, file_path, item_index = await snapshot_io.run(
+                DataStorageService._write_snapshot, instance_id, data_type, data, history
+            )
+        
+        metadata = await DataStorageService._record_changes(
+            db, instance_id, data_type, metadata, previous_index, item_index, history
+        )
+        
+        snapshot = await DataStorageService._save_snapshot_record(
+            db, instance_id, data_type, file_path, len(data), metadata
+        )
+        if history is not None:
+            await SnapshotHistoryService.collect_garbage(db, instance_id, data_type)
+        return snapshot
+    
+    @staticmethod
+    def _write_snapshot(
+        instance_id: int,
+        data_type: DataType,
+        data: List[Dict[str, Any]],
+        history: Optional[HistoryWriter]
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Path, List[Dict[str, Any]]]:
+        """Write a snapshot to the configured backend, returns (previous item index, path, item index)"""
         # Ensure directory exists
         instance_dir = DataStorageService._get_instance_dir(instance_id)
         instance_dir.mkdir(parents=True, exist_ok=True)
         
-        # Save to JSON file
-        file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(
-                data, 
-                f, 
-                ensure_ascii=settings.json_ensure_ascii,
-                indent=settings.json_indent
-            )
+        DataStorageService._migrate_snapshot(instance_id, data_type)
+        previous_index = DataStorageService._load_item_index(instance_id, data_type)
         
-        # Create or update database record
-        result = await db.execute(
-            select(DataSnapshot).where(
-                DataSnapshot.instance_id == instance_id,
-                DataSnapshot.data_type == data_type.value
+        if DataStorageService._use_item_store():
+            # Save to the item store
+            store = DataStorageService._get_item_store(instance_id, data_type)
+            item_index = DataStorageService._write_item_store(instance_id, data_type, data)
+            file_path = store.path
+            DataStorageService._remove_other_snapshot_files(instance_id, data_type, None)
+            DataStorageService._remove_other_item_index_files(instance_id, data_type, None)
+            DataStorageService._cache_snapshot(
+                (instance_id, data_type.value), ("sqlite", store.version(data_type.value)), data
             )
-        )
-        snapshot = result.scalar_one_or_none()
+        else:
+            # Save to snapshot file
+            file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+            item_index = DataStorageService._write_snapshot_file(instance_id, data_type, file_path, data)
+            DataStorageService._remove_other_snapshot_files(instance_id, data_type, file_path)
+            DataStorageService._get_item_store(instance_id, data_type).clear(data_type.value)
+            DataStorageService._cache_snapshot(
+                (instance_id, data_type.value), DataStorageService._file_version(file_path), data
+            )
+        
+        if history is not None:
+            for entry, item in zip(item_index, data):
+                history.write(entry["key"], item)
+        
+        return previous_index, file_path, item_index
+    
+    @staticmethod
+    async def _save_snapshot_record(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType,
+        file_path: Path,
+        item_count: int,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> DataSnapshot:
+        """Create or update the database record of a snapshot"""
+        snapshot = await DataStorageService._get_snapshot_record(db, instance_id, data_type)
         
         if snapshot:
             # Update existing snapshot
             snapshot.file_path = str(file_path)
-            snapshot.item_count = len(data)
+            snapshot.item_count = item_count
             snapshot.created_at = datetime.utcnow()
             snapshot.snapshot_metadata = metadata or {}
         else:
@@ -67,7 +231,7 @@ class DataStorageService:
                 instance_id=instance_id,
                 data_type=data_type.value,
                 file_path=str(file_path),
-                item_count=len(data),
+                item_count=item_count,
                 snapshot_metadata=metadata or {}
             )
             db.add(snapshot)
@@ -78,36 +242,911 @@ class DataStorageService:
         return snapshot
     
     @staticmethod
-    def load_snapshot(instance_id: int, data_type: DataType) -> Optional[List[Dict[str, Any]]]:
-        """Load data snapshot from JSON file"""
+    async def save_snapshot_stream(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType,
+        items: AsyncGenerator[Dict[str, Any], None],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> DataSnapshot:
+        """Write items to the snapshot file as they arrive, without holding them in memory.
+        
+        Items are written to a temporary file which replaces the snapshot
+        only once the stream completed, so a failed download leaves the
+        previous snapshot intact. With the item store, items are upserted
+        in batches within one transaction, with the same effect. Writes
+        happen in batches in the snapshot I/O pool.
+        """
+        # Closed however this ends, so the download behind it is released
+        async with aclosing(items):
+            history = await SnapshotHistoryService.writer(db, instance_id, data_type)
+            use_item_store = DataStorageService._use_item_store()
+            item_index = []
+            
+            async with DataStorageService._write_lock(instance_id, data_type):
+                previous_index, writer = await snapshot_io.run(
+                    DataStorageService._open_snapshot_writer, instance_id, data_type
+                )
+                
+                def write_batch(batch: List[Dict[str, Any]]) -> None:
+                    for item in batch:
+                        if use_item_store:
+                            entry = DataStorageService._index_entry(item, data_type, None, None)
+                            writer.write(entry, item)
+                        else:
+                            offset, size = writer.write(item)
+                            entry = DataStorageService._index_entry(item, data_type, offset, size)
+                        item_index.append(entry)
+                        if history is not None:
+                            history.write(entry["key"], item)
+                
+                # Last write handed to the snapshot I/O pool; it keeps running in its
+                # thread when the awaiting task is cancelled, so it is shielded
+                pending: Optional[asyncio.Future] = None
+                
+                async def run_write(fn: Callable[..., None], *args: Any) -> None:
+                    nonlocal pending
+                    pending = asyncio.ensure_future(snapshot_io.run(fn, *args))
+                    await asyncio.shield(pending)
+                
+                try:
+                    batch = []
+                    async for item in items:
+                        batch.append(item)
+                        if len(batch) >= STREAM_WRITE_BATCH_SIZE:
+                            await run_write(write_batch, batch)
+                            batch = []
+                    await run_write(write_batch, batch)
+                    await run_write(writer.commit)
+                except BaseException:
+                    # Abort only once no write is running on the writer anymore
+                    if pending is not None:
+                        await asyncio.wait([pending])
+                    await snapshot_io.run(writer.abort)
+                    raise
+                
+                file_path = await snapshot_io.run(
+                    DataStorageService._finish_snapshot_stream, instance_id, data_type, writer, item_index
+                )
+        
+        metadata = await DataStorageService._record_changes(
+            db, instance_id, data_type, metadata, previous_index, item_index, history
+        )
+        
+        snapshot = await DataStorageService._save_snapshot_record(
+            db, instance_id, data_type, file_path, writer.count, metadata
+        )
+        if history is not None:
+            await SnapshotHistoryService.collect_garbage(db, instance_id, data_type)
+        return snapshot
+    
+    @staticmethod
+    def _open_snapshot_writer(
+        instance_id: int,
+        data_type: DataType
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Union[SnapshotWriter, ItemStoreWriter]]:
+        """Start writing a snapshot to the configured backend, returns (previous item index, writer)"""
+        instance_dir = DataStorageService._get_instance_dir(instance_id)
+        instance_dir.mkdir(parents=True, exist_ok=True)
+        
+        DataStorageService._migrate_snapshot(instance_id, data_type)
+        previous_index = DataStorageService._load_item_index(instance_id, data_type)
+        
+        if DataStorageService._use_item_store():
+            return previous_index, DataStorageService._get_item_store(instance_id, data_type).writer(data_type.value)
+        
+        file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+        return previous_index, SnapshotCodec.configured().writer(file_path)
+    
+    @staticmethod
+    def _finish_snapshot_stream(
+        instance_id: int,
+        data_type: DataType,
+        writer: Union[SnapshotWriter, ItemStoreWriter],
+        item_index: List[Dict[str, Any]]
+    ) -> Path:
+        """Index a committed streamed snapshot and drop what it replaced, returns its path"""
+        snapshot_cache.invalidate((instance_id, data_type.value))
+        
+        if isinstance(writer, ItemStoreWriter):
+            DataStorageService._remove_other_snapshot_files(instance_id, data_type, None)
+            DataStorageService._remove_other_item_index_files(instance_id, data_type, None)
+            snapshot_cache.put(
+                (instance_id, data_type.value, "index"), ("sqlite", writer.version), item_index
+            )
+            return DataStorageService._get_item_store(instance_id, data_type).path
+        
+        DataStorageService._write_item_index(instance_id, data_type, writer.path, item_index)
+        DataStorageService._remove_other_snapshot_files(instance_id, data_type, writer.path)
+        DataStorageService._get_item_store(instance_id, data_type).clear(data_type.value)
+        return writer.path
+    
+    @staticmethod
+    def _cache_snapshot(key: Tuple, version: Tuple, data: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+        """Put loaded snapshot items in the cache, in the compact representation if enabled"""
+        if settings.snapshot_compact_items and not isinstance(data, CompactSnapshot):
+            data = CompactSnapshot(data)
+        return snapshot_cache.put(key, version, data)
+    
+    @staticmethod
+    def _load_cache_entry(instance_id: int, data_type: DataType) -> Optional[Dict[str, Any]]:
+        """Load a snapshot through the in-memory cache.
+        
+        Raises SnapshotMigrationRequired if the snapshot is only stored in
+        another codec (e.g. a .json file from before the codec was
+        changed) or in the other backend; readers never write themselves.
+        """
+        key = (instance_id, data_type.value)
+        
+        if DataStorageService._use_item_store():
+            store = DataStorageService._get_item_store(instance_id, data_type)
+            version = store.version(data_type.value)
+            if version is not None:
+                entry = snapshot_cache.get(key, ("sqlite", version))
+                if entry is not None:
+                    return entry
+                return DataStorageService._cache_snapshot(key, ("sqlite", version), store.all(data_type.value))
+        else:
+            file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+            try:
+                version = DataStorageService._file_version(file_path)
+            except FileNotFoundError:
+                version = None
+            if version is not None:
+                entry = snapshot_cache.get(key, version)
+                if entry is not None:
+                    return entry
+                
+                codec = SnapshotCodec.configured()
+                if settings.snapshot_compact_items:
+                    # Compacted while decoding, so the full list of item dicts never exists
+                    data = CompactSnapshot(codec.iter_read(file_path))
+                else:
+                    data = codec.read(file_path)
+                return DataStorageService._cache_snapshot(key, version, data)
+        
+        if DataStorageService._needs_migration(instance_id, data_type):
+            raise SnapshotMigrationRequired()
+        return None
+    
+    @staticmethod
+    def _find_migratable_files(instance_id: int, data_type: DataType) -> List[Path]:
+        """Readable snapshot files of a data type other than the configured codec's (all of them with the item store)"""
+        keep = None
+        if not DataStorageService._use_item_store():
+            keep = DataStorageService._get_snapshot_path(instance_id, data_type)
+        return [
+            path for path in DataStorageService._find_snapshot_files(instance_id, data_type)
+            if path != keep and SnapshotCodec.from_path(path).available
+        ]
+    
+    @staticmethod
+    def _needs_migration(instance_id: int, data_type: DataType) -> bool:
+        """Whether _migrate_snapshot has something to do for a data type"""
+        store = DataStorageService._get_item_store(instance_id, data_type)
+        if DataStorageService._use_item_store():
+            if store.version(data_type.value) is not None:
+                return False
+            return bool(DataStorageService._find_migratable_files(instance_id, data_type))
+        
+        if DataStorageService._get_snapshot_path(instance_id, data_type).exists():
+            return DataStorageService._read_item_index(instance_id, data_type) is None
+        return (
+            bool(DataStorageService._find_migratable_files(instance_id, data_type))
+            or store.version(data_type.value) is not None
+        )
+    
+    @staticmethod
+    def _migrate_snapshot(instance_id: int, data_type: DataType) -> None:
+        """Move a snapshot to the configured codec and backend, or rebuild its outdated item index.
+        
+        Runs on the writer side only, under the snapshot's write lock.
+        """
+        if not DataStorageService._needs_migration(instance_id, data_type):
+            return
+        
+        key = (instance_id, data_type.value)
+        store = DataStorageService._get_item_store(instance_id, data_type)
+        other_paths = DataStorageService._find_migratable_files(instance_id, data_type)
+        
+        if DataStorageService._use_item_store():
+            # Snapshot file from before switching to the item store
+            data = SnapshotCodec.from_path(other_paths[0]).read(other_paths[0])
+            DataStorageService._write_item_store(instance_id, data_type, data)
+            DataStorageService._remove_other_snapshot_files(instance_id, data_type, None)
+            DataStorageService._remove_other_item_index_files(instance_id, data_type, None)
+            DataStorageService._cache_snapshot(key, ("sqlite", store.version(data_type.value)), data)
+            return
+        
         file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+        if file_path.exists():
+            # Rewrite the snapshot so item positions are known again
+            data = [to_dict(item) for item in DataStorageService._load_snapshot(instance_id, data_type)]
+        elif other_paths:
+            data = SnapshotCodec.from_path(other_paths[0]).read(other_paths[0])
+        else:
+            # Snapshot kept in the item store before switching to files
+            data = store.all(data_type.value)
         
-        if not file_path.exists():
+        DataStorageService._write_snapshot_file(instance_id, data_type, file_path, data)
+        DataStorageService._remove_other_snapshot_files(instance_id, data_type, file_path)
+        store.clear(data_type.value)
+        DataStorageService._cache_snapshot(key, DataStorageService._file_version(file_path), data)
+    
+    @staticmethod
+    def _load_snapshot(instance_id: int, data_type: DataType) -> Optional[Sequence[Mapping[str, Any]]]:
+        """Load data snapshot (served from memory while the file is unchanged).
+        
+        The returned items are shared with other callers and must not be
+        modified; with snapshot_compact_items they are read-only
+        CompactItem views (to_dict gives a plain copy).
+        """
+        entry = DataStorageService._load_cache_entry(instance_id, data_type)
+        return entry["data"] if entry is not None else None
+    
+    @staticmethod
+    def _get_snapshot_index(instance_id: int, data_type: DataType) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Items of a snapshot by identifier (pages also by url_key), None if there is no snapshot"""
+        entry = DataStorageService._load_cache_entry(instance_id, data_type)
+        if entry is None:
             return None
-            
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        
+        if entry["index"] is None:
+            index = {}
+            for item in entry["data"]:
+                if item.get("identifier") is not None:
+                    index.setdefault(item["identifier"], item)
+                if data_type == DataType.PAGES and item.get("url_key") is not None:
+                    index.setdefault(item["url_key"], item)
+            entry["index"] = index
+        
+        return entry["index"]
     
     @staticmethod
-    async def refresh_instance_data(
+    def _get_fingerprints(
+        instance_id: int,
+        data_type: DataType,
+        data: Sequence[Mapping[str, Any]]
+    ) -> Optional[List[str]]:
+        """Item hashes of a loaded snapshot in item order (see ComparisonService.fingerprint).
+        
+        Taken from the item index, or computed once if it does not match,
+        and cached with the snapshot. None if data is no longer the cached
+        snapshot, so hashes never get paired with other items.
+        """
+        entry = DataStorageService._load_cache_entry(instance_id, data_type)
+        if entry is None or entry["data"] is not data:
+            return None
+        
+        if entry["fingerprints"] is None:
+            item_index = DataStorageService._read_item_index(instance_id, data_type)
+            # The index was checked against the current snapshot version, so it
+            # belongs to the cached items only if they have that version too
+            if item_index is not None and len(item_index) == len(data) and (
+                entry["version"] == DataStorageService._snapshot_version(instance_id, data_type)
+            ):
+                entry["fingerprints"] = [index_entry["hash"] for index_entry in item_index]
+            else:
+                entry["fingerprints"] = [ComparisonService.fingerprint(item, data_type)[0] for item in data]
+        
+        return entry["fingerprints"]
+    
+    @staticmethod
+    def _has_snapshot(instance_id: int, data_type: DataType) -> bool:
+        """Whether a snapshot of a data type is stored (in any codec or backend)"""
+        if DataStorageService._get_item_store(instance_id, data_type).version(data_type.value) is not None:
+            return True
+        return bool(DataStorageService._find_snapshot_files(instance_id, data_type))
+    
+    @staticmethod
+    def _find_item(instance_id: int, data_type: DataType, identifier: str) -> Optional[Dict[str, Any]]:
+        """Item of a snapshot by identifier (pages also by url_key).
+        
+        Looked up by index in the item store, or in the cached snapshot index.
+        """
+        if DataStorageService._use_item_store():
+            store = DataStorageService._get_item_store(instance_id, data_type)
+            if store.version(data_type.value) is not None:
+                return store.get(data_type.value, identifier)
+        
+        index = DataStorageService._get_snapshot_index(instance_id, data_type)
+        return index.get(identifier) if index is not None else None
+    
+    @staticmethod
+    def _index_entry(
+        item: Dict[str, Any],
+        data_type: DataType,
+        offset: Optional[int],
+        size: Optional[int]
+    ) -> Dict[str, Any]:
+        """Index entry of a snapshot item: identity, fingerprint and position in the file (if any)"""
+        identifier = ComparisonService._get_identifier(item, data_type)
+        store_id = ComparisonService.store_scope(item)
+        item_hash, field_hashes = ComparisonService.fingerprint(item, data_type)
+        return {
+            "key": f"{identifier}@{','.join(str(store) for store in store_id)}",
+            "identifier": identifier,
+            "title": ComparisonService._get_title(item),
+            "store_id": store_id,
+            "id": item.get("id"),
+            "update_time": item.get("update_time"),
+            "hash": item_hash,
+            "fields": field_hashes,
+            "offset": offset,
+            "size": size
+        }
+    
+    @staticmethod
+    def _write_snapshot_file(
+        instance_id: int,
+        data_type: DataType,
+        file_path: Path,
+        data: Iterable[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Write a snapshot file in the configured codec together with its item index"""
+        item_index = []
+        with SnapshotCodec.configured().writer(file_path) as writer:
+            for item in data:
+                offset, size = writer.write(item)
+                item_index.append(DataStorageService._index_entry(item, data_type, offset, size))
+        
+        DataStorageService._write_item_index(instance_id, data_type, file_path, item_index)
+        return item_index
+    
+    @staticmethod
+    def _write_item_store(
+        instance_id: int,
+        data_type: DataType,
+        data: Iterable[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Replace the snapshot of a data type in the item store, returns its item index"""
+        store = DataStorageService._get_item_store(instance_id, data_type)
+        item_index = []
+        with store.writer(data_type.value) as writer:
+            for item in data:
+                entry = DataStorageService._index_entry(item, data_type, None, None)
+                writer.write(entry, item)
+                item_index.append(entry)
+        
+        snapshot_cache.put((instance_id, data_type.value, "index"), ("sqlite", writer.version), item_index)
+        return item_index
+    
+    @staticmethod
+    def _write_item_index(
+        instance_id: int,
+        data_type: DataType,
+        file_path: Path,
+        item_index: List[Dict[str, Any]]
+    ) -> None:
+        """Write the item index of a snapshot file.
+        
+        The first record is a header naming the snapshot file version and
+        compared fields it was built from, so a stale index is detected.
+        """
+        header = {
+            "snapshot": file_path.name,
+            "version": list(DataStorageService._file_version(file_path)),
+            "fields": COMPARE_FIELDS[data_type]
+        }
+        index_path = DataStorageService._get_item_index_path(instance_id, data_type)
+        SnapshotCodec.configured().write(index_path, [header, *item_index])
+        DataStorageService._remove_other_item_index_files(instance_id, data_type, index_path)
+        snapshot_cache.put(
+            (instance_id, data_type.value, "index"), DataStorageService._file_version(index_path), item_index
+        )
+    
+    @staticmethod
+    def _read_item_index(instance_id: int, data_type: DataType) -> Optional[List[Dict[str, Any]]]:
+        """Item index of a snapshot through the in-memory cache, None if missing or outdated"""
+        key = (instance_id, data_type.value, "index")
+        
+        if DataStorageService._use_item_store():
+            store = DataStorageService._get_item_store(instance_id, data_type)
+            version = store.version(data_type.value)
+            if version is None:
+                return None
+            entry = snapshot_cache.get(key, ("sqlite", version))
+            if entry is not None:
+                return entry["data"]
+            return snapshot_cache.put(key, ("sqlite", version), store.entries(data_type.value))["data"]
+        
+        file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+        index_path = DataStorageService._get_item_index_path(instance_id, data_type)
+        if not file_path.exists() or not index_path.exists():
+            return None
+        
+        index_version = DataStorageService._file_version(index_path)
+        entry = snapshot_cache.get(key, index_version)
+        if entry is not None:
+            return entry["data"]
+        
+        header, *item_index = SnapshotCodec.configured().read(index_path)
+        if (
+            header.get("snapshot") != file_path.name
+            or tuple(header.get("version", ())) != DataStorageService._file_version(file_path)
+            or header.get("fields") != COMPARE_FIELDS[data_type]
+        ):
+            return None
+        return snapshot_cache.put(key, index_version, item_index)["data"]
+    
+    @staticmethod
+    def _load_item_index(instance_id: int, data_type: DataType) -> Optional[List[Dict[str, Any]]]:
+        """Item index of a snapshot (one entry per item, in snapshot order), None if there is no snapshot.
+        
+        Each entry has the item's identifier, store scope, id, update_time,
+        a fingerprint of the compared fields and the item's position in the
+        snapshot file (None in the item store). Raises
+        SnapshotMigrationRequired if the index is missing or outdated.
+        The returned list is shared with other callers and must not be modified.
+        """
+        item_index = DataStorageService._read_item_index(instance_id, data_type)
+        if item_index is not None:
+            return item_index
+        
+        if DataStorageService._needs_migration(instance_id, data_type):
+            raise SnapshotMigrationRequired()
+        return None
+    
+    @staticmethod
+    def _load_items(
+        instance_id: int,
+        data_type: DataType,
+        identifiers: Iterable[str]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Load only the snapshot items with the given identifiers (in any store scope).
+        
+        Items are looked up in the item store, or read at their indexed
+        positions in the snapshot file unless the whole snapshot is in
+        memory already. Returns None if there is no snapshot.
+        """
+        item_index = DataStorageService._load_item_index(instance_id, data_type)
+        if item_index is None:
+            return None
+        
+        if DataStorageService._use_item_store():
+            return DataStorageService._get_item_store(instance_id, data_type).get_many(data_type.value, identifiers)
+        
+        wanted = set(identifiers)
+        positions = [
+            (entry["offset"], entry["size"]) for entry in item_index
+            if entry["identifier"] in wanted
+        ]
+        if not positions:
+            return []
+        
+        file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+        cached = snapshot_cache.get((instance_id, data_type.value), DataStorageService._file_version(file_path))
+        if cached is not None:
+            return [
+                item for item in cached["data"]
+                if ComparisonService._get_identifier(item, data_type) in wanted
+            ]
+        
+        return SnapshotCodec.configured().read_at(file_path, positions)
+    
+    @staticmethod
+    async def load_snapshot(instance_id: int, data_type: DataType) -> Optional[Sequence[Mapping[str, Any]]]:
+        """Load data snapshot in the snapshot I/O pool (see _load_snapshot)"""
+        return await DataStorageService._read(DataStorageService._load_snapshot, instance_id, data_type)
+    
+    @staticmethod
+    async def get_snapshot_index(instance_id: int, data_type: DataType) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Items of a snapshot by identifier, loaded in the snapshot I/O pool (see _get_snapshot_index)"""
+        return await DataStorageService._read(DataStorageService._get_snapshot_index, instance_id, data_type)
+    
+    @staticmethod
+    async def load_fingerprints(
+        instance_id: int,
+        data_type: DataType,
+        data: Sequence[Mapping[str, Any]]
+    ) -> Optional[List[str]]:
+        """Item hashes of a loaded snapshot, looked up in the snapshot I/O pool (see _get_fingerprints)"""
+        return await DataStorageService._read(DataStorageService._get_fingerprints, instance_id, data_type, data)
+    
+    @staticmethod
+    async def has_snapshot(instance_id: int, data_type: DataType) -> bool:
+        """Whether a snapshot of a data type is stored, checked in the snapshot I/O pool"""
+        return await snapshot_io.run(DataStorageService._has_snapshot, instance_id, data_type)
+    
+    @staticmethod
+    async def find_item(instance_id: int, data_type: DataType, identifier: str) -> Optional[Dict[str, Any]]:
+        """Item of a snapshot by identifier, looked up in the snapshot I/O pool (see _find_item)"""
+        return await DataStorageService._read(DataStorageService._find_item, instance_id, data_type, identifier)
+    
+    @staticmethod
+    async def load_item_index(instance_id: int, data_type: DataType) -> Optional[List[Dict[str, Any]]]:
+        """Item index of a snapshot, loaded in the snapshot I/O pool (see _load_item_index)"""
+        return await DataStorageService._read(DataStorageService._load_item_index, instance_id, data_type)
+    
+    @staticmethod
+    def _load_entry_items(
+        instance_id: int,
+        data_type: DataType,
+        entries: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Bodies of the snapshot items behind item index entries, in entry order.
+        
+        Read by key from the item store, or at the entries' positions in
+        the snapshot file.
+        """
+        if not entries:
+            return []
+        if DataStorageService._use_item_store():
+            return DataStorageService._get_item_store(instance_id, data_type).get_by_keys(
+                data_type.value, [entry["key"] for entry in entries]
+            )
+        
+        file_path = DataStorageService._get_snapshot_path(instance_id, data_type)
+        return SnapshotCodec.configured().read_at(
+            file_path, [(entry["offset"], entry["size"]) for entry in entries]
+        )
+    
+    @staticmethod
+    async def load_entry_items(
+        instance_id: int,
+        data_type: DataType,
+        entries: List[Dict[str, Any]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Load the items behind item index entries in the snapshot I/O pool (see _load_entry_items)"""
+        return await snapshot_io.run(DataStorageService._load_entry_items, instance_id, data_type, entries)
+    
+    @staticmethod
+    async def load_items(
+        instance_id: int,
+        data_type: DataType,
+        identifiers: Iterable[str]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Load the snapshot items with the given identifiers in the snapshot I/O pool (see _load_items)"""
+        return await DataStorageService._read(DataStorageService._load_items, instance_id, data_type, list(identifiers))
+    
+    @staticmethod
+    def detect_changes(
+        previous_index: List[Dict[str, Any]],
+        item_index: List[Dict[str, Any]]
+    ) -> Dict[str, List[str]]:
+        """Index keys (identifier@stores) added, removed and modified between two item indexes"""
+        previous = {entry["key"]: entry["hash"] for entry in previous_index}
+        current = {entry["key"]: entry["hash"] for entry in item_index}
+        return {
+            "added": [key for key in current if key not in previous],
+            "removed": [key for key in previous if key not in current],
+            "modified": [
+                key for key, item_hash in current.items()
+                if key in previous and previous[key] != item_hash
+            ]
+        }
+    
+    @staticmethod
+    async def _record_changes(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType,
+        metadata: Optional[Dict[str, Any]],
+        previous_index: Optional[List[Dict[str, Any]]],
+        item_index: List[Dict[str, Any]],
+        history: Optional[HistoryWriter]
+    ) -> Dict[str, Any]:
+        """Record the history version and changelog of a new snapshot, returns its metadata.
+        
+        The metadata gets counts of added/removed/modified items since the
+        previous snapshot; the history version and changelog entries are
+        committed together with the snapshot record.
+        """
+        metadata = dict(metadata or {})
+        changes = None
+        if previous_index is not None:
+            changes = DataStorageService.detect_changes(previous_index, item_index)
+            metadata["changes"] = {kind: len(keys) for kind, keys in changes.items()}
+        
+        version = None
+        if history is not None:
+            snapshot_version = await SnapshotHistoryService.record_version(db, instance_id, data_type, history, metadata)
+            version = snapshot_version.version
+        
+        if changes is not None:
+            entries = ChangeFeedService.build_entries(previous_index, item_index, changes, data_type)
+            await ChangeFeedService.record(db, instance_id, data_type, entries, version)
+        
+        return metadata
+    
+    @staticmethod
+    async def get_or_refresh_item_index(
         db: AsyncSession,
         instance: Instance,
+        data_type: DataType,
+        force_refresh: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Get the item index of a snapshot, refreshing the snapshot if needed.
+        
+        A stale snapshot is served as is while it is refreshed in the background.
+        """
+        if not force_refresh:
+            item_index = await DataStorageService.load_item_index(instance.id, data_type)
+            if item_index is not None:
+                await DataStorageService.revalidate_if_stale(db, instance, data_type)
+                return item_index
+        
+        await DataStorageService.refresh_instance_data(instance, data_type)
+        
+        return await DataStorageService.load_item_index(instance.id, data_type) or []
+    
+    @staticmethod
+    async def get_max_age(db: AsyncSession, instance_id: int, data_type: DataType) -> int:
+        """Seconds before a snapshot is stale: the instance's policy, else snapshot_max_age (0 = never)"""
+        result = await db.execute(
+            select(SnapshotPolicy.max_age).where(
+                SnapshotPolicy.instance_id == instance_id,
+                SnapshotPolicy.data_type == data_type.value
+            )
+        )
+        max_age = result.scalar_one_or_none()
+        return max_age if max_age is not None else settings.snapshot_max_age
+    
+    @staticmethod
+    async def get_freshness(
+        db: AsyncSession,
+        instance_id: int,
         data_type: DataType
-    ) -> DataSnapshot:
-        """Fetch fresh data from Magento and save snapshot"""
-        client = MagentoClient(
-            base_url=str(instance.url),
-            token=instance.api_token
+    ) -> Optional[Dict[str, Any]]:
+        """Age of a snapshot against its max age, None if there is no snapshot"""
+        record = await DataStorageService._get_snapshot_record(db, instance_id, data_type)
+        if record is None:
+            return None
+        
+        max_age = await DataStorageService.get_max_age(db, instance_id, data_type)
+        age = (datetime.utcnow() - record.created_at).total_seconds()
+        return {
+            "created_at": record.created_at,
+            "age_seconds": round(age, 1),
+            "max_age": max_age,
+            "is_stale": max_age > 0 and age >= max_age,
+            "refreshing": DataStorageService.is_refreshing(instance_id, data_type)
+        }
+    
+    @staticmethod
+    async def revalidate_if_stale(db: AsyncSession, instance: Instance, data_type: DataType) -> bool:
+        """Start a background refresh if the snapshot is stale, returns whether one is running"""
+        freshness = await DataStorageService.get_freshness(db, instance.id, data_type)
+        if freshness is None or not freshness["is_stale"]:
+            return False
+        if not freshness["refreshing"]:
+            DataStorageService.refresh_in_background(instance, data_type)
+        return True
+    
+    @staticmethod
+    def refresh_in_background(instance: Instance, data_type: DataType) -> asyncio.Task:
+        """Refresh a snapshot without waiting for it (joins a refresh already in flight)"""
+        # The refresh opens its own session, the caller's may be closed meanwhile
+        task = asyncio.ensure_future(DataStorageService.refresh_instance_data(instance, data_type))
+        revalidations.add(task)
+        
+        def done(task: asyncio.Task) -> None:
+            revalidations.discard(task)
+            if not task.cancelled():
+                task.exception()  # failures are counted in refresh_flights stats
+        
+        task.add_done_callback(done)
+        return task
+    
+    @staticmethod
+    def _stored_latest_update_time(
+        instance_id: int,
+        data_type: DataType,
+        data: Sequence[Mapping[str, Any]]
+    ) -> Optional[str]:
+        """Newest update_time of a stored snapshot, from the item store's update_time index when it is used"""
+        if DataStorageService._use_item_store():
+            return DataStorageService._get_item_store(instance_id, data_type).latest_update_time(data_type.value)
+        return DataStorageService._latest_update_time(data)
+    
+    @staticmethod
+    def _latest_update_time(data: List[Dict[str, Any]]) -> Optional[str]:
+        """Newest update_time in a snapshot (Magento timestamps sort as strings)"""
+        update_times = [item["update_time"] for item in data if item.get("update_time")]
+        return max(update_times) if update_times else None
+    
+    @staticmethod
+    def _merge_items(
+        existing: List[Dict[str, Any]],
+        changed: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Merge changed items into a snapshot, replacing items with the same id"""
+        merged = {item.get("id"): item for item in existing}
+        for item in changed:
+            merged[item.get("id")] = item
+        return [to_dict(item) for item in merged.values()]
+    
+    @staticmethod
+    def _reconcile_due(metadata: Dict[str, Any]) -> bool:
+        """Whether deletions should be reconciled on this incremental refresh"""
+        last_reconciled = metadata.get("last_reconciled_at")
+        if not last_reconciled:
+            return True
+        age = datetime.utcnow() - datetime.fromisoformat(last_reconciled)
+        return age.total_seconds() >= settings.snapshot_reconcile_interval
+    
+    @staticmethod
+    async def _get_snapshot_record(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType
+    ) -> Optional[DataSnapshot]:
+        """Get the database record of a snapshot"""
+        result = await db.execute(
+            select(DataSnapshot).where(
+                DataSnapshot.instance_id == instance_id,
+                DataSnapshot.data_type == data_type.value
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    def _listing_changed(listed: Dict[str, Any], stored: Optional[Dict[str, Any]]) -> bool:
+        """Whether a listed item is new or its metadata differs from the stored item"""
+        if stored is None:
+            return True
+        return any(
+            listed.get(field) != stored.get(field)
+            for field in LISTING_FIELDS
         )
+    
+    @staticmethod
+    async def _fetch_two_phase(
+        client: MagentoClient,
+        data_type: DataType,
+        existing: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Refresh from a metadata-only listing, downloading content only for new/changed items.
         
-        # Fetch data based on type
+        The listing is authoritative, so items deleted in Magento drop out
+        of the snapshot as well.
+        """
         if data_type == DataType.BLOCKS:
-            data = await client.get_cms_blocks()
+            listing = await client.get_cms_block_listing()
         else:  # DataType.PAGES
-            data = await client.get_cms_pages()
+            listing = await client.get_cms_page_listing()
+        
+        stored_by_id = {item.get("id"): item for item in existing}
+        changed_ids = [
+            listed.get("id") for listed in listing
+            if DataStorageService._listing_changed(listed, stored_by_id.get(listed.get("id")))
+        ]
+        
+        if data_type == DataType.BLOCKS:
+            fetched = await client.get_cms_blocks_by_ids(changed_ids) if changed_ids else []
+        else:  # DataType.PAGES
+            fetched = await client.get_cms_pages_by_ids(changed_ids) if changed_ids else []
+        
+        fetched_by_id = {item.get("id"): item for item in fetched}
+        data = []
+        for listed in listing:
+            item_id = listed.get("id")
+            item = fetched_by_id.get(item_id) or stored_by_id.get(item_id)
+            if item is not None:
+                data.append(to_dict(item))
+        
+        metadata = {
+            "changed_count": len(changed_ids),
+            "removed_count": len(set(stored_by_id) - {listed.get("id") for listed in listing})
+        }
+        return data, metadata
+    
+    @staticmethod
+    async def refresh_instance_data(
+        instance: Instance,
+        data_type: DataType,
+        incremental: Optional[bool] = None
+    ) -> DataSnapshot:
+        """Fetch fresh data from Magento and save snapshot.
+        
+        Concurrent refreshes of the same (instance, data type, mode) are
+        coalesced: later callers wait for the refresh already in flight and
+        get its snapshot. A full refresh never joins an incremental one. The
+        refresh runs in its own database session so it is not tied to the
+        request that happened to start it.
+        """
+        if incremental is None:
+            incremental = settings.snapshot_incremental_refresh
+        
+        async def run_refresh() -> DataSnapshot:
+            async with AsyncSessionLocal() as session:
+                return await DataStorageService._refresh_instance_data(
+                    session, instance, data_type, incremental
+                )
+        
+        mode = "incremental" if incremental else "full"
+        return await refresh_flights.do((instance.id, data_type.value, mode), run_refresh)
+    
+    @staticmethod
+    def is_refreshing(instance_id: int, data_type: DataType) -> bool:
+        """Whether a refresh of the snapshot, in either mode, is in flight"""
+        return any(
+            refresh_flights.in_flight((instance_id, data_type.value, mode))
+            for mode in ("incremental", "full")
+        )
+    
+    @staticmethod
+    async def _refresh_instance_data(
+        db: AsyncSession,
+        instance: Instance,
+        data_type: DataType,
+        incremental: Optional[bool] = None
+    ) -> DataSnapshot:
+        """Fetch fresh data from Magento and save snapshot.
+        
+        In incremental mode only items whose update_time is at or after the
+        newest one in the stored snapshot are downloaded and merged in.
+        Every snapshot_reconcile_interval seconds a two-phase refresh is
+        done instead: a metadata-only listing of all items, then content
+        only for new or changed items, which also drops deleted items.
+        Without a stored snapshot a full download is done, streamed
+        directly to disk when snapshot_streaming is enabled.
+        """
+        if incremental is None:
+            incremental = settings.snapshot_incremental_refresh
+        
+        client = connection_pool.client_for(instance)
+        
+        existing = await DataStorageService.load_snapshot(instance.id, data_type) if incremental else None
+        record = await DataStorageService._get_snapshot_record(db, instance.id, data_type) if existing is not None else None
+        previous_metadata = (record.snapshot_metadata or {}) if record else {}
+        updated_since = await snapshot_io.run(
+            DataStorageService._stored_latest_update_time, instance.id, data_type, existing
+        ) if existing else None
+        
+        now = datetime.utcnow().isoformat()
+        
+        if existing is not None and (not updated_since or DataStorageService._reconcile_due(previous_metadata)):
+            data, metadata = await DataStorageService._fetch_two_phase(client, data_type, existing)
+            metadata["refresh_mode"] = "two_phase"
+            metadata["last_reconciled_at"] = now
+            
+        elif existing is not None:
+            # Fetch only what changed since the last snapshot
+            if data_type == DataType.BLOCKS:
+                changed = await client.get_cms_blocks(updated_since=updated_since)
+            else:  # DataType.PAGES
+                changed = await client.get_cms_pages(updated_since=updated_since)
+            
+            data = DataStorageService._merge_items(existing, changed)
+            metadata = {
+                "refresh_mode": "incremental",
+                "updated_since": updated_since,
+                "changed_count": len(changed),
+                "last_reconciled_at": previous_metadata.get("last_reconciled_at")
+            }
+            
+        elif settings.snapshot_streaming:
+            # Stream items straight into the snapshot file
+            metadata = {
+                "refresh_mode": "full",
+                "last_reconciled_at": now,
+                "store_views": await store_view_registry.get(instance)
+            }
+            if data_type == DataType.BLOCKS:
+                items = client.stream_cms_blocks()
+            else:  # DataType.PAGES
+                items = client.stream_cms_pages()
+            
+            return await DataStorageService.save_snapshot_stream(
+                db=db,
+                instance_id=instance.id,
+                data_type=data_type,
+                items=items,
+                metadata=metadata
+            )
+            
+        else:
+            # Fetch data based on type
+            if data_type == DataType.BLOCKS:
+                data = await client.get_cms_blocks()
+            else:  # DataType.PAGES
+                data = await client.get_cms_pages()
+            
+            metadata = {"refresh_mode": "full", "last_reconciled_at": now}
         
         # Get store views for metadata
-        store_views = await client.get_store_views()
+        metadata["store_views"] = await store_view_registry.get(instance)
         
         # Save snapshot
         snapshot = await DataStorageService.save_snapshot(
@@ -115,7 +1154,7 @@ class DataStorageService:
             instance_id=instance.id,
             data_type=data_type,
             data=data,
-            metadata={"store_views": store_views}
+            metadata=metadata
         )
         
         return snapshot
@@ -126,17 +1165,21 @@ class DataStorageService:
         instance: Instance,
         data_type: DataType,
         force_refresh: bool = False
-    ) -> List[Dict[str, Any]]:
-        """Get data from snapshot or refresh if needed"""
+    ) -> Sequence[Mapping[str, Any]]:
+        """Get data from snapshot or refresh if needed.
+        
+        A stale snapshot is served as is while it is refreshed in the background.
+        """
         if not force_refresh:
             # Try to load existing snapshot
-            data = DataStorageService.load_snapshot(instance.id, data_type)
+            data = await DataStorageService.load_snapshot(instance.id, data_type)
             if data is not None:
+                await DataStorageService.revalidate_if_stale(db, instance, data_type)
                 return data
         
         # Refresh data from Magento
-        await DataStorageService.refresh_instance_data(db, instance, data_type)
+        await DataStorageService.refresh_instance_data(instance, data_type)
         
         # Load and return the fresh data
-        data = DataStorageService.load_snapshot(instance.id, data_type)
+        data = await DataStorageService.load_snapshot(instance.id, data_type)
         return data or []
\ No newline at end of file
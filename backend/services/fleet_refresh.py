@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple, AsyncIterator
+
+from models.models import Instance
+from models.schemas import DataType
+from services.data_storage import DataStorageService
+from config import settings
+
+
+class FleetRefreshService:
+    @staticmethod
+    async def _refresh_one(
+        instance: Instance,
+        data_type: DataType,
+        incremental: Optional[bool],
+        fleet_slots: asyncio.Semaphore,
+        instance_slots: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Refresh one snapshot within the concurrency caps, returns its progress event"""
+        event = {
+            "instance_id": instance.id,
+            "instance_name": instance.name,
+            "data_type": data_type.value
+        }
+        # Take the per-instance slot first so waiting on a busy instance holds no fleet slot
+        async with instance_slots, fleet_slots:
+            started = time.monotonic()
+            try:
+                snapshot = await DataStorageService.refresh_instance_data(instance, data_type, incremental)
+            except Exception as e:
+                return {
+                    **event,
+                    "event": "failed",
+                    "error": str(e) or type(e).__name__,
+                    "duration_seconds": round(time.monotonic() - started, 3)
+                }
+        return {
+            **event,
+            "event": "refreshed",
+            "item_count": snapshot.item_count,
+            "refresh_mode": (snapshot.snapshot_metadata or {}).get("refresh_mode"),
+            "duration_seconds": round(time.monotonic() - started, 3)
+        }
+
+    @staticmethod
+    async def refresh(
+        targets: Sequence[Tuple[Instance, DataType]],
+        incremental: Optional[bool] = None,
+        concurrency: Optional[int] = None,
+        per_instance: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Refresh many snapshots in parallel, yielding a progress event per snapshot as it finishes.
+
+        At most `concurrency` refreshes run at once, and at most
+        `per_instance` against the same instance. The last event is a
+        summary of counts, durations and failures.
+        """
+        concurrency = max(concurrency or settings.fleet_refresh_concurrency, 1)
+        per_instance = max(per_instance or settings.fleet_refresh_per_instance, 1)
+        fleet_slots = asyncio.Semaphore(concurrency)
+        instance_slots = defaultdict(lambda: asyncio.Semaphore(per_instance))
+
+        started_at = datetime.utcnow()
+        started = time.monotonic()
+        yield {
+            "event": "started",
+            "snapshots": len(targets),
+            "instances": len({instance.id for instance, _ in targets}),
+            "concurrency": concurrency,
+            "per_instance": per_instance,
+            "started_at": started_at
+        }
+
+        tasks = [
+            asyncio.ensure_future(FleetRefreshService._refresh_one(
+                instance, data_type, incremental, fleet_slots, instance_slots[instance.id]
+            ))
+            for instance, data_type in targets
+        ]
+        events: List[Dict[str, Any]] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                events.append(event)
+                yield {**event, "completed": len(events), "total": len(tasks)}
+        finally:
+            # The refreshes themselves are shielded and finish regardless
+            for task in tasks:
+                task.cancel()
+
+        yield FleetRefreshService._summary(events, started_at, time.monotonic() - started)
+
+    @staticmethod
+    def _summary(events: List[Dict[str, Any]], started_at: datetime, duration: float) -> Dict[str, Any]:
+        refreshed = [event for event in events if event["event"] == "refreshed"]
+        failed = [event for event in events if event["event"] == "failed"]
+
+        instances: Dict[int, Dict[str, Any]] = {}
+        for event in events:
+            summary = instances.setdefault(event["instance_id"], {
+                "instance_id": event["instance_id"],
+                "instance_name": event["instance_name"],
+                "item_count": 0,
+                "duration_seconds": 0.0,
+                "failed": []
+            })
+            summary["duration_seconds"] = round(summary["duration_seconds"] + event["duration_seconds"], 3)
+            if event["event"] == "refreshed":
+                summary["item_count"] += event["item_count"]
+            else:
+                summary["failed"].append(event["data_type"])
+
+        slowest = max(events, key=lambda event: event["duration_seconds"], default=None)
+        return {
+            "event": "summary",
+            "started_at": started_at,
+            "duration_seconds": round(duration, 3),
+            "sequential_seconds": round(sum(event["duration_seconds"] for event in events), 3),
+            "slowest": {
+                key: slowest[key] for key in ("instance_id", "instance_name", "data_type", "duration_seconds")
+            } if slowest else None,
+            "refreshed": len(refreshed),
+            "failed": len(failed),
+            "item_count": sum(event["item_count"] for event in refreshed),
+            "instances": list(instances.values()),
+            "failures": [
+                {key: event[key] for key in ("instance_id", "instance_name", "data_type", "error")}
+                for event in failed
+            ]
+        }
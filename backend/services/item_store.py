@@ -0,0 +1,312 @@
+import hashlib
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional, falls back to JSON
+    msgpack = None
+
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS items (
+    data_type TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    identifier TEXT,
+    url_key TEXT,
+    item_id INTEGER,
+    title TEXT,
+    store_id TEXT NOT NULL,
+    update_time TEXT,
+    hash TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (data_type, key)
+);
+CREATE INDEX IF NOT EXISTS items_identifier ON items (data_type, identifier);
+CREATE INDEX IF NOT EXISTS items_url_key ON items (data_type, url_key);
+CREATE INDEX IF NOT EXISTS items_update_time ON items (data_type, update_time);
+CREATE INDEX IF NOT EXISTS items_position ON items (data_type, position);
+CREATE TABLE IF NOT EXISTS snapshots (
+    data_type TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    item_count INTEGER NOT NULL
+);
+"""
+
+INDEX_COLUMNS = "key, identifier, title, store_id, item_id, update_time, hash, fields"
+
+# Rows per executemany batch when writing
+WRITE_BATCH_SIZE = 500
+# Parameters per IN (...) lookup, below SQLite's host parameter limit
+LOOKUP_BATCH_SIZE = 500
+# Stored in PRAGMA user_version once SCHEMA has been applied to a file
+SCHEMA_VERSION = 1
+
+
+def _open(path: Path) -> sqlite3.Connection:
+    # Writers may be driven from different snapshot I/O threads in turn
+    connection = sqlite3.connect(path, check_same_thread=False)
+    # The schema and WAL mode (which persists in the file) are set up once per file
+    if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+def _encode(item: Dict[str, Any]) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(item, use_bin_type=True)
+    return json.dumps(item, ensure_ascii=False).encode("utf-8")
+
+
+def _decode(body: bytes) -> Dict[str, Any]:
+    if msgpack is not None:
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+class ItemStoreWriter:
+    """Replaces the snapshot of a data type in an item store (see ItemStore.writer).
+
+    Items are bulk-upserted in batches; rows whose body did not change only
+    get their position refreshed. Rows not written again are deleted when
+    the writer commits, and everything happens in one transaction, so
+    readers see either the old or the new snapshot.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, data_type: str):
+        self.data_type = data_type
+        self.count = 0
+        self.changed = 0
+        self._connection = connection
+        row = connection.execute(
+            "SELECT version FROM snapshots WHERE data_type = ?", (data_type,)
+        ).fetchone()
+        self.version = (row[0] if row else 0) + 1
+        self._stored = dict(connection.execute(
+            "SELECT key, body_hash FROM items WHERE data_type = ?", (data_type,)
+        ))
+        self._upserts: List[Tuple] = []
+        self._touches: List[Tuple] = []
+
+    def write(self, entry: Dict[str, Any], item: Dict[str, Any]) -> None:
+        """Write an item with its index entry (identity and fingerprint)"""
+        key = entry["key"]
+        body = _encode(item)
+        body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+        if self._stored.get(key) == body_hash:
+            self._touches.append((self.count, self.version, self.data_type, key))
+        else:
+            self._upserts.append((
+                self.data_type, key, self.count, self.version,
+                entry["identifier"], item.get("url_key"), entry["id"], entry["title"],
+                json.dumps(entry["store_id"]), entry["update_time"],
+                entry["hash"], entry["fields"], body_hash, body
+            ))
+            self.changed += 1
+
+        self.count += 1
+        if len(self._upserts) + len(self._touches) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._upserts:
+            self._connection.executemany(
+                """INSERT INTO items (
+                    data_type, key, position, generation, identifier, url_key, item_id, title,
+                    store_id, update_time, hash, fields, body_hash, body
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (data_type, key) DO UPDATE SET
+                    position = excluded.position, generation = excluded.generation,
+                    identifier = excluded.identifier, url_key = excluded.url_key,
+                    item_id = excluded.item_id, title = excluded.title,
+                    store_id = excluded.store_id, update_time = excluded.update_time,
+                    hash = excluded.hash, fields = excluded.fields,
+                    body_hash = excluded.body_hash, body = excluded.body""",
+                self._upserts
+            )
+        if self._touches:
+            self._connection.executemany(
+                "UPDATE items SET position = ?, generation = ? WHERE data_type = ? AND key = ?",
+                self._touches
+            )
+        self._upserts, self._touches = [], []
+
+    def commit(self) -> None:
+        """Drop rows that were not written again, publish the new version and close"""
+        self.flush()
+        self._connection.execute(
+            "DELETE FROM items WHERE data_type = ? AND generation != ?",
+            (self.data_type, self.version)
+        )
+        self._connection.execute(
+            """INSERT INTO snapshots (data_type, version, item_count) VALUES (?, ?, ?)
+            ON CONFLICT (data_type) DO UPDATE SET
+                version = excluded.version, item_count = excluded.item_count""",
+            (self.data_type, self.version, self.count)
+        )
+        self._connection.commit()
+        self._connection.close()
+
+    def abort(self) -> None:
+        """Roll back everything written and close"""
+        self._connection.rollback()
+        self._connection.close()
+
+    def __enter__(self) -> "ItemStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class ItemStore:
+    """SQLite file holding snapshot items as rows.
+
+    Rows are keyed by data type and identifier@stores (see
+    DataStorageService._index_entry) and indexed by identifier, url_key
+    and update_time, so single items, update_time ranges and the
+    incremental refresh watermark are looked up without loading the
+    whole snapshot. The snapshots table counts versions per data type
+    for cache validation.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = _open(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def writer(self, data_type: str) -> ItemStoreWriter:
+        """Start replacing the snapshot of a data type (committed when used as a context manager)"""
+        return ItemStoreWriter(_open(self.path), data_type)
+
+    def version(self, data_type: str) -> Optional[int]:
+        """Version of the stored snapshot of a data type, None if there is none"""
+        if not self.path.exists():
+            return None
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT version FROM snapshots WHERE data_type = ?", (data_type,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def clear(self, data_type: str) -> None:
+        """Delete the stored snapshot of a data type"""
+        if not self.path.exists():
+            return
+        with self._connect() as connection:
+            connection.execute("DELETE FROM items WHERE data_type = ?", (data_type,))
+            connection.execute("DELETE FROM snapshots WHERE data_type = ?", (data_type,))
+
+    def all(self, data_type: str) -> List[Dict[str, Any]]:
+        """All items of a data type in snapshot order"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT body FROM items WHERE data_type = ? ORDER BY position", (data_type,)
+            ).fetchall()
+        return [_decode(body) for (body,) in rows]
+
+    def entries(self, data_type: str) -> List[Dict[str, Any]]:
+        """Index entries of all items of a data type in snapshot order, without bodies"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {INDEX_COLUMNS} FROM items WHERE data_type = ? ORDER BY position",
+                (data_type,)
+            ).fetchall()
+        return [
+            {
+                "key": key,
+                "identifier": identifier,
+                "title": title,
+                "store_id": json.loads(store_id),
+                "id": item_id,
+                "update_time": update_time,
+                "hash": item_hash,
+                "fields": fields,
+                "offset": None,
+                "size": None
+            }
+            for key, identifier, title, store_id, item_id, update_time, item_hash, fields in rows
+        ]
+
+    def get(self, data_type: str, identifier: str) -> Optional[Dict[str, Any]]:
+        """First item (in snapshot order) with the given identifier or url_key"""
+        with self._connect() as connection:
+            row = connection.execute(
+                """SELECT body FROM items WHERE data_type = ? AND (identifier = ? OR url_key = ?)
+                ORDER BY position LIMIT 1""",
+                (data_type, identifier, identifier)
+            ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def get_many(self, data_type: str, identifiers: Iterable[str]) -> List[Dict[str, Any]]:
+        """Items with any of the given identifiers (in any store scope), in snapshot order"""
+        identifiers = list(dict.fromkeys(identifiers))
+        rows = []
+        with self._connect() as connection:
+            for start in range(0, len(identifiers), LOOKUP_BATCH_SIZE):
+                batch = identifiers[start:start + LOOKUP_BATCH_SIZE]
+                rows.extend(connection.execute(
+                    f"""SELECT position, body FROM items WHERE data_type = ?
+                    AND identifier IN ({', '.join('?' * len(batch))})""",
+                    (data_type, *batch)
+                ))
+        return [_decode(body) for _, body in sorted(rows)]
+
+    def get_by_keys(self, data_type: str, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Items by index key (identifier@stores), in the order requested; None for unknown keys"""
+        bodies = {}
+        with self._connect() as connection:
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                bodies.update(connection.execute(
+                    f"SELECT key, body FROM items WHERE data_type = ? AND key IN ({', '.join('?' * len(batch))})",
+                    (data_type, *batch)
+                ))
+        return [_decode(bodies[key]) if key in bodies else None for key in keys]
+
+    def updated_between(
+        self,
+        data_type: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Items with since <= update_time < until (either bound optional), oldest first"""
+        query = "SELECT body FROM items WHERE data_type = ? AND update_time IS NOT NULL"
+        params: List[Any] = [data_type]
+        if since is not None:
+            query += " AND update_time >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND update_time < ?"
+            params.append(until)
+        with self._connect() as connection:
+            rows = connection.execute(query + " ORDER BY update_time", params).fetchall()
+        return [_decode(body) for (body,) in rows]
+
+    def latest_update_time(self, data_type: str) -> Optional[str]:
+        """Newest update_time of a data type (read from the update_time index)"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT MAX(update_time) FROM items WHERE data_type = ?", (data_type,)
+            ).fetchone()
+        return row[0]
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Dict, Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into one in-flight execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and share its result (or exception).
+    The task is shielded, so a caller going away does not cancel the work
+    for the others. Per-key counters are kept for observability.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._stats: Dict[Hashable, Dict[str, Any]] = {}
+
+    def _key_stats(self, key: Hashable) -> Dict[str, Any]:
+        return self._stats.setdefault(key, {
+            "executions": 0,
+            "coalesced": 0,
+            "failures": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "last_duration_seconds": None
+        })
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        stats = self._key_stats(key)
+        started = time.monotonic()
+        try:
+            return await fn()
+        except BaseException:
+            stats["failures"] += 1
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+            stats["last_duration_seconds"] = round(time.monotonic() - started, 3)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn for key, or join the execution already in flight for it"""
+        stats = self._key_stats(key)
+        started = time.monotonic()
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn))
+            self._in_flight[key] = task
+            stats["executions"] += 1
+        else:
+            stats["coalesced"] += 1
+
+        try:
+            return await asyncio.shield(task)
+        finally:
+            waited = time.monotonic() - started
+            stats["total_wait_seconds"] = round(stats["total_wait_seconds"] + waited, 3)
+            stats["max_wait_seconds"] = round(max(stats["max_wait_seconds"], waited), 3)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether an execution for key is running"""
+        return key in self._in_flight
+
+    def stats(self) -> Dict[Hashable, Dict[str, Any]]:
+        return {
+            key: {**stats, "in_flight": key in self._in_flight}
+            for key, stats in self._stats.items()
+        }
@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Hashable, Sequence, Mapping
+
+from services.compact_snapshot import CompactSnapshot
+from config import settings
+
+
+class SnapshotCache:
+    """In-memory LRU cache of loaded snapshots.
+
+    Entries are keyed by (instance_id, data_type) and remember the
+    version they were loaded from, the (mtime, size) of a snapshot file or
+    the version counter of an item store, so a snapshot that changed on
+    disk is never served stale. The total estimated size of
+    cached snapshots is kept under `max_bytes`. Cached data is shared
+    between callers and must be treated as read-only. Safe to use from
+    the snapshot I/O threads.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_version(stat: os.stat_result) -> Tuple[int, int]:
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _estimate_size(data: Sequence[Mapping[str, Any]]) -> int:
+        """Rough memory footprint of a snapshot: string/list payloads plus per-field overhead"""
+        if isinstance(data, CompactSnapshot):
+            return data.memory_size()
+
+        size = 0
+        for item in data:
+            size += 232  # dict object
+            for value in item.values():
+                if isinstance(value, str):
+                    size += 49 + len(value)
+                elif isinstance(value, list):
+                    size += 56 + 36 * len(value)
+                else:
+                    size += 32
+                size += 16  # key reference in the dict table
+        return size
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Dict[str, Any]]:
+        """Get the cache entry for key if it matches the version, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["version"] != version:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, version: Hashable, data: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+        """Cache a loaded snapshot, evicting least recently used snapshots if over budget"""
+        entry = {
+            "version": version,
+            "data": data,
+            "size": self._estimate_size(data),
+            "index": None,
+            "fingerprints": None
+        }
+
+        with self._lock:
+            self._remove(key)
+            if entry["size"] > self.max_bytes:
+                return entry
+
+            self._entries[key] = entry
+            self._size += entry["size"]
+
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted["size"]
+                self.evictions += 1
+
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry["size"]
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes
+        }
+
+
+snapshot_cache = SnapshotCache(settings.snapshot_cache_max_bytes)
@@ -0,0 +1,202 @@
+import gzip
+import json
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, BinaryIO
+
+from config import settings
+from utils.snapshot_io import temporary_path, commit_file
+
+try:
+    import msgpack
+except ImportError:  # optional, falls back to JSON
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional, falls back to gzip
+    zstandard = None
+
+
+FORMAT_SUFFIXES = {"json": ".json", "msgpack": ".msgpack"}
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class SnapshotWriter:
+    """Writes snapshot items one at a time (see SnapshotCodec.writer).
+
+    Items go to a temporary file that replaces the target (after fsync)
+    only on commit, so readers never see a partially written snapshot.
+    """
+
+    def __init__(self, codec: "SnapshotCodec", path: Path):
+        self.codec = codec
+        self.path = path
+        self.count = 0
+        self.position = 0  # bytes written to the uncompressed stream
+        self._tmp_path = temporary_path(path)
+        self._raw = open(self._tmp_path, "wb")
+        self._stream = codec._open_write(self._raw)
+        self._packer = msgpack.Packer(use_bin_type=True) if codec.format == "msgpack" else None
+        if self._packer is None:
+            self._write(b"[")
+
+    def _write(self, data: bytes) -> None:
+        self._stream.write(data)
+        self.position += len(data)
+
+    def write(self, item: Dict[str, Any]) -> Tuple[int, int]:
+        """Write an item, returns its (offset, size) in the uncompressed stream"""
+        if self._packer is not None:
+            # msgpack snapshots are a plain sequence of items, no array header,
+            # so they can be written without knowing the count upfront
+            encoded = self._packer.pack(item)
+            offset = self.position
+        else:
+            indent = settings.json_indent
+            text = json.dumps(item, ensure_ascii=settings.json_ensure_ascii, indent=indent)
+            if indent:
+                text = "\n".join(" " * indent + line for line in text.split("\n"))
+                prefix = ",\n" if self.count else "\n"
+            else:
+                prefix = ", " if self.count else ""
+            self._write(prefix.encode("utf-8"))
+            encoded = text.encode("utf-8")
+            offset = self.position
+        self._write(encoded)
+        self.count += 1
+        return offset, len(encoded)
+
+    def commit(self) -> None:
+        """Finish the file and atomically move it into place"""
+        if self._packer is None:
+            closing = "\n]" if self.count and settings.json_indent else "]"
+            self._write(closing.encode("utf-8"))
+        if self._stream is not self._raw:
+            self._stream.close()  # flushes compression, leaves the raw file open
+        commit_file(self._raw, self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        """Discard the partially written file"""
+        self._raw.close()
+        if self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class SnapshotCodec:
+    """Encoding (json / msgpack) plus compression (none / gzip / zstd) of a snapshot file.
+
+    The codec of an existing file is recognised from its suffix, e.g.
+    blocks.json, blocks.msgpack.zst or blocks.json.gz.
+    """
+
+    def __init__(self, format: str = "json", compression: str = "none"):
+        if format not in FORMAT_SUFFIXES:
+            raise ValueError(f"Unknown snapshot format: {format}")
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown snapshot compression: {compression}")
+        self.format = format
+        self.compression = compression
+
+    @property
+    def suffix(self) -> str:
+        return FORMAT_SUFFIXES[self.format] + COMPRESSION_SUFFIXES[self.compression]
+
+    @property
+    def available(self) -> bool:
+        """Whether the optional libraries this codec needs are installed"""
+        if self.format == "msgpack" and msgpack is None:
+            return False
+        if self.compression == "zstd" and zstandard is None:
+            return False
+        return True
+
+    @classmethod
+    def configured(cls) -> "SnapshotCodec":
+        """Codec from settings, degraded to what the installed libraries support"""
+        format = settings.snapshot_format
+        compression = settings.snapshot_compression
+        if format == "msgpack" and msgpack is None:
+            format = "json"
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        return cls(format, compression)
+
+    @classmethod
+    def from_path(cls, path: Path) -> Optional["SnapshotCodec"]:
+        """Recognise the codec of a snapshot file from its name"""
+        name = path.name
+        for compression, compression_suffix in COMPRESSION_SUFFIXES.items():
+            for format, format_suffix in FORMAT_SUFFIXES.items():
+                if compression_suffix and name.endswith(format_suffix + compression_suffix):
+                    return cls(format, compression)
+        for format, format_suffix in FORMAT_SUFFIXES.items():
+            if name.endswith(format_suffix):
+                return cls(format, "none")
+        return None
+
+    def _open_read(self, path: Path) -> BinaryIO:
+        if self.compression == "gzip":
+            return gzip.open(path, "rb")
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return open(path, "rb")
+
+    def _open_write(self, raw: BinaryIO) -> BinaryIO:
+        if self.compression == "gzip":
+            return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=settings.snapshot_compression_level)
+        if self.compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=settings.snapshot_compression_level)
+            return compressor.stream_writer(raw, closefd=False)
+        return raw
+
+    def writer(self, path: Path) -> SnapshotWriter:
+        """Open path for writing items incrementally (committed atomically when used as a context manager)"""
+        return SnapshotWriter(self, path)
+
+    def write(self, path: Path, items: Iterable[Dict[str, Any]]) -> int:
+        """Write all items to path, returns the item count"""
+        with self.writer(path) as writer:
+            for item in items:
+                writer.write(item)
+        return writer.count
+
+    def read(self, path: Path) -> List[Dict[str, Any]]:
+        """Load all items of a snapshot file"""
+        with self._open_read(path) as f:
+            if self.format == "msgpack":
+                return list(msgpack.Unpacker(f, raw=False))
+            return json.loads(f.read())
+
+    def iter_read(self, path: Path) -> Iterator[Dict[str, Any]]:
+        """Items of a snapshot file one at a time (msgpack is decoded incrementally)"""
+        with self._open_read(path) as f:
+            if self.format == "msgpack":
+                yield from msgpack.Unpacker(f, raw=False)
+            else:
+                yield from json.loads(f.read())
+
+    def read_at(self, path: Path, positions: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """Load single items by their (offset, size) as returned by SnapshotWriter.write.
+
+        Positions are visited in ascending order so compressed streams only
+        ever seek forward; items are returned in the order requested.
+        """
+        items = {}
+        with self._open_read(path) as f:
+            for offset, size in sorted(set(positions)):
+                f.seek(offset)
+                encoded = f.read(size)
+                if self.format == "msgpack":
+                    items[(offset, size)] = msgpack.unpackb(encoded, raw=False)
+                else:
+                    items[(offset, size)] = json.loads(encoded)
+        return [items[position] for position in positions]
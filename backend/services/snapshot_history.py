@@ -0,0 +1,328 @@
+import gzip
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from models.models import SnapshotVersion
+from models.schemas import DataType
+from utils.snapshot_io import snapshot_io, atomic_open
+from config import settings
+
+
+class HistoryWriter:
+    """Stores the item bodies of a new snapshot version (see SnapshotHistoryService.writer).
+
+    Each body is stored once under the hash of its canonical JSON; bodies
+    already referenced by the previous version are not even looked up on
+    disk, so a refresh only writes what actually changed.
+    """
+
+    def __init__(self, history_dir: Path, previous: Optional[Dict[str, str]]):
+        self.history_dir = history_dir
+        self.previous = previous
+        self.manifest: Dict[str, str] = {}
+        self.new_objects = 0
+        self._known = set(previous.values()) if previous else set()
+
+    def write(self, key: str, item: Dict[str, Any]) -> str:
+        """Store an item body under its content hash and add it to the manifest, returns the hash"""
+        encoded = json.dumps(
+            item, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+        content_hash = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+        if content_hash not in self._known:
+            path = SnapshotHistoryService._object_path(self.history_dir, content_hash)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with atomic_open(path) as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    f.write(encoded)
+                self.new_objects += 1
+            self._known.add(content_hash)
+
+        self.manifest[key] = content_hash
+        return content_hash
+
+
+class SnapshotHistoryService:
+    @staticmethod
+    def _get_history_dir(instance_id: int, data_type: DataType) -> Path:
+        """Get the history directory of an instance and data type"""
+        return settings.instances_data_dir / str(instance_id) / "history" / data_type.value
+
+    @staticmethod
+    def _object_path(history_dir: Path, content_hash: str) -> Path:
+        return history_dir / "objects" / content_hash[:2] / f"{content_hash}.json.gz"
+
+    @staticmethod
+    def _manifest_path(history_dir: Path, version: int) -> Path:
+        return history_dir / "manifests" / f"{version}.json.gz"
+
+    @staticmethod
+    def load_manifest(snapshot_version: SnapshotVersion) -> Dict[str, str]:
+        """Manifest of a version: index key (identifier@stores) -> content hash, in snapshot order"""
+        return SnapshotHistoryService._read_manifest(Path(snapshot_version.manifest_path))
+
+    @staticmethod
+    def read_object(instance_id: int, data_type: DataType, content_hash: str) -> Dict[str, Any]:
+        """Load an item body by its content hash"""
+        history_dir = SnapshotHistoryService._get_history_dir(instance_id, data_type)
+        with gzip.open(SnapshotHistoryService._object_path(history_dir, content_hash), "rb") as f:
+            return json.loads(f.read())
+
+    @staticmethod
+    async def list_versions(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType
+    ) -> List[SnapshotVersion]:
+        """Retained versions of an instance and data type, newest first"""
+        result = await db.execute(
+            select(SnapshotVersion)
+            .where(
+                SnapshotVersion.instance_id == instance_id,
+                SnapshotVersion.data_type == data_type.value
+            )
+            .order_by(SnapshotVersion.version.desc())
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_version(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType,
+        version: int
+    ) -> Optional[SnapshotVersion]:
+        """Get a retained version by number"""
+        result = await db.execute(
+            select(SnapshotVersion).where(
+                SnapshotVersion.instance_id == instance_id,
+                SnapshotVersion.data_type == data_type.value,
+                SnapshotVersion.version == version
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def writer(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType
+    ) -> Optional[HistoryWriter]:
+        """Start recording a new version, None if history is disabled"""
+        if not settings.snapshot_history_enabled:
+            return None
+
+        versions = await SnapshotHistoryService.list_versions(db, instance_id, data_type)
+        previous = await snapshot_io.run(SnapshotHistoryService.load_manifest, versions[0]) if versions else None
+        return HistoryWriter(SnapshotHistoryService._get_history_dir(instance_id, data_type), previous)
+
+    @staticmethod
+    def diff_manifests(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+        """Index keys added, removed and modified between two manifests"""
+        return {
+            "added": [key for key in new if key not in old],
+            "removed": [key for key in old if key not in new],
+            "modified": [key for key, content_hash in new.items() if key in old and old[key] != content_hash]
+        }
+
+    @staticmethod
+    async def record_version(
+        db: AsyncSession,
+        instance_id: int,
+        data_type: DataType,
+        writer: HistoryWriter,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> SnapshotVersion:
+        """Write the manifest of a recorded version and add its record, expiring versions past the retention.
+        
+        Nothing is committed: the caller commits the version together with
+        the snapshot record, then calls collect_garbage.
+        """
+        versions = await SnapshotHistoryService.list_versions(db, instance_id, data_type)
+        version = versions[0].version + 1 if versions else 1
+
+        manifest_path = SnapshotHistoryService._manifest_path(writer.history_dir, version)
+        await snapshot_io.run(SnapshotHistoryService._write_manifest, manifest_path, writer.manifest)
+
+        changes = None
+        if writer.previous is not None:
+            changes = {
+                kind: len(keys)
+                for kind, keys in SnapshotHistoryService.diff_manifests(writer.previous, writer.manifest).items()
+            }
+
+        snapshot_version = SnapshotVersion(
+            instance_id=instance_id,
+            data_type=data_type.value,
+            version=version,
+            manifest_path=str(manifest_path),
+            item_count=len(writer.manifest),
+            new_objects=writer.new_objects,
+            changes=changes or {},
+            snapshot_metadata=metadata or {}
+        )
+        db.add(snapshot_version)
+
+        retention = max(settings.snapshot_history_retention, 1)
+        for old_version in versions[retention - 1:]:
+            await db.delete(old_version)
+
+        return snapshot_version
+
+    @staticmethod
+    def _write_manifest(manifest_path: Path, manifest: Dict[str, str]) -> None:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(manifest_path) as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            f.write(json.dumps(manifest, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+    @staticmethod
+    def _refs_path(history_dir: Path) -> Path:
+        return history_dir / "refs.json.gz"
+
+    @staticmethod
+    def _read_manifest(manifest_path: Path) -> Dict[str, str]:
+        with gzip.open(manifest_path, "rb") as f:
+            return json.loads(f.read())
+
+    @staticmethod
+    async def collect_garbage(db: AsyncSession, instance_id: int, data_type: DataType) -> None:
+        """Drop the manifests of expired versions and the bodies no retained version references (after commit)"""
+        versions = await SnapshotHistoryService.list_versions(db, instance_id, data_type)
+        await snapshot_io.run(
+            SnapshotHistoryService._update_references,
+            SnapshotHistoryService._get_history_dir(instance_id, data_type),
+            [(snapshot_version.version, Path(snapshot_version.manifest_path)) for snapshot_version in versions]
+        )
+
+    @staticmethod
+    def _update_references(history_dir: Path, retained: List[Tuple[int, Path]]) -> None:
+        """Bring the body reference counts in line with the retained versions.
+        
+        refs.json.gz holds, for every stored body, the number of counted
+        versions whose manifest references it, and which versions are
+        counted. Only the manifests of versions added or expired since the
+        last update are read, so the cost follows the change, not the
+        size of the history. Without a usable refs file the counts are
+        rebuilt from every retained manifest and the object store is swept.
+        """
+        refs_path = SnapshotHistoryService._refs_path(history_dir)
+        try:
+            with gzip.open(refs_path, "rb") as f:
+                refs = json.loads(f.read())
+            counted = set(refs["versions"])
+            counts = Counter(refs["counts"])
+            rebuild = False
+        except (OSError, ValueError, KeyError):
+            counted, counts, rebuild = set(), Counter(), True
+
+        retained_paths = dict(retained)
+        expired = counted - set(retained_paths)
+        for version in retained_paths.keys() - counted:
+            counts.update(set(SnapshotHistoryService._read_manifest(retained_paths[version]).values()))
+
+        unreferenced = set()
+        for version in expired:
+            manifest_path = SnapshotHistoryService._manifest_path(history_dir, version)
+            try:
+                manifest = SnapshotHistoryService._read_manifest(manifest_path)
+            except OSError:
+                # Counts can no longer be corrected for it
+                rebuild = True
+                continue
+            for content_hash in set(manifest.values()):
+                counts[content_hash] -= 1
+                if counts[content_hash] <= 0:
+                    del counts[content_hash]
+                    unreferenced.add(content_hash)
+
+        if rebuild:
+            counts = Counter()
+            for manifest_path in retained_paths.values():
+                counts.update(set(SnapshotHistoryService._read_manifest(manifest_path).values()))
+
+        history_dir.mkdir(parents=True, exist_ok=True)
+        with atomic_open(refs_path) as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            f.write(json.dumps(
+                {"versions": sorted(retained_paths), "counts": counts}, separators=(",", ":")
+            ).encode("utf-8"))
+
+        # Deleted only once the counts no longer include them
+        for content_hash in unreferenced:
+            SnapshotHistoryService._object_path(history_dir, content_hash).unlink(missing_ok=True)
+        for version in expired:
+            SnapshotHistoryService._manifest_path(history_dir, version).unlink(missing_ok=True)
+
+        if rebuild:
+            SnapshotHistoryService._sweep(history_dir, set(counts), {path.name for path in retained_paths.values()})
+
+    @staticmethod
+    def _sweep(history_dir: Path, referenced: Set[str], manifests: Set[str]) -> None:
+        """Delete every body and manifest not referenced, e.g. left behind by interrupted refreshes"""
+        objects_dir = history_dir / "objects"
+        for shard in objects_dir.iterdir() if objects_dir.exists() else []:
+            for path in shard.iterdir():
+                if path.name.split(".", 1)[0] not in referenced:
+                    path.unlink(missing_ok=True)
+
+        manifests_dir = history_dir / "manifests"
+        for path in manifests_dir.iterdir() if manifests_dir.exists() else []:
+            if path.name not in manifests:
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def changes_between(
+        instance_id: int,
+        data_type: DataType,
+        from_version: SnapshotVersion,
+        to_version: SnapshotVersion,
+        include_fields: bool = False
+    ) -> Dict[str, Any]:
+        """What changed between two versions, from their manifests.
+
+        With include_fields the bodies of modified items are loaded to
+        list the fields that changed.
+        """
+        old = SnapshotHistoryService.load_manifest(from_version)
+        new = SnapshotHistoryService.load_manifest(to_version)
+        changes = SnapshotHistoryService.diff_manifests(old, new)
+
+        modified = []
+        for key in changes["modified"]:
+            change = {"key": key, "old_hash": old[key], "new_hash": new[key]}
+            if include_fields:
+                old_item = SnapshotHistoryService.read_object(instance_id, data_type, old[key])
+                new_item = SnapshotHistoryService.read_object(instance_id, data_type, new[key])
+                change["fields"] = sorted(
+                    field for field in set(old_item) | set(new_item)
+                    if old_item.get(field) != new_item.get(field)
+                )
+            modified.append(change)
+
+        return {
+            "from_version": from_version.version,
+            "to_version": to_version.version,
+            "added": changes["added"],
+            "removed": changes["removed"],
+            "modified": modified
+        }
+
+    @staticmethod
+    def items_at(
+        instance_id: int,
+        data_type: DataType,
+        snapshot_version: SnapshotVersion,
+        identifier: str
+    ) -> List[Dict[str, Any]]:
+        """Bodies of the items with an identifier (in any store scope) as of a version"""
+        manifest = SnapshotHistoryService.load_manifest(snapshot_version)
+        return [
+            SnapshotHistoryService.read_object(instance_id, data_type, content_hash)
+            for key, content_hash in manifest.items()
+            if key.rsplit("@", 1)[0] == identifier
+        ]
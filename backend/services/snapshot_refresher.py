@@ -0,0 +1,97 @@
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select
+
+from models.database import AsyncSessionLocal
+from models.models import Instance
+from models.schemas import DataType
+from services.data_storage import DataStorageService
+from services.fleet_refresh import FleetRefreshService
+from config import settings
+
+
+class SnapshotRefresher:
+    """Keeps the snapshots of active instances fresh in the background.
+
+    Every interval seconds, snapshots of active instances that are missing
+    or would turn stale before the next pass are refreshed in parallel
+    (see FleetRefreshService), so interactive compares find a fresh
+    snapshot and rarely wait on Magento. Refreshes go through refresh_flights, so a pass joins
+    refreshes already started by requests instead of repeating them.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Any] = {
+            "passes": 0,
+            "refreshed": 0,
+            "failures": 0,
+            "last_pass_at": None,
+            "last_pass_seconds": None,
+            "last_errors": {}
+        }
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._stats["failures"] += 1
+                self._stats["last_errors"]["pass"] = str(e)
+            await asyncio.sleep(self.interval)
+
+    async def _due(self) -> List[Tuple[Instance, DataType]]:
+        """(instance, data type) pairs whose snapshot is missing or turns stale before the next pass"""
+        due = []
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Instance).where(Instance.is_active.is_(True)))
+            for instance in result.scalars().all():
+                for data_type in DataType:
+                    freshness = await DataStorageService.get_freshness(db, instance.id, data_type)
+                    if freshness is None:
+                        due.append((instance, data_type))
+                    elif freshness["max_age"] > 0 and (
+                        freshness["age_seconds"] + self.interval >= freshness["max_age"]
+                    ):
+                        due.append((instance, data_type))
+        return due
+
+    async def run_once(self) -> None:
+        """Refresh every snapshot that is due, in parallel within the fleet refresh caps"""
+        async for event in FleetRefreshService.refresh(await self._due()):
+            key = f"{event.get('instance_id')}:{event.get('data_type')}"
+            if event["event"] == "refreshed":
+                self._stats["refreshed"] += 1
+                self._stats["last_errors"].pop(key, None)
+            elif event["event"] == "failed":
+                # One failing instance does not stop the others from being refreshed
+                self._stats["failures"] += 1
+                self._stats["last_errors"][key] = event["error"]
+            elif event["event"] == "summary":
+                self._stats["passes"] += 1
+                self._stats["last_pass_at"] = event["started_at"]
+                self._stats["last_pass_seconds"] = event["duration_seconds"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "interval": self.interval,
+            "running": self._task is not None and not self._task.done()
+        }
+
+
+snapshot_refresher = SnapshotRefresher(settings.snapshot_warm_interval)
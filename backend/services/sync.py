@@ -1,6 +1,8 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Mapping, Sequence
 from models.schemas import DataType, SyncItem, SyncPreview
-from integrations.magento_client import MagentoClient
+from integrations.magento_client import MagentoClient, BULK_STATUS_COMPLETE, BULK_STATUS_OPEN
+from services.compact_snapshot import to_dict
+from config import settings
 
 
 class SyncService:
@@ -15,21 +17,24 @@ class SyncService:
             return item.get("identifier") or item.get("url_key", "")
     
     @staticmethod
-    def _find_item_in_data(
-        data: List[Dict[str, Any]], 
-        identifier: str, 
+    def _index_by_identifier(
+        data: Sequence[Mapping[str, Any]],
         data_type: DataType
-    ) -> Optional[Dict[str, Any]]:
-        """Find an item in data by identifier"""
+    ) -> Dict[str, Mapping[str, Any]]:
+        """Items of data by identifier (the first item wins for duplicate identifiers).
+        
+        Items may be read-only snapshot views; only the items actually
+        synced are copied into dicts (see _prepare_item_for_sync).
+        """
+        index = {}
         for item in data:
-            if SyncService._get_identifier(item, data_type) == identifier:
-                return item
-        return None
+            index.setdefault(SyncService._get_identifier(item, data_type), item)
+        return index
     
     @staticmethod
     def _prepare_item_for_sync(
-        source_item: Dict[str, Any],
-        dest_item: Optional[Dict[str, Any]],
+        source_item: Mapping[str, Any],
+        dest_item: Optional[Mapping[str, Any]],
         fields_to_sync: Optional[List[str]],
         store_view_mapping: Optional[Dict[str, str]],
         data_type: DataType
@@ -75,8 +80,8 @@ class SyncService:
     
     def create_sync_preview(
         self,
-        source_data: List[Dict[str, Any]],
-        dest_data: List[Dict[str, Any]],
+        source_data: Sequence[Mapping[str, Any]],
+        dest_data: Sequence[Mapping[str, Any]],
         data_type: DataType,
         sync_items: List[SyncItem],
         store_view_mapping: Optional[Dict[str, str]] = None
@@ -86,17 +91,16 @@ class SyncService:
         creates = 0
         updates = 0
         
+        source_lookup = self._index_by_identifier(source_data, data_type)
+        dest_lookup = self._index_by_identifier(dest_data, data_type)
+        
         for sync_item in sync_items:
-            source_item = self._find_item_in_data(
-                source_data, sync_item.identifier, data_type
-            )
+            source_item = source_lookup.get(sync_item.identifier)
             
             if not source_item:
                 continue
             
-            dest_item = self._find_item_in_data(
-                dest_data, sync_item.identifier, data_type
-            )
+            dest_item = dest_lookup.get(sync_item.identifier)
             
             # Prepare the synced version
             synced_item = self._prepare_item_for_sync(
@@ -110,8 +114,8 @@ class SyncService:
             preview_item = {
                 "identifier": sync_item.identifier,
                 "action": sync_item.action,
-                "source": source_item,
-                "destination": dest_item,
+                "source": to_dict(source_item),
+                "destination": to_dict(dest_item) if dest_item else None,
                 "result": synced_item
             }
             
@@ -131,14 +135,21 @@ class SyncService:
     
     async def execute_sync(
         self,
-        source_data: List[Dict[str, Any]],
+        source_data: Sequence[Mapping[str, Any]],
         dest_client: MagentoClient,
         data_type: DataType,
         sync_items: List[SyncItem],
-        store_view_mapping: Optional[Dict[str, str]] = None
+        store_view_mapping: Optional[Dict[str, str]] = None,
+        use_bulk: bool = False
     ) -> List[Dict[str, Any]]:
-        """Execute the sync operation"""
+        """Execute the sync operation.
+        
+        With use_bulk creates and updates are queued through Magento's
+        asynchronous bulk API instead of one request per item.
+        """
         results = []
+        # Creates/updates waiting for bulk submission
+        bulk_operations = []
         
         # First, get existing destination data to find IDs
         if data_type == DataType.BLOCKS:
@@ -146,6 +157,9 @@ class SyncService:
         else:
             dest_data = await dest_client.get_cms_pages()
         
+        source_lookup = self._index_by_identifier(source_data, data_type)
+        dest_lookup = self._index_by_identifier(dest_data, data_type)
+        
         for sync_item in sync_items:
             result = {
                 "identifier": sync_item.identifier,
@@ -157,9 +171,7 @@ class SyncService:
             
             try:
                 # Find source item
-                source_item = self._find_item_in_data(
-                    source_data, sync_item.identifier, data_type
-                )
+                source_item = source_lookup.get(sync_item.identifier)
                 
                 if not source_item:
                     result["error"] = f"Source item not found: {sync_item.identifier}"
@@ -167,9 +179,7 @@ class SyncService:
                     continue
                 
                 # Find destination item (if updating)
-                dest_item = self._find_item_in_data(
-                    dest_data, sync_item.identifier, data_type
-                )
+                dest_item = dest_lookup.get(sync_item.identifier)
                 
                 # Prepare item for sync
                 sync_data = self._prepare_item_for_sync(
@@ -181,7 +191,19 @@ class SyncService:
                 )
                 
                 # Perform sync
-                if sync_item.action == "create" and not dest_item:
+                if use_bulk and (
+                    (sync_item.action == "create" and not dest_item)
+                    or (sync_item.action == "update" and dest_item)
+                ):
+                    item_id = dest_item["id"] if dest_item else None
+                    bulk_operations.append({
+                        "result": result,
+                        "action": sync_item.action,
+                        "item_id": item_id,
+                        "data": sync_data
+                    })
+                    
+                elif sync_item.action == "create" and not dest_item:
                     # Create new item
                     if data_type == DataType.BLOCKS:
                         await dest_client.create_cms_block(sync_data)
@@ -211,4 +233,80 @@ class SyncService:
             
             results.append(result)
         
-        return results
\ No newline at end of file
+        if bulk_operations:
+            await self._execute_bulk(dest_client, data_type, bulk_operations)
+        
+        return results
+    
+    async def _execute_bulk(
+        self,
+        dest_client: MagentoClient,
+        data_type: DataType,
+        operations: List[Dict[str, Any]]
+    ) -> None:
+        """Submit queued creates/updates in bulk chunks and map operation statuses back to results"""
+        item_label = data_type.value[:-1]
+        chunk_size = settings.magento_bulk_chunk_size
+        
+        for action in ("create", "update"):
+            queued = [op for op in operations if op["action"] == action]
+            
+            for start in range(0, len(queued), chunk_size):
+                chunk = queued[start:start + chunk_size]
+                chunk_results = [op["result"] for op in chunk]
+                
+                try:
+                    if action == "create":
+                        payloads = [op["data"] for op in chunk]
+                        if data_type == DataType.BLOCKS:
+                            response = await dest_client.bulk_create_cms_blocks(payloads)
+                        else:
+                            response = await dest_client.bulk_create_cms_pages(payloads)
+                    else:
+                        payloads = [(op["item_id"], op["data"]) for op in chunk]
+                        if data_type == DataType.BLOCKS:
+                            response = await dest_client.bulk_update_cms_blocks(payloads)
+                        else:
+                            response = await dest_client.bulk_update_cms_pages(payloads)
+                    
+                    bulk_uuid = response["bulk_uuid"]
+                    
+                    # Request items are identified by their position in the
+                    # submitted chunk, which is also the id of their operation.
+                    # Operations rejected at submission never reach the queue.
+                    accepted = set()
+                    for request_item in response.get("request_items") or []:
+                        index = request_item.get("id")
+                        if not isinstance(index, int) or not 0 <= index < len(chunk_results):
+                            continue
+                        if request_item.get("status") == "rejected":
+                            chunk_results[index]["error"] = request_item.get("error_message") or "Rejected by bulk API"
+                        else:
+                            accepted.add(index)
+                    
+                    statuses = await dest_client.wait_for_bulk(bulk_uuid)
+                    
+                except Exception as e:
+                    for result in chunk_results:
+                        result["error"] = str(e)
+                    continue
+                
+                statuses_by_id = {op.get("id"): op for op in statuses}
+                for index, result in enumerate(chunk_results):
+                    result["bulk_uuid"] = bulk_uuid
+                    if result["error"]:
+                        continue
+                    if index not in accepted:
+                        result["error"] = "Bulk API returned no operation for this item"
+                        continue
+                    
+                    status = statuses_by_id.get(index)
+                    if status is None:
+                        result["error"] = f"Bulk status has no operation {index}"
+                    elif status.get("status") == BULK_STATUS_OPEN:
+                        result["error"] = "Bulk operation did not complete in time"
+                    elif status.get("status") == BULK_STATUS_COMPLETE:
+                        result["success"] = True
+                        result["message"] = f"{action.capitalize()}d {item_label} successfully (bulk)"
+                    else:
+                        result["error"] = status.get("result_message") or f"Bulk operation failed with status {status.get('status')}"
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from models.database import Base
+from models.models import Instance, SnapshotChange
+from models.schemas import DataType
+from services.change_feed import ChangeFeedService
+
+
+def make_entries(*identifiers):
+    return [
+        {
+            "change_type": "added",
+            "key": f"{identifier}@0",
+            "identifier": identifier,
+            "fields": [],
+            "old_hash": None,
+            "new_hash": "0" * 32
+        }
+        for identifier in identifiers
+    ]
+
+
+def test_cursor_survives_pruning_every_row():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async with sessions() as db:
+            db.add(Instance(id=1, name="m", url="http://magento.test", api_token="t"))
+            await ChangeFeedService.record(db, 1, DataType.BLOCKS, make_entries("a", "b", "c"))
+            await db.commit()
+
+            changes, _ = await ChangeFeedService.list_changes(db, 1)
+            cursor = changes[-1].id
+
+            # Everything falls out of the retention window on the next refresh
+            await db.execute(
+                update(SnapshotChange).values(created_at=datetime.utcnow() - timedelta(days=365))
+            )
+            await ChangeFeedService.record(db, 1, DataType.BLOCKS, [])
+            await db.commit()
+            assert (await ChangeFeedService.list_changes(db, 1))[0] == []
+
+            await ChangeFeedService.record(db, 1, DataType.BLOCKS, make_entries("d"))
+            await db.commit()
+            changes, has_more = await ChangeFeedService.list_changes(db, 1, since=cursor)
+
+        await engine.dispose()
+        assert [change.identifier for change in changes] == ["d"]
+        assert not has_more
+
+    asyncio.run(run())
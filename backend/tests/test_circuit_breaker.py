@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+
+from integrations.circuit_breaker import CircuitBreaker, CircuitOpenError
+from integrations.magento_client import MagentoClient
+from integrations.rate_limiter import RateLimiter
+
+
+def make_client(breaker: CircuitBreaker, handler) -> MagentoClient:
+    return MagentoClient(
+        "http://magento.test",
+        "token",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        rate_limiter=RateLimiter(0, 1),
+        circuit_breaker=breaker
+    )
+
+
+def test_cancelled_trial_releases_half_open_slot():
+    breaker = CircuitBreaker("http://magento.test", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            # The trial hangs until the caller gives up
+            await asyncio.sleep(10)
+        return httpx.Response(200, json=[{"id": 1}])
+
+    async def run():
+        client = make_client(breaker, handler)
+        try:
+            await asyncio.wait_for(client.get_store_views(), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert await client.get_store_views() == [{"id": 1}]
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_trial_cancelled_while_rate_limited_releases_slot():
+    breaker = CircuitBreaker("http://magento.test", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+
+    async def handler(request):
+        return httpx.Response(200, json=[])
+
+    async def run():
+        client = make_client(breaker, handler)
+        client.rate_limiter = RateLimiter(0.1, 1)
+        await client.rate_limiter.acquire()
+        try:
+            await asyncio.wait_for(client.get_store_views(), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        client.rate_limiter = RateLimiter(0, 1)
+        assert await client.get_store_views() == []
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stale_release_keeps_newer_trial():
+    breaker = CircuitBreaker("http://magento.test", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    first = breaker.before_request()
+    breaker.record_failure()
+    second = breaker.before_request()
+
+    breaker.release_trial(first)
+
+    assert second is not None
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
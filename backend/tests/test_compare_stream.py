@@ -0,0 +1,126 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import compare
+from models.database import get_db
+from models.schemas import DataType
+from services.comparison import ComparisonService
+from services.data_storage import DataStorageService
+
+
+def make_block(identifier, content="x"):
+    return {"identifier": identifier, "title": identifier.title(), "content": content, "store_id": [0]}
+
+
+def make_entry(item):
+    item_hash, fields = ComparisonService.fingerprint(item, DataType.BLOCKS)
+    return {
+        "identifier": item["identifier"],
+        "title": item["title"],
+        "store_id": ComparisonService.store_scope(item),
+        "hash": item_hash,
+        "fields": fields
+    }
+
+
+SNAPSHOTS = {
+    1: [make_block("footer"), make_block("header"), make_block("promo", content="new")],
+    2: [make_block("header"), make_block("promo"), make_block("sidebar")]
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    instances = {
+        instance_id: SimpleNamespace(
+            id=instance_id, name=f"Instance {instance_id}", url=f"http://magento-{instance_id}.test",
+            api_token="token", is_active=True, created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1)
+        )
+        for instance_id in SNAPSHOTS
+    }
+
+    async def get_instance(db, instance_id):
+        return instances[instance_id]
+
+    async def get_item_index(db, instance, data_type, force_refresh=False):
+        return [make_entry(item) for item in SNAPSHOTS[instance.id]]
+
+    async def get_freshness(db, instance_id, data_type):
+        return None
+
+    async def load_entry_items(instance_id, data_type, entries):
+        items = {item["identifier"]: item for item in SNAPSHOTS[instance_id]}
+        return [items[entry["identifier"]] for entry in entries]
+
+    async def no_db():
+        yield None
+
+    monkeypatch.setattr(compare, "get_instance_or_404", get_instance)
+    monkeypatch.setattr(DataStorageService, "get_or_refresh_item_index", staticmethod(get_item_index))
+    monkeypatch.setattr(DataStorageService, "get_freshness", staticmethod(get_freshness))
+    monkeypatch.setattr(DataStorageService, "load_entry_items", staticmethod(load_entry_items))
+    monkeypatch.setattr(compare, "STREAM_BATCH_SIZE", 2)
+
+    app = FastAPI()
+    app.include_router(compare.router, prefix="/api/compare")
+    app.dependency_overrides[get_db] = no_db
+    return TestClient(app)
+
+
+def stream_lines(client, **request):
+    response = client.post(
+        "/api/compare/stream/blocks",
+        json={"source_instance_id": 1, "destination_instance_id": 2, **request}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream_sends_header_items_and_summary_lines(client):
+    lines = stream_lines(client)
+
+    assert [line["event"] for line in lines] == ["header", "item", "item", "item", "item", "summary"]
+    assert lines[0]["data_type"] == "blocks"
+    assert (lines[0]["total_source"], lines[0]["total_destination"]) == (3, 3)
+    assert lines[0]["source_instance"]["name"] == "Instance 1"
+
+    items = {line["identifier"]: line for line in lines[1:-1]}
+    assert list(items) == ["footer", "header", "promo", "sidebar"]
+    assert items["promo"]["differences"] == ["content"]
+    assert items["promo"]["source_data"]["content"] == "new"
+    assert items["promo"]["destination_data"]["content"] == "x"
+    # Identical items are sent without bodies
+    assert items["header"]["source_data"] is None and items["header"]["differences"] is None
+    assert items["footer"]["destination_status"] == "missing"
+    assert items["sidebar"]["source_status"] == "missing"
+
+    assert lines[-1] == {
+        "event": "summary",
+        "total_source": 3,
+        "total_destination": 3,
+        "exists_in_both": 2,
+        "missing_in_destination": 1,
+        "missing_in_source": 1,
+        "different": 1,
+        "total_items": 4
+    }
+
+
+def test_stream_filters_and_pages_items_but_counts_all(client):
+    lines = stream_lines(client, status="missing", summary_only=True)
+    assert [(line["event"], line.get("identifier")) for line in lines] == [
+        ("header", None), ("item", "footer"), ("summary", None)
+    ]
+    assert lines[1]["source_data"] is None
+    assert (lines[-1]["exists_in_both"], lines[-1]["total_items"]) == (2, 1)
+
+    lines = stream_lines(client, skip=1, limit=2)
+    assert [line.get("identifier") for line in lines[1:-1]] == ["header", "promo"]
+    assert lines[-1]["total_items"] == 4
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+from models.schemas import ComparisonFilter, ComparisonStatus, DataType
+from services.comparison import ComparisonService
+
+
+def make_instance(instance_id):
+    return {
+        "id": instance_id,
+        "name": f"Instance {instance_id}",
+        "url": f"http://magento-{instance_id}.test",
+        "api_token": "token",
+        "created_at": datetime(2024, 1, 1),
+        "updated_at": datetime(2024, 1, 1)
+    }
+
+
+def make_block(identifier, title=None, content="x"):
+    return {
+        "identifier": identifier,
+        "title": title or identifier,
+        "content": content,
+        "is_active": True,
+        "store_id": [0]
+    }
+
+
+def test_compare_data_filters_and_pages_before_building_items():
+    source = [make_block(f"block-{i}", content="changed" if i % 2 else "x") for i in range(10)]
+    source.append(make_block("only-source"))
+    dest = [make_block(f"block-{i}") for i in range(10)]
+    dest.append(make_block("only-dest"))
+
+    result = ComparisonService.compare_data(
+        source, dest, DataType.BLOCKS, make_instance(1), make_instance(2),
+        status=ComparisonFilter.DIFFERENT, skip=1, limit=2
+    )
+
+    assert [item.identifier for item in result.items] == ["block-3", "block-5"]
+    assert all(item.differences == ["content"] for item in result.items)
+    assert result.items[0].source_data["content"] == "changed"
+    assert result.items[0].destination_data["content"] == "x"
+    assert result.total_items == 5
+    assert (result.exists_in_both, result.different) == (10, 5)
+    assert (result.missing_in_destination, result.missing_in_source) == (1, 1)
+
+
+def test_compare_data_search_matches_identifier_or_title():
+    source = [make_block("footer", title="Site Footer"), make_block("header")]
+    dest = [make_block("promo", title="Footer promo")]
+
+    result = ComparisonService.compare_data(source, dest, DataType.BLOCKS, make_instance(1), make_instance(2), search="FOOTER")
+
+    assert [(item.identifier, item.source_status, item.destination_status) for item in result.items] == [
+        ("footer", ComparisonStatus.EXISTS, ComparisonStatus.MISSING),
+        ("promo", ComparisonStatus.MISSING, ComparisonStatus.EXISTS)
+    ]
+    assert result.items[1].source_data is None
+    assert result.total_items == 2
+
+
+def make_entry(item):
+    item_hash, fields = ComparisonService.fingerprint(item, DataType.BLOCKS)
+    return {
+        "identifier": item["identifier"],
+        "title": item["title"],
+        "store_id": ComparisonService.store_scope(item),
+        "hash": item_hash,
+        "fields": fields
+    }
+
+
+def test_fingerprint_ignores_store_order_and_bool_int_spelling():
+    item = make_block("footer")
+    same = {**make_block("footer"), "is_active": 1, "store_id": [0, 0]}
+    changed = make_block("footer", content="changed")
+
+    assert ComparisonService.fingerprint(item, DataType.BLOCKS) == ComparisonService.fingerprint(same, DataType.BLOCKS)
+    assert ComparisonService.fingerprint(item, DataType.BLOCKS)[0] != ComparisonService.fingerprint(changed, DataType.BLOCKS)[0]
+
+
+def test_index_rows_find_the_same_differences_as_field_compare():
+    source = [
+        make_block("footer"),
+        {**make_block("header", title="New header"), "store_id": [1, 0]},
+        make_block("promo", content="new"),
+        make_block("only-source")
+    ]
+    dest = [make_block("footer"), {**make_block("header"), "store_id": [0]}, make_block("promo")]
+
+    rows = list(ComparisonService.iter_index_rows(
+        [make_entry(item) for item in source], [make_entry(item) for item in dest], DataType.BLOCKS
+    ))
+    data_rows = list(ComparisonService.iter_compare_data(source, dest, DataType.BLOCKS))
+
+    assert [(row[0], row[3], row[4], row[5]) for row in rows] == [
+        (row[0], row[3], row[4], row[5]) for row in data_rows
+    ]
+    assert {row[0]: row[5] for row in rows} == {
+        "footer": [], "header": ["title", "store_id"], "promo": ["content"], "only-source": []
+    }
+
+
+def test_equal_fingerprints_skip_the_field_compare(monkeypatch):
+    source = [make_block("footer"), make_block("promo", content="new")]
+    dest = [make_block("footer"), make_block("promo")]
+    compared = []
+    compare_items = ComparisonService._compare_items
+
+    def recording_compare(source_item, dest_item, data_type):
+        compared.append(source_item["identifier"])
+        return compare_items(source_item, dest_item, data_type)
+
+    monkeypatch.setattr(ComparisonService, "_compare_items", staticmethod(recording_compare))
+    source_hashes = [ComparisonService.fingerprint(item, DataType.BLOCKS)[0] for item in source]
+    dest_hashes = [ComparisonService.fingerprint(item, DataType.BLOCKS)[0] for item in dest]
+
+    result = ComparisonService.compare_data(
+        source, dest, DataType.BLOCKS, make_instance(1), make_instance(2), source_hashes, dest_hashes
+    )
+
+    assert compared == ["promo"]
+    assert (result.exists_in_both, result.different) == (2, 1)
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+from integrations.connection_pool import ConnectionPool
+
+
+def make_pool(monkeypatch):
+    pool = ConnectionPool()
+    monkeypatch.setattr(pool, "_create_http_client", lambda: httpx.AsyncClient())
+    return pool
+
+
+def test_replaced_client_is_closed_once_its_requests_are_done(monkeypatch):
+    pool = make_pool(monkeypatch)
+
+    async def run():
+        async with pool.lease(1, "http://old.test") as old_client:
+            # The instance URL changes while a request is using the old client
+            async with pool.lease(1, "http://new.test/") as new_client:
+                assert new_client is not old_client
+            await asyncio.sleep(0.01)
+            still_open = not old_client.is_closed
+        await asyncio.sleep(0.01)
+        closed_when_idle = old_client.is_closed
+
+        async with pool.lease(1, "http://new.test") as reused:
+            assert reused is new_client
+        await pool.close()
+        return still_open, closed_when_idle, new_client.is_closed
+
+    assert asyncio.run(run()) == (True, True, True)
+
+
+def test_invalidated_client_is_closed_once_idle(monkeypatch):
+    pool = make_pool(monkeypatch)
+
+    async def run():
+        lease = pool.lease(2, "http://magento.test")
+        client = await lease.__aenter__()
+        await pool.invalidate(2)
+        await asyncio.sleep(0.01)
+        in_use_closed = client.is_closed
+        await lease.__aexit__(None, None, None)
+        await asyncio.sleep(0.01)
+        idle_closed = client.is_closed
+
+        async with pool.lease(2, "http://magento.test") as fresh:
+            replaced = fresh is not client
+        await pool.close()
+        return in_use_closed, idle_closed, replaced
+
+    assert asyncio.run(run()) == (False, True, True)
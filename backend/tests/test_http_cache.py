@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import httpx
+
+from integrations.http_cache import ResponseCache
+from integrations.magento_client import MagentoClient
+
+STORE_VIEWS = [{"id": 1, "code": "default"}]
+
+
+def make_client(tmp_path, requests):
+    def handler(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=STORE_VIEWS, headers={"ETag": '"v1"'})
+
+    cache = ResponseCache(tmp_path / "http_cache", 1024 * 1024)
+    client = MagentoClient(
+        "http://magento.test", "token",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        response_cache=cache
+    )
+    return client, cache
+
+
+def test_not_modified_response_reuses_the_cached_body(tmp_path):
+    requests = []
+    client, cache = make_client(tmp_path, requests)
+
+    async def run():
+        return [await client.get_store_views() for _ in range(3)]
+
+    assert asyncio.run(run()) == [STORE_VIEWS] * 3
+    assert requests == [None, '"v1"', '"v1"']
+    assert (cache.misses, cache.hits) == (1, 2)
+
+    # A new cache over the same directory picks the entry up from disk
+    requests.clear()
+    client, cache = make_client(tmp_path, requests)
+    assert asyncio.run(client.get_store_views()) == STORE_VIEWS
+    assert requests == ['"v1"']
+
+
+def test_missing_cached_body_is_fetched_again_unconditionally(tmp_path):
+    requests = []
+    client, cache = make_client(tmp_path, requests)
+
+    async def run():
+        await client.get_store_views()
+        for path in (tmp_path / "http_cache").iterdir():
+            path.unlink()
+        return await client.get_store_views()
+
+    assert asyncio.run(run()) == STORE_VIEWS
+    assert requests == [None, '"v1"', None]
+    assert (cache.misses, cache.hits) == (2, 0)
+    # The refetched body is stored again
+    entries = list((tmp_path / "http_cache").iterdir())
+    assert len(entries) == 1
+    assert json.loads(entries[0].read_bytes().split(b"\n", 1)[1]) == STORE_VIEWS
@@ -0,0 +1,95 @@
+import sqlite3
+
+from services.item_store import ItemStore
+
+
+def make_item(item_id, content="x", update_time="2024-01-01 00:00:00"):
+    return {
+        "id": item_id,
+        "identifier": f"block-{item_id}",
+        "title": f"Block {item_id}",
+        "content": content,
+        "store_id": [0],
+        "update_time": update_time
+    }
+
+
+def make_entry(item):
+    return {
+        "key": f"{item['identifier']}@0",
+        "identifier": item["identifier"],
+        "title": item["title"],
+        "store_id": [0],
+        "id": item["id"],
+        "update_time": item["update_time"],
+        "hash": item["content"],
+        "fields": "{}"
+    }
+
+
+def write_snapshot(store, items):
+    with store.writer("blocks") as writer:
+        for item in items:
+            writer.write(make_entry(item), item)
+    return writer
+
+
+def test_upsert_rewrites_only_changed_rows_and_drops_missing(tmp_path):
+    store = ItemStore(tmp_path / "items-blocks.sqlite")
+    write_snapshot(store, [make_item(1), make_item(2), make_item(3)])
+
+    writer = write_snapshot(store, [make_item(3), make_item(1, content="changed")])
+
+    assert writer.changed == 1
+    assert store.version("blocks") == 2
+    assert [item["id"] for item in store.all("blocks")] == [3, 1]
+    assert store.get("blocks", "block-1")["content"] == "changed"
+    assert store.get("blocks", "block-2") is None
+
+
+def test_updated_between_scans_the_update_time_range(tmp_path):
+    store = ItemStore(tmp_path / "items-blocks.sqlite")
+    write_snapshot(store, [
+        make_item(1, update_time="2024-01-03 00:00:00"),
+        make_item(2, update_time="2024-01-01 00:00:00"),
+        make_item(3, update_time="2024-01-02 00:00:00"),
+        make_item(4, update_time=None)
+    ])
+
+    assert [item["id"] for item in store.updated_between("blocks")] == [2, 3, 1]
+    assert [item["id"] for item in store.updated_between("blocks", since="2024-01-02 00:00:00")] == [3, 1]
+    assert [
+        item["id"] for item in store.updated_between("blocks", until="2024-01-03 00:00:00")
+    ] == [2, 3]
+    assert store.latest_update_time("blocks") == "2024-01-03 00:00:00"
+
+
+def test_aborted_writer_keeps_previous_snapshot(tmp_path):
+    store = ItemStore(tmp_path / "items-blocks.sqlite")
+    write_snapshot(store, [make_item(1)])
+
+    writer = store.writer("blocks")
+    writer.write(make_entry(make_item(2)), make_item(2))
+    writer.flush()
+    writer.abort()
+
+    assert [item["id"] for item in store.all("blocks")] == [1]
+    assert store.version("blocks") == 1
+
+
+def test_schema_is_applied_once_per_file(tmp_path):
+    path = tmp_path / "items-blocks.sqlite"
+    write_snapshot(ItemStore(path), [make_item(1)])
+
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        # A dropped index is not recreated by opening the store again
+        connection.execute("DROP INDEX items_position")
+        connection.commit()
+        assert ItemStore(path).all("blocks")[0]["id"] == 1
+        assert connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'items_position'"
+        ).fetchone()[0] == 0
+    finally:
+        connection.close()
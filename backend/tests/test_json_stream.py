@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from integrations.json_stream import SearchResponseParser
+
+
+def feed_in_chunks(text, size):
+    parser = SearchResponseParser()
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    parser.close()
+    return parser, items
+
+
+def test_items_split_across_chunk_boundaries():
+    items = [
+        {"id": i, "content": '<p class="x">\\ "quoted" é 😀</p>' * (i + 1), "store_id": [0, {"n": None}]}
+        for i in range(20)
+    ]
+    text = json.dumps({"items": items, "search_criteria": {"page_size": 20}, "total_count": 20}, indent=2)
+
+    # Chunk size 1 cuts every escape sequence, number and nesting level
+    for size in (1, 2, 7, 64, len(text)):
+        parser, parsed = feed_in_chunks(text, size)
+        assert parsed == items
+        assert parser.fields == {"search_criteria": {"page_size": 20}, "total_count": 20}
+
+
+def test_items_are_returned_as_soon_as_they_are_complete():
+    parser = SearchResponseParser()
+
+    assert parser.feed('{"total_count": 2, "items": [{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(': 2}]') == [{"id": 2}]
+    assert parser.feed('}') == []
+    parser.close()
+    assert parser.fields == {"total_count": 2}
+
+
+def test_null_items_and_empty_response():
+    parser, items = feed_in_chunks('{"items": null, "total_count": 0}', 3)
+    assert items == []
+    assert parser.fields == {"items": None, "total_count": 0}
+
+    parser, items = feed_in_chunks('{}', 1)
+    assert items == [] and parser.fields == {}
+
+
+@pytest.mark.parametrize("text", [
+    '{"items": [{"id": 1]}',
+    '{"items": [{"id": tru}]}',
+    '{"items": [1}',
+    '{1: 2}',
+    '{"items": []]',
+])
+def test_malformed_json_fails_when_it_is_seen(text):
+    parser = SearchResponseParser()
+    with pytest.raises(ValueError):
+        parser.feed(text)
+
+
+def test_truncated_response_fails_on_close():
+    parser = SearchResponseParser()
+    assert parser.feed('{"items": [{"id": 1}, {"id": 2') == [{"id": 1}]
+    with pytest.raises(ValueError):
+        parser.close()
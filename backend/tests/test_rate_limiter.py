@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from integrations.rate_limiter import RateLimiter
+
+
+def test_penalize_halves_the_rate_down_to_the_minimum():
+    limiter = RateLimiter(rate=8, burst=4, min_rate=1.5)
+
+    limiter.penalize()
+    assert limiter.rate == 4
+    limiter.penalize()
+    limiter.penalize()
+    assert limiter.rate == 1.5
+
+
+def test_reward_recovers_the_rate_in_steps_up_to_the_configured_one():
+    limiter = RateLimiter(rate=10, burst=4)
+    limiter.penalize()
+
+    limiter.reward()
+    assert limiter.rate == 5.5
+    for _ in range(20):
+        limiter.reward()
+    assert limiter.rate == 10
+
+
+def test_penalize_drops_the_saved_up_burst():
+    limiter = RateLimiter(rate=100, burst=5)
+
+    async def run():
+        await limiter.acquire()
+        limiter.penalize()
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    # Without the penalty four burst tokens would be left; now it waits for one at 50/s
+    assert asyncio.run(run()) >= 0.015
+
+
+def test_disabled_limiter_never_waits_or_adapts():
+    limiter = RateLimiter(rate=0, burst=1)
+
+    async def run():
+        for _ in range(100):
+            await limiter.acquire()
+
+    asyncio.run(run())
+    limiter.penalize()
+    limiter.reward()
+    assert limiter.rate == 0
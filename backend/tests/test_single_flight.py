@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+from models.schemas import DataType
+from services.data_storage import DataStorageService
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append("run")
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        first = await asyncio.gather(*[flights.do("key", work) for _ in range(5)])
+        second = await flights.do("key", work)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == [1] * 5
+    assert second == 2
+    stats = flights.stats()["key"]
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (2, 4, False)
+
+
+def test_failure_is_shared_and_a_leaving_caller_does_not_cancel_the_work():
+    flights = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("magento down")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        results = await asyncio.gather(
+            flights.do("failing", failing), flights.do("failing", failing), return_exceptions=True
+        )
+        leaving = asyncio.ensure_future(flights.do("slow", slow))
+        staying = asyncio.ensure_future(flights.do("slow", slow))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return results, await staying
+
+    results, staying = asyncio.run(run())
+
+    assert [str(result) for result in results] == ["magento down", "magento down"]
+    assert flights.stats()["failing"]["failures"] == 1
+    assert staying == "done"
+
+
+def test_full_refresh_does_not_join_an_incremental_one(monkeypatch):
+    modes = []
+
+    async def fake_refresh(db, instance, data_type, incremental):
+        mode = "incremental" if incremental else "full"
+        modes.append(mode)
+        await asyncio.sleep(0.01)
+        return mode
+
+    monkeypatch.setattr(DataStorageService, "_refresh_instance_data", staticmethod(fake_refresh))
+    instance = SimpleNamespace(id=201)
+
+    async def run():
+        results = await asyncio.gather(
+            DataStorageService.refresh_instance_data(instance, DataType.BLOCKS, incremental=True),
+            DataStorageService.refresh_instance_data(instance, DataType.BLOCKS, incremental=True),
+            DataStorageService.refresh_instance_data(instance, DataType.BLOCKS, incremental=False)
+        )
+        return results, DataStorageService.is_refreshing(201, DataType.BLOCKS)
+
+    results, refreshing = asyncio.run(run())
+
+    assert results == ["incremental", "incremental", "full"]
+    assert sorted(modes) == ["full", "incremental"]
+    assert not refreshing
@@ -0,0 +1,65 @@
+import pytest
+
+from config import settings
+from services.snapshot_codec import SnapshotCodec
+
+CODECS = [
+    (format, compression)
+    for format in ("json", "msgpack")
+    for compression in ("none", "gzip", "zstd")
+]
+
+ITEMS = [
+    {"id": i, "identifier": f"block-{i}", "content": "<p>é 😀 \"quoted\"</p>" * i, "store_id": [0, i]}
+    for i in range(30)
+]
+
+
+def make_codec(format, compression):
+    codec = SnapshotCodec(format, compression)
+    if not codec.available:
+        pytest.skip(f"{format}/{compression} libraries are not installed")
+    return codec
+
+
+@pytest.mark.parametrize("format,compression", CODECS)
+@pytest.mark.parametrize("indent", [None, 2])
+def test_round_trip_and_read_at(tmp_path, monkeypatch, format, compression, indent):
+    monkeypatch.setattr(settings, "json_indent", indent)
+    codec = make_codec(format, compression)
+    path = tmp_path / f"blocks{codec.suffix}"
+
+    with codec.writer(path) as writer:
+        positions = [writer.write(item) for item in ITEMS]
+
+    assert writer.count == len(ITEMS)
+    assert codec.read(path) == ITEMS
+    assert list(codec.iter_read(path)) == ITEMS
+    assert SnapshotCodec.from_path(path).suffix == codec.suffix
+
+    # Out of order and repeated positions come back in the order requested
+    wanted = [positions[20], positions[3], positions[20], positions[0]]
+    assert codec.read_at(path, wanted) == [ITEMS[20], ITEMS[3], ITEMS[20], ITEMS[0]]
+
+
+@pytest.mark.parametrize("format,compression", CODECS)
+def test_empty_snapshot(tmp_path, format, compression):
+    codec = make_codec(format, compression)
+    path = tmp_path / f"blocks{codec.suffix}"
+
+    assert codec.write(path, []) == 0
+    assert codec.read(path) == []
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    codec = SnapshotCodec("json", "gzip")
+    path = tmp_path / f"blocks{codec.suffix}"
+    codec.write(path, ITEMS[:2])
+
+    with pytest.raises(RuntimeError):
+        with codec.writer(path) as writer:
+            writer.write(ITEMS[5])
+            raise RuntimeError("download failed")
+
+    assert codec.read(path) == ITEMS[:2]
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+from services.snapshot_history import HistoryWriter, SnapshotHistoryService
+
+
+def record(history_dir, version, previous, items):
+    writer = HistoryWriter(history_dir, previous)
+    hashes = {key: writer.write(key, body) for key, body in items.items()}
+    manifest_path = SnapshotHistoryService._manifest_path(history_dir, version)
+    SnapshotHistoryService._write_manifest(manifest_path, writer.manifest)
+    return writer, manifest_path, hashes
+
+
+def stored_objects(history_dir):
+    return {path.name.split(".", 1)[0] for path in (history_dir / "objects").glob("*/*")}
+
+
+def test_bodies_are_deleted_once_no_retained_version_references_them(tmp_path):
+    history_dir = tmp_path / "history"
+    _, path1, v1 = record(history_dir, 1, None, {"a@0": {"v": "A"}, "b@0": {"v": "B"}})
+    writer2, path2, v2 = record(history_dir, 2, {"a@0": v1["a@0"], "b@0": v1["b@0"]}, {
+        "a@0": {"v": "A"}, "b@0": {"v": "B2"}, "c@0": {"v": "C"}
+    })
+    assert writer2.new_objects == 2
+
+    SnapshotHistoryService._update_references(history_dir, [(2, path2), (1, path1)])
+    assert len(stored_objects(history_dir)) == 4
+
+    _, path3, v3 = record(history_dir, 3, dict(writer2.manifest), {"a@0": {"v": "A2"}, "c@0": {"v": "C"}})
+
+    # v1 expires: B is gone, A is still referenced by v2
+    SnapshotHistoryService._update_references(history_dir, [(3, path3), (2, path2)])
+    assert stored_objects(history_dir) == {v1["a@0"], v2["b@0"], v2["c@0"], v3["a@0"]}
+    assert not path1.exists()
+
+    # v2 expires: A and B2 are gone, C is still referenced by v3
+    SnapshotHistoryService._update_references(history_dir, [(3, path3)])
+    assert stored_objects(history_dir) == {v3["a@0"], v3["c@0"]}
+    assert not path2.exists()
+
+    with gzip.open(SnapshotHistoryService._refs_path(history_dir), "rb") as f:
+        refs = json.loads(f.read())
+    assert refs == {"versions": [3], "counts": {v3["a@0"]: 1, v3["c@0"]: 1}}
+
+
+def test_missing_refs_file_rebuilds_counts_and_sweeps_leftovers(tmp_path):
+    history_dir = tmp_path / "history"
+    _, path1, v1 = record(history_dir, 1, None, {"a@0": {"v": "A"}})
+    SnapshotHistoryService._update_references(history_dir, [(1, path1)])
+
+    # An interrupted refresh left a body and a manifest behind, and the refs file is lost
+    record(history_dir, 2, None, {"x@0": {"v": "X"}})
+    SnapshotHistoryService._refs_path(history_dir).unlink()
+
+    SnapshotHistoryService._update_references(history_dir, [(1, path1)])
+
+    assert stored_objects(history_dir) == {v1["a@0"]}
+    assert [path.name for path in (history_dir / "manifests").iterdir()] == [path1.name]
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from config import settings
+from integrations.connection_pool import ConnectionPool
+from models.schemas import DataType
+from services import data_storage
+from services.data_storage import DataStorageService
+from services.snapshot_codec import SnapshotCodec, SnapshotWriter
+
+
+def make_item(item_id):
+    return {
+        "id": item_id,
+        "identifier": f"block-{item_id}",
+        "title": f"Block {item_id}",
+        "content": f"<p>{item_id}</p>",
+        "is_active": True,
+        "store_id": [0],
+        "update_time": "2024-01-01 00:00:00"
+    }
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "instances_data_dir", tmp_path)
+    monkeypatch.setattr(settings, "snapshot_backend", "file")
+    monkeypatch.setattr(settings, "snapshot_format", "msgpack")
+    monkeypatch.setattr(settings, "snapshot_compression", "gzip")
+    monkeypatch.setattr(settings, "snapshot_history_enabled", False)
+    return tmp_path
+
+
+def test_concurrent_readers_migrate_an_old_codec_snapshot_once(storage):
+    instance_dir = storage / "101"
+    instance_dir.mkdir()
+    SnapshotCodec("json", "none").write(instance_dir / "blocks.json", [make_item(i) for i in range(50)])
+
+    async def run():
+        return await asyncio.gather(
+            *[DataStorageService.load_item_index(101, DataType.BLOCKS) for _ in range(4)],
+            *[DataStorageService.load_snapshot(101, DataType.BLOCKS) for _ in range(4)]
+        )
+
+    results = asyncio.run(run())
+
+    assert [len(result) for result in results] == [50] * 8
+    assert sorted(path.name for path in instance_dir.iterdir()) == [
+        "blocks-index.msgpack.gz", "blocks.msgpack.gz"
+    ]
+
+
+def test_outdated_item_index_is_rebuilt_by_the_reader(storage):
+    instance_dir = storage / "102"
+    instance_dir.mkdir()
+    SnapshotCodec("msgpack", "gzip").write(instance_dir / "blocks.msgpack.gz", [make_item(i) for i in range(5)])
+
+    item_index = asyncio.run(DataStorageService.load_item_index(102, DataType.BLOCKS))
+
+    assert [entry["identifier"] for entry in item_index] == [f"block-{i}" for i in range(5)]
+    assert (instance_dir / "blocks-index.msgpack.gz").exists()
+
+
+def test_cancelled_stream_aborts_after_the_running_write(storage, monkeypatch):
+    events = []
+    index_entry = DataStorageService._index_entry
+    abort = SnapshotWriter.abort
+
+    def slow_index_entry(*args):
+        time.sleep(0.05)
+        events.append("write")
+        return index_entry(*args)
+
+    def recording_abort(self):
+        events.append("abort")
+        abort(self)
+
+    monkeypatch.setattr(DataStorageService, "_index_entry", staticmethod(slow_index_entry))
+    monkeypatch.setattr(SnapshotWriter, "abort", recording_abort)
+
+    async def items():
+        for item_id in range(3):
+            yield make_item(item_id)
+
+    async def run():
+        task = asyncio.ensure_future(
+            DataStorageService.save_snapshot_stream(None, 103, DataType.BLOCKS, items())
+        )
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert events == ["write", "write", "write", "abort"]
+    assert list((storage / "103").iterdir()) == []
+
+
+def test_failed_write_releases_the_streamed_download(storage, monkeypatch):
+    body = json.dumps({"items": [make_item(i) for i in range(500)], "total_count": 500}).encode()
+
+    class Chunks(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for start in range(0, len(body), 1000):
+                yield body[start:start + 1000]
+
+    def failing_index_entry(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(settings, "magento_http_cache_enabled", False)
+    monkeypatch.setattr(data_storage, "STREAM_WRITE_BATCH_SIZE", 10)
+    monkeypatch.setattr(DataStorageService, "_index_entry", staticmethod(failing_index_entry))
+    pool = ConnectionPool()
+    monkeypatch.setattr(pool, "_create_http_client", lambda: httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=Chunks()))
+    ))
+
+    class Instance:
+        id = 104
+        url = "http://magento.test"
+        api_token = "token"
+
+    async def run():
+        # The caller still references the stream, so only an explicit close releases it
+        items = pool.client_for(Instance()).stream_cms_blocks()
+        with pytest.raises(OSError):
+            await DataStorageService.save_snapshot_stream(None, 104, DataType.BLOCKS, items)
+        in_flight = pool._clients[104].in_flight
+        await pool.close()
+        return in_flight
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+from integrations import store_view_registry as registry_module
+from integrations.store_view_registry import StoreViewRegistry
+
+
+def test_load_finishing_after_invalidate_is_not_cached(monkeypatch):
+    release = asyncio.Event()
+    fetches = []
+
+    class Client:
+        def __init__(self, instance):
+            self.instance = instance
+
+        async def get_store_views(self):
+            fetches.append(self.instance.url)
+            if len(fetches) == 1:
+                await release.wait()
+            return [{"id": 1, "code": self.instance.url}]
+
+    monkeypatch.setattr(registry_module.connection_pool, "client_for", Client)
+    registry = StoreViewRegistry()
+    old = SimpleNamespace(id=301, url="old")
+    new = SimpleNamespace(id=301, url="new")
+
+    async def run():
+        loading = asyncio.ensure_future(registry.get(old))
+        await asyncio.sleep(0)
+        # e.g. the instance URL changed while its store views were being fetched
+        registry.invalidate(301)
+        release.set()
+        stale = await loading
+        return stale, await registry.get(new), await registry.get_by_code(new, "new")
+
+    stale, fresh, by_code = asyncio.run(run())
+
+    assert stale == [{"id": 1, "code": "old"}]
+    assert fresh == [{"id": 1, "code": "new"}]
+    assert by_code == {"id": 1, "code": "new"}
+    assert fetches == ["old", "new"]
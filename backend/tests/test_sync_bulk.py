@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+
+from config import settings
+from integrations.magento_client import (
+    MagentoClient, BULK_STATUS_COMPLETE, BULK_STATUS_FAILED_NOT_RETRIABLY, BULK_STATUS_OPEN
+)
+from models.schemas import DataType, SyncItem
+from services.sync import SyncService
+
+
+def make_block(identifier, block_id=None):
+    block = {"identifier": identifier, "title": identifier, "content": "x", "store_id": [0]}
+    if block_id is not None:
+        block.update(id=block_id, block_id=block_id)
+    return block
+
+
+class BulkClient:
+    """Destination client answering bulk submissions and status polls from canned responses"""
+
+    def __init__(self, dest_blocks, submissions, statuses):
+        self.dest_blocks = dest_blocks
+        self.submissions = submissions
+        self.statuses = statuses
+        self.submitted = []
+
+    async def get_cms_blocks(self):
+        return self.dest_blocks
+
+    async def bulk_create_cms_blocks(self, blocks):
+        self.submitted.append(("create", [block["identifier"] for block in blocks]))
+        return self.submissions.pop(0)
+
+    async def bulk_update_cms_blocks(self, blocks):
+        self.submitted.append(("update", [block_id for block_id, _ in blocks]))
+        return self.submissions.pop(0)
+
+    async def wait_for_bulk(self, bulk_uuid):
+        return self.statuses[bulk_uuid]
+
+
+def test_operation_statuses_map_back_onto_item_results(monkeypatch):
+    monkeypatch.setattr(settings, "magento_bulk_chunk_size", 2)
+    source = [make_block(identifier) for identifier in ("a", "b", "c", "d", "e")]
+    client = BulkClient(
+        dest_blocks=[make_block("d", block_id=7), make_block("e", block_id=8)],
+        submissions=[
+            # Operation ids are positions within each submitted chunk
+            {"bulk_uuid": "bulk-1", "request_items": [
+                {"id": 0, "status": "accepted"},
+                {"id": 1, "status": "rejected", "error_message": "Invalid identifier"}
+            ]},
+            {"bulk_uuid": "bulk-2", "request_items": [{"id": 0, "status": "accepted"}]},
+            {"bulk_uuid": "bulk-3", "request_items": [
+                {"id": 0, "status": "accepted"}, {"id": 1, "status": "accepted"}
+            ]}
+        ],
+        statuses={
+            "bulk-1": [{"id": 0, "status": BULK_STATUS_COMPLETE}],
+            "bulk-2": [{"id": 0, "status": BULK_STATUS_FAILED_NOT_RETRIABLY, "result_message": "Could not save"}],
+            "bulk-3": [{"id": 0, "status": BULK_STATUS_COMPLETE}, {"id": 1, "status": BULK_STATUS_OPEN}]
+        }
+    )
+    sync_items = [
+        SyncItem(identifier=identifier, action="create") for identifier in ("a", "b", "c")
+    ] + [
+        SyncItem(identifier=identifier, action="update") for identifier in ("d", "e")
+    ] + [SyncItem(identifier="missing", action="create")]
+
+    results = asyncio.run(SyncService().execute_sync(source, client, DataType.BLOCKS, sync_items, use_bulk=True))
+
+    assert client.submitted == [("create", ["a", "b"]), ("create", ["c"]), ("update", [7, 8])]
+    assert [(r["identifier"], r["success"], r.get("bulk_uuid"), r["error"]) for r in results] == [
+        ("a", True, "bulk-1", None),
+        ("b", False, "bulk-1", "Invalid identifier"),
+        ("c", False, "bulk-2", "Could not save"),
+        ("d", True, "bulk-3", None),
+        ("e", False, "bulk-3", "Bulk operation did not complete in time"),
+        ("missing", False, None, "Source item not found: missing")
+    ]
+    assert results[0]["message"] == "Created block successfully (bulk)"
+
+
+def test_failed_submission_fails_every_item_of_the_chunk(monkeypatch):
+    class FailingClient(BulkClient):
+        async def bulk_create_cms_blocks(self, blocks):
+            raise httpx.ConnectError("connection refused")
+
+    client = FailingClient(dest_blocks=[], submissions=[], statuses={})
+    sync_items = [SyncItem(identifier="a", action="create"), SyncItem(identifier="b", action="create")]
+
+    results = asyncio.run(SyncService().execute_sync(
+        [make_block("a"), make_block("b")], client, DataType.BLOCKS, sync_items, use_bulk=True
+    ))
+
+    assert [(r["success"], r["error"]) for r in results] == [(False, "connection refused")] * 2
+
+
+def test_wait_for_bulk_polls_until_no_operation_is_open(monkeypatch):
+    monkeypatch.setattr(settings, "magento_bulk_poll_interval", 0)
+    polls = []
+
+    def handler(request):
+        polls.append(request.url.path)
+        status = BULK_STATUS_OPEN if len(polls) < 3 else BULK_STATUS_COMPLETE
+        return httpx.Response(200, json={"operations_list": [{"id": 0, "status": status}]})
+
+    client = MagentoClient(
+        "http://magento.test", "token", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+    operations = asyncio.run(client.wait_for_bulk("bulk-1"))
+
+    assert operations == [{"id": 0, "status": BULK_STATUS_COMPLETE}]
+    assert polls == ["/rest/V1/bulk/bulk-1/status"] * 3
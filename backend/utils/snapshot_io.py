@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator, Optional, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+
+
+class SnapshotIO:
+    """Dedicated thread pool for blocking snapshot I/O.
+
+    Reading, decoding, encoding and writing snapshots (files, the item
+    store and history) can take seconds for large catalogs; running it
+    here keeps the event loop free to serve other requests meanwhile.
+    The HTTP response cache writes its files here too.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="snapshot-io"
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking function in the snapshot I/O pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """Wait for pending I/O and stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def temporary_path(path: Path) -> Path:
+    """Hidden sibling of path to write into before renaming it over path"""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def commit_file(raw: BinaryIO, tmp_path: Path, path: Path) -> None:
+    """Flush and fsync a fully written temporary file, close it and rename it over path"""
+    raw.flush()
+    os.fsync(raw.fileno())
+    raw.close()
+    os.replace(tmp_path, path)
+    # Make the rename itself durable
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+@contextmanager
+def atomic_open(path: Path) -> Iterator[BinaryIO]:
+    """Open path for binary writing so readers only ever see the complete file.
+
+    Data goes to a temporary file which is synced and renamed over path
+    when the block exits without error, and discarded otherwise.
+    """
+    tmp_path = temporary_path(path)
+    raw = open(tmp_path, "wb")
+    try:
+        yield raw
+        commit_file(raw, tmp_path, path)
+    finally:
+        raw.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+snapshot_io = SnapshotIO(settings.snapshot_io_workers)
@@ -0,0 +1,93 @@
+import React, { useState, useEffect } from 'react';
+import { Table, TableBody, TableCell, TableRow, CircularProgress, Box, Alert } from '@mui/material';
+import comparisonService from '../services/comparisonService';
+import { ComparisonItem, ComparisonStatus, DataType, DiffResult } from '../types';
+
+interface ItemDetailsProps {
+  sourceInstanceId: number;
+  destinationInstanceId: number;
+  dataType: DataType;
+  item: ComparisonItem;
+}
+
+// Details of a comparison row, fetched when the row is expanded (summary results carry no item bodies)
+export default function ItemDetails({ sourceInstanceId, destinationInstanceId, dataType, item }: ItemDetailsProps) {
+  const [diff, setDiff] = useState<DiffResult | null>(null);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    comparisonService
+      .getItemDiff({
+        source_instance_id: sourceInstanceId,
+        destination_instance_id: destinationInstanceId,
+        data_type: dataType,
+        identifier: item.identifier,
+      })
+      .then((result) => {
+        if (!cancelled) {
+          setDiff(result);
+        }
+      })
+      .catch((err: any) => {
+        if (!cancelled) {
+          setError(err.message || 'Failed to load item details');
+        }
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [sourceInstanceId, destinationInstanceId, dataType, item.identifier]);
+
+  if (error) {
+    return <Alert severity="error">{error}</Alert>;
+  }
+  if (!diff) {
+    return (
+      <Box display="flex" justifyContent="center" p={2}>
+        <CircularProgress size={24} />
+      </Box>
+    );
+  }
+
+  const value = (side: 'source' | 'destination', field: string) => {
+    const diffField = diff.fields.find((f) => f.field_name === field);
+    return side === 'source' ? diffField?.source_value : diffField?.destination_value;
+  };
+
+  const sideRows = (side: 'source' | 'destination', label: string) => (
+    <>
+      <TableRow>
+        <TableCell component="th" scope="row">Store Views ({label})</TableCell>
+        <TableCell>
+          {(side === 'source' ? diff.source_stores : diff.destination_stores).join(', ') || 'All'}
+        </TableCell>
+      </TableRow>
+      <TableRow>
+        <TableCell component="th" scope="row">Active ({label})</TableCell>
+        <TableCell>{value(side, 'is_active') ? 'Yes' : 'No'}</TableCell>
+      </TableRow>
+      {dataType === DataType.PAGES && (
+        <TableRow>
+          <TableCell component="th" scope="row">Page Layout ({label})</TableCell>
+          <TableCell>{value(side, 'page_layout') || 'Default'}</TableCell>
+        </TableRow>
+      )}
+    </>
+  );
+
+  return (
+    <Table size="small">
+      <TableBody>
+        {item.source_status !== ComparisonStatus.MISSING && sideRows('source', 'Source')}
+        {item.destination_status !== ComparisonStatus.MISSING && sideRows('destination', 'Destination')}
+        {item.differences && (
+          <TableRow>
+            <TableCell component="th" scope="row">Differences</TableCell>
+            <TableCell>{item.differences.join(', ')}</TableCell>
+          </TableRow>
+        )}
+      </TableBody>
+    </Table>
+  );
+}
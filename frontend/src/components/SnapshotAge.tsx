@@ -0,0 +1,33 @@
+import React from 'react';
+import { Chip, Tooltip } from '@mui/material';
+import { formatDistanceToNow } from 'date-fns';
+import { SnapshotFreshness } from '../types';
+
+interface SnapshotAgeProps {
+  label: string;
+  snapshot?: SnapshotFreshness | null;
+}
+
+export default function SnapshotAge({ label, snapshot }: SnapshotAgeProps) {
+  if (!snapshot) {
+    return null;
+  }
+
+  const age = formatDistanceToNow(new Date(Date.now() - snapshot.age_seconds * 1000), { addSuffix: true });
+  const tooltip = snapshot.refreshing
+    ? 'Refreshing in the background, compare again for the latest data'
+    : snapshot.is_stale
+      ? 'Older than the configured max age'
+      : 'Fresh';
+
+  return (
+    <Tooltip title={tooltip}>
+      <Chip
+        label={`${label} data ${age}${snapshot.refreshing ? ' (refreshing)' : ''}`}
+        color={snapshot.is_stale ? 'warning' : 'default'}
+        size="small"
+        variant="outlined"
+      />
+    </Tooltip>
+  );
+}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import {
   Box,
   Paper,
@@ -37,9 +37,11 @@ import {
 } from '@mui/icons-material';
 import useStore from '../store';
 import comparisonService from '../services/comparisonService';
-import { DataType, ComparisonStatus, ComparisonItem } from '../types';
+import { DataType, ComparisonStatus, ComparisonItem, ComparisonFilter } from '../types';
 import DiffViewer from '../components/DiffViewer';
 import SyncDialog from '../components/SyncDialog';
+import SnapshotAge from '../components/SnapshotAge';
+import ItemDetails from '../components/ItemDetails';
 
 export default function ComparePages() {
   const {
@@ -65,8 +67,13 @@ export default function ComparePages() {
   const [diffViewerOpen, setDiffViewerOpen] = useState(false);
   const [diffViewerItem, setDiffViewerItem] = useState<ComparisonItem | null>(null);
   const [syncDialogOpen, setSyncDialogOpen] = useState(false);
-  const [statusFilter, setStatusFilter] = useState<string>('all');
+  const [statusFilter, setStatusFilter] = useState<ComparisonFilter>('all');
   const [searchQuery, setSearchQuery] = useState('');
+  // Rows seen on any page, so selected items keep their title and status for the sync dialog
+  const knownItems = useRef<Map<string, ComparisonItem>>(new Map());
+  // Bumped by the Compare button; 0 until the first comparison, reset when the instances change
+  const [compareRun, setCompareRun] = useState(0);
+  const fetchedRun = useRef(0);
 
   useEffect(() => {
     // Load instances if not already loaded
@@ -80,6 +87,7 @@ export default function ComparePages() {
     if (selectedSourceInstance || selectedDestInstance) {
       setComparisonResult(null);
       clearSelectedItems();
+      setCompareRun(0);
     }
   }, [selectedSourceInstance, selectedDestInstance]);
 
@@ -93,30 +101,78 @@ export default function ComparePages() {
     }
   };
 
-  const handleCompare = async () => {
+  const fetchComparison = useCallback(async (skip: number, limit: number) => {
+    if (!selectedSourceInstance || !selectedDestInstance) {
+      return null;
+    }
+
+    // Only identifiers, titles and statuses of one page of items; bodies are loaded per row
+    return comparisonService.comparePages({
+      source_instance_id: selectedSourceInstance.id,
+      destination_instance_id: selectedDestInstance.id,
+      force_refresh: false,
+      summary_only: true,
+      status: statusFilter,
+      search: searchQuery || undefined,
+      skip,
+      limit,
+    });
+  }, [selectedSourceInstance, selectedDestInstance, statusFilter, searchQuery]);
+
+  const handleCompare = () => {
     if (!selectedSourceInstance || !selectedDestInstance) {
       showSnackbar('Please select both source and destination instances', 'warning');
       return;
     }
 
-    try {
-      setLoadingComparison(true);
-      
-      const request = {
-        source_instance_id: selectedSourceInstance.id,
-        destination_instance_id: selectedDestInstance.id,
-        force_refresh: false,
-      };
+    knownItems.current.clear();
+    setPage(0);
+    setCompareRun(run => run + 1);
+  };
 
-      const result = await comparisonService.comparePages(request);
-      setComparisonResult(result);
-      showSnackbar('Comparison completed successfully', 'success');
-    } catch (error: any) {
-      showSnackbar(error.message || 'Comparison failed', 'error');
-    } finally {
-      setLoadingComparison(false);
+  useEffect(() => {
+    // Filters and pages are applied by the server: every change fetches the
+    // current page once, right away for a new comparison, otherwise once the
+    // user stops typing. Responses to superseded requests are dropped.
+    if (compareRun === 0) {
+      fetchedRun.current = 0;
+      return;
     }
-  };
+    const newRun = compareRun !== fetchedRun.current;
+    fetchedRun.current = compareRun;
+    let cancelled = false;
+
+    const load = async () => {
+      if (newRun) {
+        setLoadingComparison(true);
+      }
+      try {
+        const result = await fetchComparison(page * rowsPerPage, rowsPerPage);
+        if (cancelled || !result) {
+          return;
+        }
+        result.items.forEach(item => knownItems.current.set(item.identifier, item));
+        setComparisonResult(result);
+        if (newRun) {
+          showSnackbar('Comparison completed successfully', 'success');
+        }
+      } catch (error: any) {
+        if (!cancelled) {
+          showSnackbar(error.message || 'Comparison failed', 'error');
+        }
+      } finally {
+        if (newRun) {
+          setLoadingComparison(false);
+        }
+      }
+    };
+
+    const timer = setTimeout(load, newRun ? 0 : 300);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [compareRun, fetchComparison, page, rowsPerPage, setComparisonResult, setLoadingComparison, showSnackbar]);
 
   const handleToggleRow = (identifier: string) => {
     const newExpanded = new Set(expandedRows);
@@ -138,18 +194,18 @@ export default function ComparePages() {
     setSyncDialogOpen(true);
   };
 
+  const isSyncable = (item: ComparisonItem) =>
+    item.source_status !== ComparisonStatus.MISSING &&
+    (item.source_status === ComparisonStatus.DIFFERENT ||
+     item.destination_status === ComparisonStatus.MISSING);
+
   const handleSelectAll = (event: React.ChangeEvent<HTMLInputElement>) => {
-    if (event.target.checked && comparisonResult) {
-      const allIdentifiers = comparisonResult.items
-        .filter(item => 
-          item.source_status !== ComparisonStatus.MISSING &&
-          (item.source_status === ComparisonStatus.DIFFERENT || 
-           item.destination_status === ComparisonStatus.MISSING)
-        )
-        .map(item => item.identifier);
-      selectAllItems(allIdentifiers);
+    // Selects the syncable items of the current page, keeping selections made on other pages
+    const pageIdentifiers = pageItems.filter(isSyncable).map(item => item.identifier);
+    if (event.target.checked) {
+      selectAllItems(Array.from(new Set([...selectedItems, ...pageIdentifiers])));
     } else {
-      clearSelectedItems();
+      selectAllItems(selectedItems.filter(identifier => !pageIdentifiers.includes(identifier)));
     }
   };
 
@@ -166,32 +222,9 @@ export default function ComparePages() {
     return <Chip label="Same" color="success" size="small" />;
   };
 
-  const filteredItems = comparisonResult?.items.filter(item => {
-    // Apply status filter
-    if (statusFilter !== 'all') {
-      if (statusFilter === 'missing' && item.destination_status !== ComparisonStatus.MISSING) {
-        return false;
-      }
-      if (statusFilter === 'different' && item.source_status !== ComparisonStatus.DIFFERENT) {
-        return false;
-      }
-      if (statusFilter === 'same' && (item.source_status === ComparisonStatus.DIFFERENT || item.destination_status === ComparisonStatus.MISSING || item.source_status === ComparisonStatus.MISSING)) {
-        return false;
-      }
-    }
-    
-    // Apply search filter
-    if (searchQuery) {
-      const query = searchQuery.toLowerCase();
-      return item.identifier.toLowerCase().includes(query) ||
-             item.source_data?.title?.toLowerCase().includes(query) ||
-             item.destination_data?.title?.toLowerCase().includes(query);
-    }
-    
-    return true;
-  }) || [];
-  
-  const paginatedItems = filteredItems.slice(page * rowsPerPage, page * rowsPerPage + rowsPerPage);
+  const pageItems = comparisonResult?.items || [];
+  const matchingCount = comparisonResult?.total_items ?? pageItems.length;
+  const syncablePageItems = pageItems.filter(isSyncable);
 
   return (
     <Box>
@@ -277,6 +310,8 @@ export default function ComparePages() {
                 <Chip label={`${comparisonResult.exists_in_both} Same`} color="success" size="small" />
                 <Chip label={`${comparisonResult.different} Different`} color="info" size="small" />
                 <Chip label={`${comparisonResult.missing_in_destination} Missing`} color="error" size="small" />
+                <SnapshotAge label="Source" snapshot={comparisonResult.source_snapshot} />
+                <SnapshotAge label="Destination" snapshot={comparisonResult.destination_snapshot} />
                 {selectedItems.length > 0 && (
                   <Button
                     variant="contained"
@@ -296,13 +331,14 @@ export default function ComparePages() {
                   <Select
                     value={statusFilter}
                     onChange={(e) => {
-                      setStatusFilter(e.target.value);
+                      setStatusFilter(e.target.value as ComparisonFilter);
                       setPage(0);
                     }}
                     label="Status Filter"
                   >
                     <MenuItem value="all">All Items</MenuItem>
                     <MenuItem value="missing">Missing</MenuItem>
+                    <MenuItem value="only_in_destination">Only in Destination</MenuItem>
                     <MenuItem value="different">Different</MenuItem>
                     <MenuItem value="same">Same</MenuItem>
                   </Select>
@@ -327,7 +363,7 @@ export default function ComparePages() {
                 />
                 
                 <Typography variant="body2" color="text.secondary">
-                  Showing {filteredItems.length} of {comparisonResult.items.length} items
+                  {matchingCount} matching items
                 </Typography>
               </Stack>
             </Box>
@@ -339,11 +375,7 @@ export default function ComparePages() {
                     <TableCell padding="checkbox">
                       <Checkbox
                         onChange={handleSelectAll}
-                        checked={selectedItems.length > 0 && selectedItems.length === filteredItems.filter(item => 
-                          item.source_status !== ComparisonStatus.MISSING &&
-                          (item.source_status === ComparisonStatus.DIFFERENT || 
-                           item.destination_status === ComparisonStatus.MISSING)
-                        ).length}
+                        checked={syncablePageItems.length > 0 && syncablePageItems.every(item => selectedItems.includes(item.identifier))}
                       />
                     </TableCell>
                     <TableCell>Identifier</TableCell>
@@ -353,14 +385,11 @@ export default function ComparePages() {
                   </TableRow>
                 </TableHead>
                 <TableBody>
-                  {paginatedItems.map((item) => (
+                  {pageItems.map((item) => (
                     <React.Fragment key={item.identifier}>
                       <TableRow>
                         <TableCell padding="checkbox">
-                          {item.source_status !== ComparisonStatus.MISSING && (
-                            item.source_status === ComparisonStatus.DIFFERENT || 
-                            item.destination_status === ComparisonStatus.MISSING
-                          ) && (
+                          {isSyncable(item) && (
                             <Checkbox
                               checked={selectedItems.includes(item.identifier)}
                               onChange={() => toggleItemSelection(item.identifier)}
@@ -398,48 +427,12 @@ export default function ComparePages() {
                               <Typography variant="h6" gutterBottom component="div">
                                 Details
                               </Typography>
-                              <Table size="small">
-                                <TableBody>
-                                  {item.source_data && (
-                                    <>
-                                      <TableRow>
-                                        <TableCell component="th" scope="row">Store Views (Source)</TableCell>
-                                        <TableCell>{item.source_data.store_id?.join(', ') || 'All'}</TableCell>
-                                      </TableRow>
-                                      <TableRow>
-                                        <TableCell component="th" scope="row">Active (Source)</TableCell>
-                                        <TableCell>{item.source_data.active === '1' ? 'Yes' : 'No'}</TableCell>
-                                      </TableRow>
-                                      <TableRow>
-                                        <TableCell component="th" scope="row">Page Layout (Source)</TableCell>
-                                        <TableCell>{item.source_data.page_layout || 'Default'}</TableCell>
-                                      </TableRow>
-                                    </>
-                                  )}
-                                  {item.destination_data && (
-                                    <>
-                                      <TableRow>
-                                        <TableCell component="th" scope="row">Store Views (Destination)</TableCell>
-                                        <TableCell>{item.destination_data.store_id?.join(', ') || 'All'}</TableCell>
-                                      </TableRow>
-                                      <TableRow>
-                                        <TableCell component="th" scope="row">Active (Destination)</TableCell>
-                                        <TableCell>{item.destination_data.active === '1' ? 'Yes' : 'No'}</TableCell>
-                                      </TableRow>
-                                      <TableRow>
-                                        <TableCell component="th" scope="row">Page Layout (Destination)</TableCell>
-                                        <TableCell>{item.destination_data.page_layout || 'Default'}</TableCell>
-                                      </TableRow>
-                                    </>
-                                  )}
-                                  {item.differences && (
-                                    <TableRow>
-                                      <TableCell component="th" scope="row">Differences</TableCell>
-                                      <TableCell>{item.differences.join(', ')}</TableCell>
-                                    </TableRow>
-                                  )}
-                                </TableBody>
-                              </Table>
+                              <ItemDetails
+                                sourceInstanceId={selectedSourceInstance?.id || 0}
+                                destinationInstanceId={selectedDestInstance?.id || 0}
+                                dataType={DataType.PAGES}
+                                item={item}
+                              />
                             </Box>
                           </Collapse>
                         </TableCell>
@@ -453,7 +446,7 @@ export default function ComparePages() {
             <TablePagination
               rowsPerPageOptions={[10, 25, 50, 100]}
               component="div"
-              count={filteredItems.length}
+              count={matchingCount}
               rowsPerPage={rowsPerPage}
               page={page}
               onPageChange={(_, newPage) => setPage(newPage)}
@@ -491,8 +484,9 @@ export default function ComparePages() {
           sourceInstanceId={selectedSourceInstance!.id}
           destinationInstanceId={selectedDestInstance!.id}
           dataType={DataType.PAGES}
-          items={comparisonResult.items
-            .filter(item => selectedItems.includes(item.identifier))
+          items={selectedItems
+            .map(identifier => knownItems.current.get(identifier))
+            .filter((item): item is ComparisonItem => !!item)
             .map(item => ({
               identifier: item.identifier,
               title: item.title,
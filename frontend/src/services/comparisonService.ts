@@ -1,5 +1,10 @@
 import api from './api';
-import { ComparisonRequest, ComparisonResult, DataType, DiffResult } from '../types';
+import {
+  ComparisonRequest,
+  ComparisonResult,
+  DataType,
+  DiffResult,
+} from '../types';
 
 interface DiffRequest {
   source_instance_id: number;
@@ -49,10 +49,17 @@ export enum ComparisonStatus {
   DIFFERENT = 'different',
 }
 
+export type ComparisonFilter = 'all' | 'missing' | 'only_in_destination' | 'different' | 'same';
+
 export interface ComparisonRequest {
   source_instance_id: number;
   destination_instance_id: number;
   force_refresh?: boolean;
+  summary_only?: boolean; // items without source_data/destination_data
+  status?: ComparisonFilter;
+  search?: string;
+  skip?: number;
+  limit?: number;
 }
 
 export interface ComparisonItem {
@@ -65,6 +72,14 @@ export interface ComparisonItem {
   differences?: string[];
 }
 
+export interface SnapshotFreshness {
+  created_at: string;
+  age_seconds: number;
+  max_age: number;
+  is_stale: boolean;
+  refreshing: boolean;
+}
+
 export interface ComparisonResult {
   source_instance: Instance;
   destination_instance: Instance;
@@ -76,7 +91,10 @@ export interface ComparisonResult {
   missing_in_source: number;
   different: number;
   items: ComparisonItem[];
+  total_items?: number | null; // items matching status and search, before skip/limit
   compared_at: string;
+  source_snapshot?: SnapshotFreshness | null;
+  destination_snapshot?: SnapshotFreshness | null;
 }
 
 export interface DiffField {
@@ -108,6 +126,7 @@ export interface SyncRequest {
   data_type: DataType;
   items: SyncItem[];
   store_view_mapping?: Record<string, string>;
+  use_bulk?: boolean; // Submit through the Magento asynchronous bulk API
 }
 
 export interface SyncPreview {